@@ -1,13 +1,19 @@
 from crewai import Agent
 from tools.research_tools import research_tools, serper_logic_for_query
 from utils.utils import load_schema, get_current_date_for_prompting
+from utils.llm_cache import with_llm_cache
+from utils.registry import shared
 import logging
 
 logger = logging.getLogger(__name__)
 
-def create_critic_agent():
+# `key` gives each hypothesis its own agent instance within a run, so refinement
+# chains running concurrently never share an agent (and its executor state).
+
+@shared("run")
+def create_critic_agent(key: str | None = None):
     logger.info("Creating Critic Agent")
-    return Agent(
+    return with_llm_cache(Agent(
         role="Hypothesis Critic",
         goal="Critically evaluate one trading hypothesis for weaknesses and risks.",
         backstory=(
@@ -19,12 +25,13 @@ def create_critic_agent():
         allow_delegation=False,
         tools=research_tools(),
         verbose=True
-    )
+    ))
 
 
-def create_refiner_agent():
+@shared("run")
+def create_refiner_agent(key: str | None = None):
     logger.info("Creating Refiner Agent")
-    return Agent(
+    return with_llm_cache(Agent(
         role="Hypothesis Refiner",
         goal="Refine a single trading hypothesis into a more robust and testable trade thesis.",
         backstory=(
@@ -36,15 +43,16 @@ def create_refiner_agent():
         allow_delegation=False,
         tools=research_tools(),
         verbose=True
-    )
+    ))
 
-def create_falsification_agent():
+@shared("run")
+def create_falsification_agent(key: str | None = None):
     """
     Agent that determines falsification conditions for a refined hypothesis.
     """
     logger.info("Creating Falsification Agent")
 
-    return Agent(
+    return with_llm_cache(Agent(
         role="Portfolio Falsification Analyst",
         goal="Define conditions that would falsify a refined trade hypothesis.",
         backstory=(
@@ -56,4 +64,4 @@ def create_falsification_agent():
         ),
         allow_delegation=False,
         verbose=True
-    )
+    ))
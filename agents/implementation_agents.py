@@ -1,19 +1,23 @@
 from crewai import Agent
 from tools.research_tools import research_tools, serper_logic_for_query
 from utils.utils import load_schema, get_current_date_for_prompting
+from utils.llm_cache import with_llm_cache
+from utils.registry import shared
 import logging
 
 
 logger = logging.getLogger(__name__)
 
 
-def create_portfolio_agent():
+@shared("run")
+def create_portfolio_agent(key: str | None = None):
     """
     Agent that takes refined trade hypotheses and constructs a portfolio.
+    `key` selects a separate instance per hypothesis within a run.
     """
     logger.info("Creating Portfolio Construction Agent")
 
-    return Agent(
+    return with_llm_cache(Agent(
         role="Portfolio Construction Strategist",
         goal="Translate refined trade hypotheses into an actionable portfolio with weights and risk controls.",
         backstory=(
@@ -24,4 +28,4 @@ def create_portfolio_agent():
         ),
         allow_delegation=False,
         verbose=True,
-    )
\ No newline at end of file
+    ))
\ No newline at end of file
@@ -2,19 +2,13 @@ import logging
 from crewai import Agent
 from tools.research_tools import research_tools
 from utils.utils import get_current_date_for_prompting
+from utils.llm_cache import with_llm_cache
+from utils.registry import shared
 
-# Set up logging
+# Set up logging (file handler is attached by utils.utils.configure_logging)
 logger = logging.getLogger("research_agent")
-logger.setLevel(logging.INFO)
-
-file_handler = logging.FileHandler("logs/research_agent.log")
-file_handler.setLevel(logging.INFO)
-
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-file_handler.setFormatter(formatter)
-
-logger.addHandler(file_handler)
 
+@shared("run")
 def create_banking_risk_research_agent() -> Agent:
     logger.info("Creating banking system fragility research agent...")
 
@@ -37,8 +31,9 @@ def create_banking_risk_research_agent() -> Agent:
     )
 
     logger.info("Banking system risk research agent created successfully.")
-    return agent
+    return with_llm_cache(agent)
 
+@shared("run")
 def create_fed_policy_research_agent() -> Agent:
     logger.info("Creating Federal Reserve monetary policy research agent...")
 
@@ -61,8 +56,9 @@ def create_fed_policy_research_agent() -> Agent:
     )
 
     logger.info("Federal Reserve policy research agent created successfully.")
-    return agent
+    return with_llm_cache(agent)
 
+@shared("run")
 def create_global_capital_flows_research_agent() -> Agent:
     logger.info("Creating Global Capital Flows research agent...")
 
@@ -83,8 +79,9 @@ def create_global_capital_flows_research_agent() -> Agent:
     )
 
     logger.info("Global Capital Flows agent created successfully.")
-    return agent
+    return with_llm_cache(agent)
 
+@shared("run")
 def create_fiscal_policy_research_agent() -> Agent:
     logger.info("Creating Fiscal Policy and Sovereign Balance Sheet research agent...")
 
@@ -105,8 +102,9 @@ def create_fiscal_policy_research_agent() -> Agent:
     )
 
     logger.info("Fiscal Policy agent created successfully.")
-    return agent
+    return with_llm_cache(agent)
 
+@shared("run")
 def create_macro_growth_research_agent() -> Agent:
     logger.info("Creating Macro Growth & Employment Indicators agent...")
 
@@ -127,8 +125,9 @@ def create_macro_growth_research_agent() -> Agent:
     )
 
     logger.info("Macro Growth agent created successfully.")
-    return agent
+    return with_llm_cache(agent)
 
+@shared("run")
 def create_macro_inflation_research_agent() -> Agent:
     logger.info("Creating Macro Inflation & Wages Indicators agent...")
 
@@ -148,4 +147,4 @@ def create_macro_inflation_research_agent() -> Agent:
     )
 
     logger.info("Macro Inflation agent created successfully.")
-    return agent
+    return with_llm_cache(agent)
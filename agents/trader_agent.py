@@ -1,10 +1,13 @@
 import logging
 from crewai import Agent
 from utils.utils import get_current_date_for_prompting
+from utils.llm_cache import with_llm_cache
+from utils.registry import shared
 from tools.research_tools import research_tools
 
 logger = logging.getLogger(__name__)
 
+@shared("run")
 def create_trader_agent() -> Agent:
     logger.info("Creating trader / hypothesis generator agent...")
 
@@ -27,4 +30,4 @@ def create_trader_agent() -> Agent:
     )
 
     logger.info("Trader / hypothesis generator agent created successfully.")
-    return agent
+    return with_llm_cache(agent)
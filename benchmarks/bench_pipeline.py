@@ -0,0 +1,208 @@
+# benchmarks/bench_pipeline.py
+"""
+Offline benchmark of the pipeline's orchestration performance.
+
+Runs `main.main()` (or `main.refine_hypothesis()`) against local stand-in LLM and
+Serper servers with configurable latency, and reports wall-time, per-stage latency,
+achieved concurrency and peak memory. With zero injected latency the wall-time is
+the pipeline's own overhead.
+
+Usage:
+    python benchmarks/bench_pipeline.py --llm-latency lognormal:0.5:0.3 --search-latency constant:0.1
+    python benchmarks/bench_pipeline.py --target refine --repeat 3 --output bench.json
+    python benchmarks/bench_pipeline.py --baseline bench.json --tolerance 0.2   # regression gate
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.stub_servers import LatencyModel, StubLLMServer, StubSearchServer  # noqa: E402
+
+logger = logging.getLogger("bench_pipeline")
+
+SAMPLE_HYPOTHESIS = json.dumps({
+    "name": "Benchmark Hypothesis",
+    "brief_description": "Long duration as growth slows.",
+    "detailed_description": "Stub thesis used for benchmarking the pipeline.",
+    "portfolio_instructions": {"asset_class": "rates", "instruments": ["TLT", "GLD"], "direction": "long"},
+})
+
+
+def configure_environment(llm_url: str, search_url: str) -> None:
+    """Points the LLM and Serper clients at the stub servers and disables caches, telemetry and price downloads."""
+    os.environ.update({
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_API_BASE": f"{llm_url}/v1",
+        "OPENAI_BASE_URL": f"{llm_url}/v1",
+        "SERPER_API_KEY": "benchmark",
+        "SERPER_BASE_URL": search_url,
+        "LLM_CACHE_MODE": "off",
+        "SEARCH_CACHE_MODE": "off",
+        "RESEARCH_FORCE_REFRESH": "1",  # repeats must not reuse the first run's research
+        "PRICE_STORE_OFFLINE": "1",  # optimizer, risk and stress stages read stored prices only
+        "OTEL_SDK_DISABLED": "true",
+        "CREWAI_DISABLE_TELEMETRY": "true",
+    })
+
+
+def prepare_workdir() -> str:
+    """Creates a scratch working directory so results/ and logs/ of real runs are untouched."""
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.symlink(os.path.join(REPO_ROOT, "schemas"), os.path.join(workdir, "schemas"))
+    os.makedirs(os.path.join(workdir, "logs"))
+    os.makedirs(os.path.join(workdir, "results"))
+    return workdir
+
+
+def timed_stages(stages, timings: dict):
+    """Wraps each stage's run coroutine to record (start, end) times."""
+    for stage in stages:
+        def wrap(run, name):
+            async def timed_run(inputs):
+                start = time.perf_counter()
+                try:
+                    return await run(inputs)
+                finally:
+                    timings[name] = (start, time.perf_counter())
+            return timed_run
+        stage.run = wrap(stage.run, stage.name)
+    return stages
+
+
+def concurrency_stats(timings: dict, wall_time: float) -> dict:
+    """Peak number of overlapping stages and mean concurrency (busy time / wall time)."""
+    events = sorted(
+        [(start, 1) for start, _ in timings.values()] + [(end, -1) for _, end in timings.values()],
+        key=lambda event: (event[0], event[1]),
+    )
+    running = peak = 0
+    for _, delta in events:
+        running += delta
+        peak = max(peak, running)
+    busy = sum(end - start for start, end in timings.values())
+    return {"peak_stages": peak, "mean_concurrency": busy / wall_time if wall_time else 0.0}
+
+
+async def run_once(main_module, target: str) -> dict:
+    timings: dict = {}
+    run_pipeline = main_module.run_pipeline
+
+    async def instrumented_run_pipeline(stages, *args, **kwargs):
+        return await run_pipeline(timed_stages(stages, timings), *args, **kwargs)
+
+    main_module.run_pipeline = instrumented_run_pipeline
+    try:
+        wall_start = time.perf_counter()
+        if target == "main":
+            await main_module.main()
+        else:
+            await main_module.refine_hypothesis(SAMPLE_HYPOTHESIS)
+        wall_time = time.perf_counter() - wall_start
+    finally:
+        main_module.run_pipeline = run_pipeline
+
+    return {
+        "wall_time": wall_time,
+        "stages": {name: end - start for name, (start, end) in sorted(timings.items(), key=lambda kv: kv[1][0])},
+        **concurrency_stats(timings, wall_time),
+    }
+
+
+def summarise(runs: list[dict]) -> dict:
+    walls = [run["wall_time"] for run in runs]
+    return {
+        "wall_time_median": statistics.median(walls),
+        "wall_time_min": min(walls),
+        "wall_time_max": max(walls),
+        "stages_median": {
+            name: statistics.median(run["stages"][name] for run in runs)
+            for name in runs[0]["stages"]
+        },
+        "peak_stages": max(run["peak_stages"] for run in runs),
+        "mean_concurrency": statistics.median(run["mean_concurrency"] for run in runs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=["main", "refine"], default="main")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--llm-latency", default="constant:0.2", help="e.g. constant:0.2, uniform:0.5:0.2, lognormal:0.5:0.3")
+    parser.add_argument("--search-latency", default="constant:0.05")
+    parser.add_argument("--tool-calls", type=int, default=1, help="Search actions per tool-using agent")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true", help="Track peak Python heap with tracemalloc (slows the run)")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Previous JSON report to compare wall-time against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    llm_server = StubLLMServer(LatencyModel.parse(args.llm_latency, seed=args.seed), tool_calls=args.tool_calls).start()
+    search_server = StubSearchServer(LatencyModel.parse(args.search_latency, seed=args.seed + 1)).start()
+    configure_environment(llm_server.url, search_server.url)
+
+    invocation_dir = os.getcwd()
+    workdir = prepare_workdir()
+    os.chdir(workdir)
+    if args.trace_memory:
+        tracemalloc.start()
+
+    import main as main_module
+
+    runs = [asyncio.run(run_once(main_module, args.target)) for _ in range(args.repeat)]
+
+    peak_traced = None
+    if args.trace_memory:
+        _, peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    llm_server.stop()
+    search_server.stop()
+
+    report = {
+        "target": args.target,
+        "repeat": args.repeat,
+        "llm_latency": args.llm_latency,
+        "search_latency": args.search_latency,
+        **summarise(runs),
+        "llm_requests": llm_server.requests,
+        "llm_peak_in_flight": llm_server.peak_in_flight,
+        "search_requests": search_server.requests,
+        "search_peak_in_flight": search_server.peak_in_flight,
+        "peak_python_memory_mb": peak_traced / 1024 / 1024 if peak_traced is not None else None,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "runs": runs,
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(os.path.join(invocation_dir, args.output), "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(os.path.join(invocation_dir, args.baseline), "r") as f:
+            baseline = json.load(f)
+        limit = baseline["wall_time_median"] * (1 + args.tolerance)
+        if report["wall_time_median"] > limit:
+            print(
+                f"REGRESSION: median wall-time {report['wall_time_median']:.3f}s exceeds "
+                f"baseline {baseline['wall_time_median']:.3f}s + {args.tolerance:.0%}",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
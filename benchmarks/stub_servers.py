@@ -0,0 +1,218 @@
+# benchmarks/stub_servers.py
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TOOL_NAME = "Search the internet with Serper"
+
+
+class LatencyModel:
+    """
+    Samples response latencies (seconds) from a simple distribution.
+
+    Args:
+        kind (str): "constant", "uniform" or "lognormal".
+        mean (float): Constant value, uniform midpoint, or lognormal median.
+        spread (float): Uniform half-width, or lognormal sigma.
+        seed (int, optional): Seed for reproducible samples.
+    """
+
+    def __init__(self, kind: str = "constant", mean: float = 0.0, spread: float = 0.0, seed: int | None = None):
+        if kind not in ("constant", "uniform", "lognormal"):
+            raise ValueError(f"Unsupported latency distribution: {kind}")
+        self.kind = kind
+        self.mean = mean
+        self.spread = spread
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "uniform":
+                return max(0.0, self._random.uniform(self.mean - self.spread, self.mean + self.spread))
+            if self.kind == "lognormal":
+                return self.mean * self._random.lognormvariate(0.0, self.spread)
+            return self.mean
+
+    @classmethod
+    def parse(cls, spec: str, seed: int | None = None) -> "LatencyModel":
+        """Parses "constant:0.5", "uniform:0.5:0.2" or "lognormal:0.5:0.3"."""
+        kind, *numbers = spec.split(":")
+        values = [float(n) for n in numbers] + [0.0, 0.0]
+        return cls(kind, values[0], values[1], seed=seed)
+
+
+class StubServer:
+    """
+    Threaded local HTTP server that counts requests and peak concurrency.
+    Subclasses implement `respond(path, body) -> dict`.
+    """
+
+    def __init__(self, latency: LatencyModel):
+        self.latency = latency
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def respond(self, path: str, body: dict) -> dict:
+        raise NotImplementedError
+
+    def start(self) -> "StubServer":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                with stub._lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                    time.sleep(stub.latency.sample())
+                    stub.send(self, self.path, body)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"{self.__class__.__name__} listening on {self.url}")
+        return self
+
+    def send(self, handler: BaseHTTPRequestHandler, path: str, body: dict) -> None:
+        payload = json.dumps(self.respond(path, body)).encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _canned_answer(prompt: str) -> str:
+    """Final answer shaped like what each pipeline stage expects."""
+    if "portfolio_schema" in prompt:
+        return json.dumps({
+            "name": "Benchmark Hypothesis",
+            "schema": {"properties": {
+                "assets": [
+                    {"ticker": "TLT", "ticker_name": "iShares 20+ Year Treasury Bond ETF", "weight": 0.6, "rationale": "Duration."},
+                    {"ticker": "GLD", "ticker_name": "SPDR Gold Shares", "weight": 0.4, "rationale": "Hedge."},
+                ],
+                "risk_metrics": {"expected_volatility": 12.0, "expected_drawdown": 15.0},
+                "portfolio_objective": "Benchmark portfolio.",
+            }},
+        })
+    if "falsification_schema" in prompt:
+        return json.dumps({
+            "index_triggers": {"S&P500": "rally +7% within 1 month"},
+            "macro_triggers": ["US CPI falls below 2% YoY for 2 months"],
+            "headline_triggers": [],
+            "other_triggers": [],
+        })
+    if "portfolio_instructions" in prompt:
+        return json.dumps({
+            "name": "Benchmark Hypothesis",
+            "brief_description": "Long duration as growth slows.",
+            "detailed_description": "Stub thesis used for benchmarking the pipeline.",
+            "portfolio_instructions": {"asset_class": "rates", "instruments": ["TLT", "GLD"], "direction": "long"},
+        })
+    return "Stub research summary used for benchmarking. " * 20
+
+
+class StubLLMServer(StubServer):
+    """
+    Minimal OpenAI-compatible chat completions endpoint (plain and streaming).
+
+    Agents with the Serper tool are answered with `tool_calls` search actions
+    before their final answer, so the search path is exercised too.
+    """
+
+    def __init__(self, latency: LatencyModel, tool_calls: int = 1):
+        super().__init__(latency)
+        self.tool_calls = tool_calls
+
+    def _content(self, body: dict) -> str:
+        messages = body.get("messages", [])
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        observations = prompt.count("Observation:") - prompt.count("Observation: the result of the action")
+        if SEARCH_TOOL_NAME in prompt and observations < self.tool_calls:
+            return (
+                "Thought: I should search for recent data.\n"
+                f"Action: {SEARCH_TOOL_NAME}\n"
+                f'Action Input: {{"search_query": "benchmark query {observations}"}}'
+            )
+        return f"Thought: I now know the final answer\nFinal Answer: {_canned_answer(prompt)}"
+
+    def respond(self, path, body):
+        content = self._content(body)
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": len(content) // 4, "total_tokens": 100 + len(content) // 4},
+        }
+
+    def send(self, handler, path, body):
+        if not body.get("stream"):
+            return super().send(handler, path, body)
+
+        completion = self.respond(path, body)
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.end_headers()
+
+        def chunk(delta, finish_reason=None, **extra):
+            data = {
+                "id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"],
+                "model": completion["model"],
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            handler.wfile.write(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+
+        words = completion["choices"][0]["message"]["content"].split(" ")
+        for i, word in enumerate(words):
+            chunk({"content": word if i == 0 else " " + word})
+        chunk({}, finish_reason="stop", usage=completion["usage"])
+        handler.wfile.write(b"data: [DONE]\n\n")
+
+
+class StubSearchServer(StubServer):
+    """Serper-compatible /search and /news endpoints returning canned results."""
+
+    def respond(self, path, body):
+        query = body.get("q", "")
+        if path.endswith("/news"):
+            return {"searchParameters": {"q": query}, "news": [
+                {"title": f"News about {query}", "link": "https://example.com/news", "snippet": "Stub news.", "date": "", "source": "stub"}
+            ]}
+        return {"searchParameters": {"q": query}, "organic": [
+            {"title": f"Result {i} for {query}", "link": f"https://example.com/{i}", "snippet": "Stub snippet.", "position": i}
+            for i in range(1, 6)
+        ], "credits": 1}
@@ -0,0 +1,421 @@
+"""
+Command-line entry point for running the pipeline or a single part of it.
+
+Each subcommand imports only the modules it needs, when it runs: `evaluate` never
+loads crewai, and nothing is configured (env, log files) until a command starts.
+
+Usage:
+    python cli.py run                                   # full pipeline, same as main.py
+    python cli.py research                              # research crews -> results/research_summary.json
+    python cli.py trade                                 # trader on results/research_summary.json
+    python cli.py refine                                # critic/refiner/portfolio on results/initial_hypothesis.json
+    python cli.py evaluate --portfolio results/portfolio.json --risk-free-rate 0.03
+    python cli.py backtest --portfolio results/portfolio.json --start 2015-01-01 --every QS --rebalance M
+    python cli.py backtest --ledger-days 365                          # every portfolio past runs produced
+    python cli.py optimize --portfolio results/portfolio.json --method min_variance --max-weight 0.3
+    python cli.py risk --portfolio results/portfolio.json --paths 200000 --seed 1
+    python cli.py stress --portfolio results/portfolio.json results/hypotheses/*/portfolio.json
+    python cli.py history --stage portfolio --ticker TLT --days 90
+    python cli.py monitor --since 2024-01-01                   # which falsification triggers have fired
+    python cli.py monitor --watch --interval 300               # alert as new bars arrive
+    python cli.py serve --port 8765                     # job service, see service.py
+    python cli.py shard runs.json --processes 4         # many run configurations, see sharding.py
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+
+def _prepare_run(args):
+    """Loads .env, sets up log files and makes sure results/ exists."""
+    import os
+    from utils.utils import configure_environment, configure_logging
+
+    configure_environment()
+    configure_logging()
+    os.makedirs("results", exist_ok=True)
+
+    if getattr(args, "force_refresh", False):
+        os.environ["RESEARCH_FORCE_REFRESH"] = "1"
+
+    if args.stream:
+        from utils.streaming import get_agent_stream
+
+        os.environ["AGENT_STREAMING"] = "1"
+        get_agent_stream().add_callback(lambda chunk: print(chunk.text, end="", file=sys.stderr, flush=True))
+
+
+def _read(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
+
+def cmd_run(args):
+    _prepare_run(args)
+    import main
+
+    asyncio.run(main.main())
+
+
+def cmd_research(args):
+    _prepare_run(args)
+    import main
+
+    asyncio.run(main.research())
+
+
+def cmd_trade(args):
+    _prepare_run(args)
+    import main
+
+    asyncio.run(main.trade(_read(args.research)))
+
+
+def cmd_refine(args):
+    _prepare_run(args)
+    import main
+
+    asyncio.run(main.refine_hypothesis(_read(args.hypothesis)))
+
+
+def cmd_evaluate(args):
+    import logging
+    from utils.utils import configure_logging
+    from utils.portfolio_evals import (
+        calculate_sharpe_ratio,
+        evaluate_portfolios,
+        get_portfolio_prices_and_value,
+    )
+
+    configure_logging(level=logging.WARNING)
+    portfolios = [json.loads(_read(path)) for path in args.portfolio]
+
+    if len(portfolios) == 1:
+        latest_df, portfolio_value_df = get_portfolio_prices_and_value(portfolios[0], start=args.start, end=args.end)
+        sharpe_ratio = calculate_sharpe_ratio(
+            portfolio_value_df, risk_free_rate=args.risk_free_rate, start=args.start, end=args.end
+        )
+        print("Latest Portfolio Snapshot:")
+        print(latest_df.to_string(index=False))
+        print(f"\nCumulative Return: {portfolio_value_df['Cumulative_Return'].iloc[-1]:.2%}")
+        print(f"Sharpe Ratio: {sharpe_ratio:.3f}")
+        return
+
+    _, _, cumulative_df, sharpe = evaluate_portfolios(
+        portfolios, start=args.start, end=args.end, risk_free_rate=args.risk_free_rate
+    )
+    summary = sharpe.to_frame()
+    summary["Cumulative_Return"] = cumulative_df.iloc[-1]
+    print(summary.to_string())
+
+
+def cmd_backtest(args):
+    import logging
+    import pandas as pd
+    from utils.utils import configure_logging
+    from utils.backtest import backtest_dated_portfolios, backtest_portfolios, ledger_portfolios
+
+    configure_logging(level=logging.WARNING)
+    rebalance = None if args.rebalance == "none" else int(args.rebalance) if args.rebalance.isdigit() else args.rebalance
+    options = dict(end=args.end, rebalance=rebalance, cost_bps=args.cost_bps, risk_free_rate=args.risk_free_rate)
+
+    if args.ledger_days is not None:
+        from utils.run_ledger import get_run_ledger
+
+        rows = ledger_portfolios(get_run_ledger(), days=args.ledger_days)
+        if not rows:
+            raise SystemExit(f"No portfolios recorded in the last {args.ledger_days:g} days")
+        result = backtest_dated_portfolios(
+            [(pd.to_datetime(row["created_at"], unit="s"), row["content"]) for row in rows], **options
+        )
+        result["portfolio"] = [rows[i]["hypothesis"] or rows[i]["run_id"] for i in result["portfolio"]]
+    else:
+        starts = args.start
+        if args.every:
+            starts = pd.date_range(args.start[0], args.end or pd.Timestamp.today(), freq=args.every).strftime("%Y-%m-%d").tolist()
+        result = backtest_portfolios([json.loads(_read(path)) for path in args.portfolio], starts, **options)
+
+    if args.output:
+        result.to_csv(args.output, index=False)
+    print(result.to_string(index=False))
+
+
+def cmd_optimize(args):
+    import logging
+    from utils.utils import configure_logging
+    from utils.portfolio_optimizer import optimize_portfolio
+
+    configure_logging(level=logging.WARNING)
+    options = {
+        name: value for name, value in (
+            ("method", args.method), ("end", args.end), ("lookback_days", args.lookback_days),
+            ("min_weight", args.min_weight), ("max_weight", args.max_weight), ("risk_aversion", args.risk_aversion),
+        ) if value is not None
+    }
+    optimized = optimize_portfolio(json.loads(_read(args.portfolio)), **options)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(optimized, f, indent=2)
+    print(json.dumps(optimized["optimization"], indent=2))
+
+
+def cmd_risk(args):
+    import logging
+    from utils.utils import configure_logging
+    from utils.risk_simulation import simulate_portfolio_risk
+
+    configure_logging(level=logging.WARNING)
+    options = {
+        name: value for name, value in (
+            ("n_paths", args.paths), ("horizon", args.horizon), ("block_days", args.block_days),
+            ("method", args.method), ("seed", args.seed), ("end", args.end), ("history_days", args.history_days),
+        ) if value is not None
+    }
+    results = {path: simulate_portfolio_risk(json.loads(_read(path)), **options) for path in args.portfolio}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+def cmd_stress(args):
+    import logging
+    from utils.utils import configure_logging
+    from utils.stress_scenarios import DEFAULT_MAX_LOSS, stress_test_portfolios, stress_test
+
+    configure_logging(level=logging.WARNING)
+    portfolios = [json.loads(_read(path)) for path in args.portfolio]
+    if args.json:
+        max_loss = args.max_loss if args.max_loss is not None else DEFAULT_MAX_LOSS
+        print(json.dumps({path: stress_test(p, max_loss=max_loss) for path, p in zip(args.portfolio, portfolios)}, indent=2))
+        return
+    result = stress_test_portfolios(portfolios) * 100
+    result.columns = args.portfolio
+    print(result.round(2).to_string())
+
+
+def cmd_history(args):
+    import time
+    from datetime import datetime
+    from utils.run_ledger import SECONDS_PER_DAY, get_run_ledger
+
+    rows = get_run_ledger().artifacts(
+        stage=args.stage,
+        hypothesis=args.hypothesis,
+        ticker=args.ticker,
+        since=time.time() - args.days * SECONDS_PER_DAY,
+        limit=args.limit,
+    )
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    for row in rows:
+        recorded = datetime.fromtimestamp(row["created_at"]).strftime("%Y-%m-%d %H:%M")
+        print(f"{recorded}  run={row['run_id']}  stage={row['stage']}  hypothesis={row['hypothesis'] or '-'}")
+
+
+def cmd_monitor(args):
+    import logging
+    import time
+    import pandas as pd
+    from utils.utils import configure_logging
+    from utils.falsification_monitor import FalsificationMonitor, latest_falsifications, load_prices
+    from utils.run_ledger import get_run_ledger
+
+    configure_logging(level=logging.WARNING)
+    ledger = get_run_ledger()
+    if args.falsification:
+        theses = {path: json.loads(_read(path)) for path in args.falsification}
+    else:
+        theses = latest_falsifications(ledger, days=args.days)
+    monitor = FalsificationMonitor()
+    for thesis, falsification in theses.items():
+        monitor.add_thesis(thesis, falsification)
+    if not monitor.features:
+        raise SystemExit("No machine-checkable falsification triggers found")
+
+    if not args.watch:
+        result = monitor.scan(load_prices(monitor.tickers, start=args.since))
+        print(result.to_string(index=False))
+        return
+
+    # Enough history before today for the longest window, in calendar days
+    start = (pd.Timestamp.today() - pd.Timedelta(days=2 * monitor.lookback + 10)).strftime("%Y-%m-%d")
+    prices = load_prices(monitor.tickers, start=start)
+    monitor.seed(prices)
+    last_seen, tickers = prices.index.max(), list(prices.columns)
+    print(f"Watching {len(monitor.tickers)} tickers for {len(theses)} theses (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(args.interval)
+            prices = load_prices(tickers, start=start)
+            new_bars = prices[prices.index > last_seen]
+            if new_bars.empty:
+                continue
+            last_seen = new_bars.index.max()
+            for event in monitor.update(new_bars):
+                ledger.record(None, "falsification_trigger", event.to_dict(), hypothesis=event.thesis)
+                print(f"{event.timestamp:%Y-%m-%d}  FIRED  {event.thesis}: {event.description}  [{event.expression}]")
+    except KeyboardInterrupt:
+        pass
+
+
+def cmd_serve(args):
+    _prepare_run(args)
+    import service
+
+    try:
+        asyncio.run(service.serve(host=args.host, port=args.port, workers=args.workers, warm=not args.no_warm_up))
+    except KeyboardInterrupt:
+        pass
+
+
+def cmd_shard(args):
+    from utils.utils import configure_logging
+    import sharding
+
+    configure_logging()
+    env = sharding.worker_env(args.run_concurrency, args.hypothesis_concurrency)
+    configs = sharding.load_run_configs(args.configs) if args.configs else []
+
+    if args.queue:
+        queue = sharding.RunQueue(args.queue)
+        if configs:
+            print(f"Queued {queue.enqueue(configs)} new runs in {args.queue}")
+        sharding.work_queue(queue, processes=args.processes, workdir_base=args.workdir, default_env=env)
+        if queue.pending():
+            print(f"{queue.pending()} runs still in progress on other workers")
+        results = queue.results()
+    elif configs:
+        results = sharding.run_sharded(configs, processes=args.processes, workdir_base=args.workdir, default_env=env)
+    else:
+        raise SystemExit("shard needs a run configuration file, a --queue, or both")
+
+    merged = sharding.merge_results(results, args.output)
+    for name, result in merged["runs"].items():
+        print(f"{name}: {result['status']}  ({result['workdir']})")
+    return 1 if merged["failed"] else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    run = subcommands.add_parser("run", help="Run the full pipeline")
+    run.set_defaults(func=cmd_run)
+    research = subcommands.add_parser("research", help="Run the research crews")
+    research.set_defaults(func=cmd_research)
+    for research_command in (run, research):
+        research_command.add_argument(
+            "--force-refresh", action="store_true", help="Rerun every research topic, even if its last output is fresh"
+        )
+
+    trade = subcommands.add_parser("trade", help="Run the trader on a research summary")
+    trade.add_argument("--research", default="results/research_summary.json")
+    trade.set_defaults(func=cmd_trade)
+
+    refine = subcommands.add_parser("refine", help="Refine a trader hypothesis into a portfolio")
+    refine.add_argument("--hypothesis", default="results/initial_hypothesis.json")
+    refine.set_defaults(func=cmd_refine)
+
+    serve = subcommands.add_parser("serve", help="Run a long-lived service that accepts pipeline jobs over HTTP")
+    serve.add_argument("--host", default=None, help="Bind address (default: SERVICE_HOST or 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=None, help="Port (default: SERVICE_PORT or 8765)")
+    serve.add_argument("--workers", type=int, default=None, help="Concurrent jobs (default: SERVICE_WORKERS or 4)")
+    serve.add_argument("--no-warm-up", action="store_true", help="Skip loading agents, tools and stores at start")
+    serve.set_defaults(func=cmd_serve)
+
+    shard = subcommands.add_parser("shard", help="Run many pipeline configurations across processes (and hosts)")
+    shard.add_argument("configs", nargs="?", help="JSON list of run configurations (see sharding.py)")
+    shard.add_argument("--processes", type=int, default=None, help="Runs in flight on this host (default: CPU count)")
+    shard.add_argument("--queue", help="SQLite work queue shared between workers/hosts")
+    shard.add_argument("--workdir", default="runs", help="Directory for each run's results/ and logs/")
+    shard.add_argument("--output", default="results/sharded_runs.json", help="Merged results of every run")
+    shard.add_argument("--run-concurrency", type=int, default=None, help="PIPELINE_MAX_CONCURRENCY for each run")
+    shard.add_argument("--hypothesis-concurrency", type=int, default=None, help="HYPOTHESIS_MAX_CONCURRENCY for each run")
+    shard.set_defaults(func=cmd_shard)
+
+    for agent_command in (run, research, trade, refine, serve):
+        agent_command.add_argument("--stream", action="store_true", help="Print agent output to stderr as it is generated")
+
+    evaluate = subcommands.add_parser("evaluate", help="Evaluate saved portfolios (no agents)")
+    evaluate.add_argument("--portfolio", nargs="+", default=["results/portfolio.json"])
+    evaluate.add_argument("--start", default="2024-01-01")
+    evaluate.add_argument("--end", default=None)
+    evaluate.add_argument(
+        "--risk-free-rate", type=float, default=None,
+        help="Annual rate, e.g. 0.03 (default: S&P 500 mean return as benchmark)",
+    )
+    evaluate.set_defaults(func=cmd_evaluate)
+
+    backtest = subcommands.add_parser("backtest", help="Walk-forward backtest of saved or past-run portfolios (no agents)")
+    backtest.add_argument("--portfolio", nargs="+", default=["results/portfolio.json"])
+    backtest.add_argument("--ledger-days", type=float, default=None,
+                          help="Instead of --portfolio, backtest every portfolio recorded in the run ledger over this many days, each from its own date")
+    backtest.add_argument("--start", nargs="+", default=["2024-01-01"], help="Start dates (YYYY-MM-DD)")
+    backtest.add_argument("--every", help="Pandas frequency (e.g. MS, QS) for start dates from the first --start to --end")
+    backtest.add_argument("--end", default=None)
+    backtest.add_argument("--rebalance", default="M", help="W, M, Q, Y, a number of trading days, or none")
+    backtest.add_argument("--cost-bps", type=float, default=10.0, help="Cost per unit of one-way turnover, in basis points")
+    backtest.add_argument("--risk-free-rate", type=float, default=0.0)
+    backtest.add_argument("--output", help="Also write the results as CSV")
+    backtest.set_defaults(func=cmd_backtest)
+
+    optimize = subcommands.add_parser("optimize", help="Re-weight a saved portfolio from its tickers' covariance (no agents)")
+    optimize.add_argument("--portfolio", default="results/portfolio.json")
+    optimize.add_argument("--method", choices=["risk_parity", "min_variance", "mean_variance"], default=None,
+                          help="Default: PORTFOLIO_OPTIMIZER, else risk_parity")
+    optimize.add_argument("--end", default=None, help="End of the estimation window (default: today)")
+    optimize.add_argument("--lookback-days", type=int, default=None, help="Trading days of returns to estimate from (default 756)")
+    optimize.add_argument("--min-weight", type=float, default=None, help="Default: PORTFOLIO_MIN_WEIGHT, else 0")
+    optimize.add_argument("--max-weight", type=float, default=None, help="Default: PORTFOLIO_MAX_WEIGHT, else 0.4")
+    optimize.add_argument("--risk-aversion", type=float, default=None, help="For mean_variance (default 4)")
+    optimize.add_argument("--output", help="Write the re-weighted portfolio here")
+    optimize.set_defaults(func=cmd_optimize)
+
+    risk = subcommands.add_parser("risk", help="Monte Carlo VaR, CVaR and drawdowns of saved portfolios (no agents)")
+    risk.add_argument("--portfolio", nargs="+", default=["results/portfolio.json"])
+    risk.add_argument("--paths", type=int, default=None, help="Simulated paths (default: RISK_SIM_PATHS, else 100000)")
+    risk.add_argument("--horizon", type=int, default=None, help="Trading days per path (default 252)")
+    risk.add_argument("--block-days", type=float, default=None, help="Mean (stationary) or fixed (block) block length (default 10)")
+    risk.add_argument("--method", choices=["stationary", "block"], default=None)
+    risk.add_argument("--seed", type=int, default=None)
+    risk.add_argument("--end", default=None, help="End of the resampled history (default: today)")
+    risk.add_argument("--history-days", type=int, default=None, help="Trading days of history to resample (default 2520)")
+    risk.add_argument("--output", help="Also write the results as JSON")
+    risk.set_defaults(func=cmd_risk)
+
+    stress = subcommands.add_parser("stress", help="Returns of saved portfolios in historical stress scenarios (no agents)")
+    stress.add_argument("--portfolio", nargs="+", default=["results/portfolio.json"])
+    stress.add_argument("--max-loss", type=float, default=None, help="With --json, worst loss allowed, e.g. 0.3 (default: STRESS_MAX_LOSS)")
+    stress.add_argument("--json", action="store_true", help="Per-portfolio detail: pass/fail, worst scenario, proxies used")
+    stress.set_defaults(func=cmd_stress)
+
+    history = subcommands.add_parser("history", help="Query outputs of past runs from the run ledger")
+    history.add_argument("--stage", help="e.g. portfolio, refiner, research_fed_policy")
+    history.add_argument("--hypothesis")
+    history.add_argument("--ticker", help="Only portfolios holding this ticker")
+    history.add_argument("--days", type=float, default=90)
+    history.add_argument("--limit", type=int, default=None)
+    history.add_argument("--json", action="store_true", help="Print full rows, including content")
+    history.set_defaults(func=cmd_history)
+
+    monitor = subcommands.add_parser("monitor", help="Check price data against the falsification triggers of past runs (no agents)")
+    monitor.add_argument("--falsification", nargs="+", help="Falsification JSON files (default: latest per hypothesis in the run ledger)")
+    monitor.add_argument("--days", type=float, default=30, help="How far back to look for theses in the run ledger")
+    monitor.add_argument("--since", default=None, help="Scan from this date (YYYY-MM-DD)")
+    monitor.add_argument("--watch", action="store_true", help="Keep polling the price store and report triggers as they fire")
+    monitor.add_argument("--interval", type=float, default=300, help="Seconds between polls with --watch")
+    monitor.set_defaults(func=cmd_monitor)
+
+    return parser
+
+
+def main(argv: list[str] | None = None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from utils.tracing import span
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    """
+    A single node of the pipeline graph.
+
+    Attributes:
+        name (str): Unique stage name; other stages refer to it in their `inputs`.
+        run (callable): Coroutine function called as `run(inputs)` where `inputs` maps
+            each declared input name to that stage's output object.
+        inputs (list[str]): Names of the stages (or initial values) this stage needs.
+    """
+    name: str
+    run: Callable[[dict[str, Any]], Awaitable[Any]]
+    inputs: list[str] = field(default_factory=list)
+
+
+def _validate_stages(stages: list[Stage], available: set[str]) -> None:
+    """Raises ValueError on duplicate names, unknown inputs or dependency cycles."""
+    names = [stage.name for stage in stages]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Duplicate stage names: {sorted(duplicates)}")
+
+    known = set(names) | available
+    for stage in stages:
+        missing = [name for name in stage.inputs if name not in known]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown inputs: {missing}")
+
+    # Kahn's algorithm: anything left unresolved sits on a cycle
+    resolved = set(available)
+    pending = {stage.name: set(stage.inputs) for stage in stages}
+    while pending:
+        ready = [name for name, deps in pending.items() if deps <= resolved]
+        if not ready:
+            raise ValueError(f"Dependency cycle between stages: {sorted(pending)}")
+        for name in ready:
+            resolved.add(name)
+            del pending[name]
+
+
+async def run_pipeline(
+    stages: list[Stage],
+    initial: dict[str, Any] | None = None,
+    max_concurrency: int | None = None,
+) -> dict[str, Any]:
+    """
+    Runs a dependency graph of stages, starting each one as soon as its inputs are ready.
+
+    Outputs are handed to dependent stages as Python objects, so a stage can pass e.g. an
+    executed crewai Task on to the next one instead of re-serialising it into a prompt.
+
+    Args:
+        stages (list[Stage]): Stages to run, in any order.
+        initial (dict, optional): Pre-computed values that stages may list as inputs.
+        max_concurrency (int, optional): Maximum number of stages running at once.
+
+    Returns:
+        dict[str, Any]: Output of every stage (and the initial values), keyed by name.
+    """
+    outputs: dict[str, Any] = dict(initial or {})
+    _validate_stages(stages, set(outputs))
+
+    logger.info(f"Starting pipeline with {len(stages)} stages: {[stage.name for stage in stages]}")
+
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+    loop = asyncio.get_running_loop()
+    futures: dict[str, asyncio.Future] = {stage.name: loop.create_future() for stage in stages}
+    for name, value in outputs.items():
+        futures.setdefault(name, loop.create_future()).set_result(value)
+
+    async def run_stage(stage: Stage):
+        inputs = {name: await futures[name] for name in stage.inputs}
+        logger.info(f"Stage '{stage.name}' ready, inputs: {stage.inputs}")
+
+        if semaphore is None:
+            with span(stage.name, "stage"):
+                result = await stage.run(inputs)
+        else:
+            ready_at = time.perf_counter()
+            async with semaphore:
+                with span(stage.name, "stage", queue_wait=time.perf_counter() - ready_at):
+                    result = await stage.run(inputs)
+
+        logger.info(f"Stage '{stage.name}' completed")
+        outputs[stage.name] = result
+        futures[stage.name].set_result(result)
+
+    tasks = [asyncio.ensure_future(run_stage(stage)) for stage in stages]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # A failed stage leaves its dependents waiting forever, so stop everything
+        for task in tasks:
+            task.cancel()
+        for future in futures.values():
+            future.cancel()
+        raise
+
+    logger.info("Pipeline completed.")
+    return outputs
@@ -1,44 +1,106 @@
 import logging
 from crewai import Crew
 import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.tracing import install_crewai_listeners, span
 
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_CONCURRENCY = 3
+
 
-async def run_parallel_crews(task_agent_pairs: list[tuple]) -> list[str]:
+async def run_parallel_crews(
+    task_agent_pairs: list[tuple],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    timeout: float | None = None,
+) -> list[tuple]:
     """
-    Runs multiple (agent, task) pairs in parallel and returns their outputs.
+    Runs multiple (task, agent) pairs concurrently and returns their outputs.
+
+    `Crew.kickoff()` is blocking, so each crew is offloaded to a bounded thread
+    pool; the event loop stays free while the LLM round-trips are in flight.
 
     Args:
         task_agent_pairs (list of tuples): Each tuple should contain a Task and its corresponding Agent.
+        max_concurrency (int): Maximum number of crews running at the same time.
+        timeout (float, optional): Per-crew timeout in seconds, counted from when the crew
+            starts running rather than from when it was queued. A crew that exceeds it
+            raises asyncio.TimeoutError and the remaining crews are cancelled.
 
     Returns:
-        List of task outputs (strings).
+        List of (task description, agent role, crew output) tuples, in input order.
     """
-    logger.info("Starting parallel execution of crews...")
+    logger.info(
+        f"Starting parallel execution of {len(task_agent_pairs)} crews "
+        f"(max_concurrency={max_concurrency}, timeout={timeout})..."
+    )
 
-    semaphore = asyncio.Semaphore(3)  # max 3 concurrent requests
+    install_crewai_listeners()
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, max_concurrency),
+        thread_name_prefix="crew",
+    )
+    # One slot per worker: a crew holding a slot starts on a worker immediately
+    slots = asyncio.Semaphore(max(1, max_concurrency))
+
+    def kickoff(crew, agent, submitted_at):
+        with span(agent.role, "crew", queue_wait=time.perf_counter() - submitted_at, agent=agent.role) as crew_span:
+            output = crew.kickoff()
+            usage = getattr(output, "token_usage", None)
+            if usage is not None:
+                crew_span.set(
+                    prompt_tokens=usage.prompt_tokens,
+                    completion_tokens=usage.completion_tokens,
+                    cached_prompt_tokens=usage.cached_prompt_tokens,
+                    successful_requests=usage.successful_requests,
+                )
+            return output
 
     async def run_single_crew(task, agent):
         logger.info(f"Launching crew for agent: {agent.role}")
 
-        async with semaphore:
-            crew = Crew(
-                agents=[agent],
-                tasks=[task],
-                verbose=True
-            )
-            output = crew.kickoff()
-            logger.info(f"Completed crew for agent: {agent.role}")
-            
-            return (task.description, agent.role, output)
+        crew = Crew(
+            agents=[agent],
+            tasks=[task],
+            verbose=True
+        )
+        # Copy the context so spans opened in the worker thread nest under the caller's span
+        context = contextvars.copy_context()
+        submitted_at = time.perf_counter()
+        async with slots:
+            # The timeout only starts once the crew has a worker, not while it waits for one
+            future = loop.run_in_executor(executor, context.run, kickoff, crew, agent, submitted_at)
+            try:
+                output = await asyncio.wait_for(future, timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Crew for agent {agent.role} timed out after {timeout}s")
+                raise
+        logger.info(f"Completed crew for agent: {agent.role}")
+
+        return (task.description, agent.role, output)
 
     # Create coroutine tasks
-    coroutines = [run_single_crew(task, agent) for task, agent in task_agent_pairs]
+    coroutines = [
+        asyncio.ensure_future(run_single_crew(task, agent))
+        for task, agent in task_agent_pairs
+    ]
 
-    # Gather all results
-    results = await asyncio.gather(*coroutines)
+    try:
+        # gather preserves input order regardless of completion order
+        results = await asyncio.gather(*coroutines)
+    except BaseException:
+        for coroutine in coroutines:
+            coroutine.cancel()
+        raise
+    finally:
+        # Crews still queued behind the pool are dropped; a kickoff that is already
+        # running in a worker thread cannot be interrupted and finishes in the background.
+        executor.shutdown(wait=False, cancel_futures=True)
 
-    logger.info("All research crews completed.")
-    return results
\ No newline at end of file
+    logger.info("All crews completed.")
+    return results
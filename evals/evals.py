@@ -1,9 +1,13 @@
-import yfinance as yf
+import numpy as np
 import pandas as pd
 
+from utils.portfolio_evals import get_portfolio_prices_and_value
+from utils.price_store import get_price_store, period_to_start
+
 def fetch_historical_data(ticker, period="5y", interval="1d"):
     """
-    Fetch historical market data for a given ticker using yfinance.
+    Fetch historical market data for a given ticker from the local price store,
+    which downloads from yfinance only the bars it does not already hold.
     
     Args:
         ticker (str): The ticker symbol to fetch data for.
@@ -14,9 +18,7 @@ def fetch_historical_data(ticker, period="5y", interval="1d"):
         pd.DataFrame: A DataFrame containing the historical market data.
     """
     try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period=period, interval=interval)
-        return hist
+        return get_price_store().get_bars(ticker, start=period_to_start(period), interval=interval)
     except Exception as e:
         print(f"Error fetching data for {ticker}: {e}")
         return pd.DataFrame()
@@ -35,3 +37,169 @@ def calc_max_drawdown(prices):
     drawdown = (prices - roll_max) / roll_max
     max_dd = drawdown.min()
     return max_dd
+
+
+def fetch_price_matrix(tickers, period="5y", interval="1d"):
+    """
+    Fetch an aligned (dates x tickers) matrix of close prices from the local price store.
+
+    Args:
+        tickers (list[str]): Ticker symbols.
+        period (str): The period of data to fetch (e.g., "1y", "5y", "ytd", "max").
+        interval (str): The data interval (e.g., "1d", "1wk").
+
+    Returns:
+        pd.DataFrame: Close prices, one column per ticker.
+    """
+    return get_price_store().get_prices(tickers, start=period_to_start(period), interval=interval)
+
+
+def _drawdown_statistics(drawdown):
+    """
+    Per-column max drawdown, longest underwater stretch and recovery time of the
+    deepest drawdown, for a (dates x tickers) drawdown array. Durations are in bars.
+    """
+    n_rows = drawdown.shape[0]
+    underwater = drawdown < 0
+
+    # Length of the current underwater run at every row, reset whenever back at a peak
+    counts = np.cumsum(underwater, axis=0)
+    resets = np.maximum.accumulate(np.where(underwater, 0, counts), axis=0)
+    run_length = counts - resets
+
+    filled = np.where(np.isnan(drawdown), 0.0, drawdown)
+    trough = np.argmin(filled, axis=0)
+    rows = np.arange(n_rows)[:, None]
+
+    # Peak: last row at or before the trough with no drawdown
+    at_peak = (filled >= 0) & (rows <= trough)
+    peak = n_rows - 1 - np.argmax(at_peak[::-1], axis=0)
+
+    # Recovery: first row after the trough back at the previous peak
+    recovered = (filled >= 0) & (rows > trough)
+    has_recovered = recovered.any(axis=0)
+    recovery = np.where(has_recovered, np.argmax(recovered, axis=0), -1)
+
+    return {
+        "max_drawdown": filled.min(axis=0),
+        "max_drawdown_duration": run_length.max(axis=0),
+        "peak": peak,
+        "trough": trough,
+        "recovery": recovery,
+        "time_to_recovery": np.where(has_recovered, recovery - trough, np.nan),
+    }
+
+
+def _rolling_max_drawdown(prices, window, chunk_size=32):
+    """
+    Max drawdown within each trailing `window` of bars, for every column.
+    Columns are processed in chunks so memory stays at roughly rows * window * chunk_size.
+    """
+    n_rows, n_cols = prices.shape
+    result = np.full((n_rows, n_cols), np.nan)
+    if n_rows < window:
+        return result
+
+    for start in range(0, n_cols, chunk_size):
+        block = prices[:, start:start + chunk_size]
+        windows = np.lib.stride_tricks.sliding_window_view(block, window, axis=0)  # (rows-w+1, cols, w)
+        peaks = np.maximum.accumulate(windows, axis=-1)
+        result[window - 1:, start:start + chunk_size] = (windows / peaks - 1).min(axis=-1)
+    return result
+
+
+def compute_risk_metrics(prices, window=63, risk_free_rate=0.0, periods_per_year=252):
+    """
+    Compute rolling and expanding risk metrics for every column of a price matrix in one
+    vectorised pass.
+
+    Args:
+        prices (pd.DataFrame): Prices, one column per ticker (e.g. from fetch_price_matrix).
+        window (int): Rolling window length in bars (63 is roughly one quarter of trading days).
+        risk_free_rate (float): Annual risk-free rate used for Sharpe and Sortino.
+        periods_per_year (int): Bars per year, used for annualisation.
+
+    Returns:
+        dict[str, pd.DataFrame]: Time series of rolling_volatility, expanding_volatility,
+            rolling_sharpe, expanding_sharpe, rolling_sortino, expanding_sortino, drawdown,
+            rolling_max_drawdown and expanding_max_drawdown, plus a per-ticker "summary"
+            with full-period volatility, Sharpe, Sortino, max drawdown, peak/trough/recovery
+            dates, longest drawdown duration and time to recovery (both in bars).
+    """
+    if isinstance(prices, pd.Series):
+        prices = prices.to_frame()
+
+    returns = prices.pct_change(fill_method=None)
+    rf = (1 + risk_free_rate) ** (1 / periods_per_year) - 1
+    excess = returns - rf
+    downside_sq = np.minimum(excess, 0) ** 2
+    annualise = np.sqrt(periods_per_year)
+
+    rolling, expanding = excess.rolling(window, min_periods=window), excess.expanding(min_periods=2)
+    rolling_vol = returns.rolling(window, min_periods=window).std() * annualise
+    expanding_vol = returns.expanding(min_periods=2).std() * annualise
+    rolling_sharpe = rolling.mean() / rolling.std() * annualise
+    expanding_sharpe = expanding.mean() / expanding.std() * annualise
+    rolling_sortino = rolling.mean() / np.sqrt(downside_sq.rolling(window, min_periods=window).mean()) * annualise
+    expanding_sortino = expanding.mean() / np.sqrt(downside_sq.expanding(min_periods=2).mean()) * annualise
+
+    values = prices.to_numpy(dtype=float)
+    running_max = np.fmax.accumulate(values, axis=0)
+    drawdown = values / running_max - 1
+    stats = _drawdown_statistics(drawdown)
+
+    def frame(array):
+        return pd.DataFrame(array, index=prices.index, columns=prices.columns)
+
+    def dates(positions, valid=True):
+        return [prices.index[p] if ok and p >= 0 else pd.NaT for p, ok in zip(positions, np.broadcast_to(valid, positions.shape))]
+
+    has_drawdown = stats["max_drawdown"] < 0
+    summary = pd.DataFrame({
+        "volatility": expanding_vol.iloc[-1],
+        "sharpe": expanding_sharpe.iloc[-1],
+        "sortino": expanding_sortino.iloc[-1],
+        "max_drawdown": stats["max_drawdown"],
+        "max_drawdown_peak": dates(stats["peak"], has_drawdown),
+        "max_drawdown_trough": dates(stats["trough"], has_drawdown),
+        "recovery_date": dates(stats["recovery"], has_drawdown),
+        "max_drawdown_duration": stats["max_drawdown_duration"],
+        "time_to_recovery": np.where(has_drawdown, stats["time_to_recovery"], 0),
+    }, index=prices.columns)
+
+    return {
+        "rolling_volatility": rolling_vol,
+        "expanding_volatility": expanding_vol,
+        "rolling_sharpe": rolling_sharpe,
+        "expanding_sharpe": expanding_sharpe,
+        "rolling_sortino": rolling_sortino,
+        "expanding_sortino": expanding_sortino,
+        "drawdown": frame(drawdown),
+        "rolling_max_drawdown": frame(_rolling_max_drawdown(values, window)),
+        "expanding_max_drawdown": frame(np.fmin.accumulate(drawdown, axis=0)),
+        "summary": summary,
+    }
+
+
+def compare_risk_estimates(portfolio, start="2024-01-01", end=None):
+    """
+    Compare the LLM's expected_volatility / expected_drawdown for a portfolio with the
+    realised values of its price history.
+
+    Args:
+        portfolio (dict): Portfolio schema output (see schemas/portfolio.json).
+        start (str): Start date for price history (YYYY-MM-DD).
+        end (str, optional): End date (defaults to today).
+
+    Returns:
+        pd.DataFrame: expected vs realised volatility and max drawdown, in percent.
+    """
+    _, portfolio_value_df = get_portfolio_prices_and_value(portfolio, start=start, end=end)
+    # The value series is on calendar days (weekends forward-filled), so annualise with 365
+    summary = compute_risk_metrics(portfolio_value_df[["Portfolio_Value"]], periods_per_year=365)["summary"]
+
+    risk_metrics = portfolio.get("schema", {}).get("properties", {}).get("risk_metrics", {})
+    return pd.DataFrame({
+        "expected": [risk_metrics.get("expected_volatility"), risk_metrics.get("expected_drawdown")],
+        "realised": [summary["volatility"].iloc[0] * 100, abs(summary["max_drawdown"].iloc[0]) * 100],
+    }, index=["volatility", "max_drawdown"])
@@ -1,11 +1,22 @@
 import os
+import re
 import asyncio
-from dotenv import load_dotenv  # type: ignore
 import json
 import logging
+import time
 
 from crew.run_parallel_crews import run_parallel_crews
-from utils.utils import join_outputs_as_json,normalize_trader_hypotheses
+from crew.pipeline import Stage, run_pipeline
+from utils.utils import join_outputs_as_json,normalize_trader_hypotheses, configure_environment, configure_logging
+from utils.registry import reset_run_registry
+from utils.tracing import current_trace_id, span, trace_run
+from utils.run_ledger import get_run_ledger
+from utils.research_freshness import find_fresh_research
+from utils.streaming import stream_agent
+from utils.research_handoff import condense_research, dumps_compact, load_research_summary, research_token_budget
+from utils.portfolio_optimizer import DEFAULT_METHOD as PORTFOLIO_OPTIMIZER, optimize_portfolio
+from utils.risk_simulation import DEFAULT_PATHS as RISK_SIM_PATHS, simulate_portfolio_risk
+from utils.stress_scenarios import stress_test
 
 from tasks.research_tasks import (
     create_research_fed_policy_task,
@@ -44,124 +55,397 @@ from tasks.refine_hypothesis_tasks import (
 from tasks.implementation_tasks import create_portfolio_task
 from agents.implementation_agents import create_portfolio_agent
 
-# Load environment variables
-load_dotenv()
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-os.environ["SERPER_API_KEY"] = os.getenv("SERPER_API_KEY")
+logger = logging.getLogger("MainLogger")
 
+# Research crews are independent, so by default they all run at once
+PIPELINE_MAX_CONCURRENCY = int(os.getenv("PIPELINE_MAX_CONCURRENCY", "6"))
+# Refinement chains (one per trader hypothesis) running at the same time
+HYPOTHESIS_MAX_CONCURRENCY = int(os.getenv("HYPOTHESIS_MAX_CONCURRENCY", "3"))
+CREW_TIMEOUT = float(os.getenv("CREW_TIMEOUT")) if os.getenv("CREW_TIMEOUT") else None
 
-# Logging setup
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger("MainLogger")
-logger.setLevel(logging.INFO)
+RESEARCH_TOPICS = {
+    "fed_policy": (create_research_fed_policy_task, create_fed_policy_research_agent),
+    "banking_risk": (create_research_banking_risk_task, create_banking_risk_research_agent),
+    "global_capital_flows": (create_research_global_capital_flows_task, create_global_capital_flows_research_agent),
+    "fiscal_policy": (create_research_fiscal_policy_task, create_fiscal_policy_research_agent),
+    "macro_growth": (create_research_macro_growth_task, create_macro_growth_research_agent),
+    "macro_inflation": (create_research_macro_inflation_task, create_macro_inflation_research_agent),
+}
 
-file_handler = logging.FileHandler("logs/main.log")
-file_handler.setLevel(logging.INFO)
 
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-file_handler.setFormatter(formatter)
+async def run_crew_stage(
+    task,
+    agent,
+    output_path: str | None = None,
+    stage: str | None = None,
+    hypothesis: str | None = None,
+):
+    """
+    Runs a single crew and returns the executed task, whose `.output` holds the result.
+    With `output_path`, the output is saved there as JSON; while the crew runs with
+    AGENT_STREAMING on, the fields parsed so far are kept in `<output_path>.partial`.
+    With `stage`, the output is also appended to the run ledger.
+    """
+    with stream_agent(agent, output_path):
+        await run_parallel_crews([(task, agent)], max_concurrency=1, timeout=CREW_TIMEOUT)
+        if output_path:
+            output = save_task_output(task, output_path)
+        else:
+            output = parse_output(task.output.raw)
+    if stage:
+        record_artifact(stage, output, path=output_path, hypothesis=hypothesis)
+    return task
 
-logger.addHandler(file_handler)
 
-async def refine_hypothesis(hypotheses: list[dict]) -> list[tuple[str, str, str]]:
-    """Run critic + refiner agents on each hypothesis in parallel."""
-    crews = []
-    
-    # for hyp in hypotheses:
+def parse_output(raw: str):
+    """Parses an agent's output as JSON, falling back to {"raw": ...} if it does not parse."""
+    try:
+        return json.loads(raw)
+    except Exception:
+        return {"raw": raw}
+
+
+def record_artifact(stage: str, content, path: str | None = None, hypothesis: str | None = None):
+    """Appends a stage output to the run ledger under the current run."""
+    with span(stage, "io", sink="ledger"):
+        get_run_ledger().record(current_trace_id(), stage, content, hypothesis=hypothesis, path=path)
+
+
+def save_task_output(task, path: str):
+    """Saves a task's output as JSON, falling back to {"raw": ...} if it does not parse."""
+    with span(path, "io"):
+        output = parse_output(task.output.raw)
+        with open(path, "w") as f:
+            json.dump(output, f, indent=2)
+    logger.info(f"Saved {task.agent.role} output to {path}")
+    return output
+
+
+def research_stages() -> list[Stage]:
+    """
+    One independent stage per research topic, plus the joined "research_summary".
+
+    A topic whose last stored output is still fresh under its policy (see
+    utils/research_freshness.py) reuses that output instead of rerunning its crew.
+    Each topic stage returns {"agent", "output", "reused_from"}.
+    """
+    research_names = [f"research_{topic}" for topic in RESEARCH_TOPICS]
+
+    def make_stage(topic, create_task, create_agent):
+        async def run(inputs):
+            stored = find_fresh_research(topic, get_run_ledger())
+            if stored is not None:
+                content = stored["content"]
+                logger.info(f"Reusing research on {topic} from run {stored['run_id']}")
+                return {
+                    "agent": content.get("agent", topic),
+                    "output": content.get("output", content.get("raw", "")),
+                    "reused_from": stored["id"],
+                }
+
+            task = await run_crew_stage(create_task(), create_agent())
+            result = {"agent": task.agent.role, "output": task.output.raw}
+            record_artifact(f"research_{topic}", result)
+            return {**result, "reused_from": None}
+        return Stage(name=f"research_{topic}", run=run)
+
+    async def run_summary(inputs):
+        results = {topic: inputs[f"research_{topic}"] for topic in RESEARCH_TOPICS}
+        research_results = [(None, result["agent"], result["output"]) for result in results.values()]
+        with span("results/research_summary.json", "io"):
+            research_result_json = join_outputs_as_json(research_results)
+            with open("results/research_summary.json", "w") as f:
+                f.write(research_result_json)
+        logger.info("Saved research summary to results/research_summary.json")
+        record_artifact("research_summary", json.loads(research_result_json), path="results/research_summary.json")
+
+        reused = {topic: result["reused_from"] for topic, result in results.items() if result["reused_from"]}
+        refreshed = [topic for topic, result in results.items() if not result["reused_from"]]
+        logger.info(f"Research refreshed: {refreshed}, reused: {list(reused)}")
+        record_artifact("research_freshness", {"refreshed": refreshed, "reused": reused})
+        return research_result_json
+
+    return [
+        make_stage(topic, create_task, create_agent)
+        for topic, (create_task, create_agent) in RESEARCH_TOPICS.items()
+    ] + [Stage(name="research_summary", run=run_summary, inputs=research_names)]
+
+
+def trader_stages() -> list[Stage]:
+    """
+    Trader stage over the "research_summary" input, plus the raw hypothesis it produces.
+    The summary is first condensed to RESEARCH_TOKEN_BUDGET tokens when that is set.
+    """
+
+    async def run_brief(inputs):
+        summary = load_research_summary(inputs["research_summary"])
+        token_budget = research_token_budget()
+        if token_budget:
+            summary = condense_research(summary, token_budget)
+        return dumps_compact(summary)
+
+    async def run_trader(inputs):
+        return await run_crew_stage(create_trader_task(inputs["research_brief"]), create_trader_agent())
+
+    async def run_hypothesis(inputs):
+        trader_hypothesis = inputs["trader"].output.raw
+        logger.info(f"Trader hypothesis: {trader_hypothesis}")
+        if not trader_hypothesis:
+            raise ValueError("Trader agent returned an empty hypothesis.")
+
+        with open("results/initial_hypothesis.json", "w") as f:
+            f.write(trader_hypothesis)
+        logger.info("Saved intitial trader hypothesis to results/initial_hypothesis.json")
+        record_artifact("hypothesis", parse_output(trader_hypothesis), path="results/initial_hypothesis.json")
+        return trader_hypothesis
+
+    return [
+        Stage(name="research_brief", run=run_brief, inputs=["research_summary"]),
+        Stage(name="trader", run=run_trader, inputs=["research_brief"]),
+        Stage(name="hypothesis", run=run_hypothesis, inputs=["trader"]),
+    ]
+
+
+def refinement_stages(
+    agent_key: str | None = None,
+    results_dir: str = "results",
+    hypothesis: str | None = None,
+) -> list[Stage]:
+    """
+    Critic -> refiner -> (portfolio -> optimizer -> risk simulation / stress test,
+    falsification) chain for one "hypothesis" input. Each agent stage hands its
+    executed task to the next one as crewai task context; the optimizer re-weights the
+    portfolio agent's tickers from their covariance (see utils/portfolio_optimizer.py)
+    and rewrites portfolio.json, the simulation writes its VaR / drawdown distribution
+    to portfolio_risk.json (see utils/risk_simulation.py), and the stress test writes
+    the portfolio's returns in historical crises to stress_test.json, flagging it if
+    one loses more than STRESS_MAX_LOSS (see utils/stress_scenarios.py).
+
+    Args:
+        agent_key (str, optional): Selects this chain's own agent instances, so chains
+            for different hypotheses can run concurrently.
+        results_dir (str): Directory the chain's output files are written to.
+        hypothesis (str, optional): Hypothesis name the outputs are recorded under in the run ledger.
+    """
+
+    async def run_critic(inputs):
+        return await run_crew_stage(
+            create_critic_task(inputs["hypothesis"], agent_key=agent_key),
+            create_critic_agent(key=agent_key),
+            output_path=os.path.join(results_dir, "critic_feedback.json"),
+            stage="critic", hypothesis=hypothesis,
+        )
+
+    async def run_refiner(inputs):
+        return await run_crew_stage(
+            create_refiner_task(inputs["hypothesis"], critic_task=inputs["critic"], agent_key=agent_key),
+            create_refiner_agent(key=agent_key),
+            output_path=os.path.join(results_dir, "refined_hypothesis.json"),
+            stage="refiner", hypothesis=hypothesis,
+        )
+
+    async def run_portfolio(inputs):
+        return await run_crew_stage(
+            create_portfolio_task(refiner_task=inputs["refiner"], agent_key=agent_key),
+            create_portfolio_agent(key=agent_key),
+            output_path=os.path.join(results_dir, "portfolio.json"),
+            stage="portfolio", hypothesis=hypothesis,
+        )
+
+    async def run_optimizer(inputs):
+        portfolio = parse_output(inputs["portfolio"].output.raw)
+        if PORTFOLIO_OPTIMIZER == "off":
+            return portfolio
+        try:
+            optimized = await asyncio.to_thread(optimize_portfolio, portfolio)
+        except Exception as e:
+            logger.warning(f"Keeping the portfolio agent's weights for {hypothesis or 'portfolio'}: {e!r}")
+            record_artifact("optimized_portfolio", {"skipped": repr(e)}, hypothesis=hypothesis)
+            return portfolio
+        path = os.path.join(results_dir, "portfolio.json")
+        with span(path, "io"):
+            with open(path, "w") as f:
+                json.dump(optimized, f, indent=2)
+        record_artifact("optimized_portfolio", optimized, path=path, hypothesis=hypothesis)
+        return optimized
+
+    async def run_risk_simulation(inputs):
+        if RISK_SIM_PATHS <= 0:
+            return None
+        try:
+            risk = await asyncio.to_thread(simulate_portfolio_risk, inputs["optimized_portfolio"])
+        except Exception as e:
+            logger.warning(f"Skipping risk simulation for {hypothesis or 'portfolio'}: {e!r}")
+            record_artifact("portfolio_risk", {"skipped": repr(e)}, hypothesis=hypothesis)
+            return None
+        path = os.path.join(results_dir, "portfolio_risk.json")
+        with span(path, "io"):
+            with open(path, "w") as f:
+                json.dump(risk, f, indent=2)
+        record_artifact("portfolio_risk", risk, path=path, hypothesis=hypothesis)
+        return risk
+
+    async def run_stress_test(inputs):
+        try:
+            result = await asyncio.to_thread(stress_test, inputs["optimized_portfolio"])
+        except Exception as e:
+            logger.warning(f"Skipping stress test for {hypothesis or 'portfolio'}: {e!r}")
+            record_artifact("stress_test", {"skipped": repr(e)}, hypothesis=hypothesis)
+            return None
+        path = os.path.join(results_dir, "stress_test.json")
+        with span(path, "io"):
+            with open(path, "w") as f:
+                json.dump(result, f, indent=2)
+        record_artifact("stress_test", result, path=path, hypothesis=hypothesis)
+        return result
+
+    async def run_falsification(inputs):
+        return await run_crew_stage(
+            create_falsification_task(inputs["refiner"], agent_key=agent_key),
+            create_falsification_agent(key=agent_key),
+            output_path=os.path.join(results_dir, "falsification.json"),
+            stage="falsification", hypothesis=hypothesis,
+        )
+
+    #TODO
+    #create_risk_management_task / create_implementation_task stages
+
+    return [
+        Stage(name="critic", run=run_critic, inputs=["hypothesis"]),
+        Stage(name="refiner", run=run_refiner, inputs=["hypothesis", "critic"]),
+        Stage(name="portfolio", run=run_portfolio, inputs=["refiner"]),
+        Stage(name="optimized_portfolio", run=run_optimizer, inputs=["portfolio"]),
+        Stage(name="portfolio_risk", run=run_risk_simulation, inputs=["optimized_portfolio"]),
+        Stage(name="stress_test", run=run_stress_test, inputs=["optimized_portfolio"]),
+        Stage(name="falsification", run=run_falsification, inputs=["refiner"]),
+    ]
+
+
+def hypothesis_slug(name: str) -> str:
+    """Filesystem- and key-safe version of a hypothesis name."""
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_") or "hypothesis"
+
+
+async def refine_hypotheses(trader_output) -> dict[str, dict]:
+    """
+    Splits the trader output into individual hypotheses and runs each through its own
+    refinement chain, at most HYPOTHESIS_MAX_CONCURRENCY chains at a time.
+
+    With a single hypothesis its files go to results/ as before; with several, each
+    hypothesis writes to results/hypotheses/<name>/.
+
+    Returns:
+        dict[str, dict]: Stage outputs of each chain, keyed by hypothesis name.
+    """
+    hypotheses = normalize_trader_hypotheses(trader_output)
+    if not hypotheses:
+        raise ValueError("No hypotheses found in trader output.")
+
+    names = []
+    for i, hypothesis in enumerate(hypotheses, start=1):
+        name = hypothesis.get("name") if isinstance(hypothesis, dict) else None
+        name = name or f"Hypothesis {i}"
+        if name in names:
+            name = f"{name} ({i})"
+        names.append(name)
+    logger.info(f"Refining {len(hypotheses)} hypotheses: {names}")
+
+    semaphore = asyncio.Semaphore(HYPOTHESIS_MAX_CONCURRENCY)
+
+    async def refine_one(name, hypothesis):
+        slug = hypothesis_slug(name)
+        results_dir = "results" if len(hypotheses) == 1 else os.path.join("results", "hypotheses", slug)
+        os.makedirs(results_dir, exist_ok=True)
+
+        ready_at = time.perf_counter()
+        async with semaphore:
+            with span(name, "stage", queue_wait=time.perf_counter() - ready_at, hypothesis=name):
+                hypothesis_json = hypothesis if isinstance(hypothesis, str) else json.dumps(hypothesis)
+                return await run_pipeline(
+                    refinement_stages(agent_key=slug, results_dir=results_dir, hypothesis=name),
+                    initial={"hypothesis": hypothesis_json},
+                    max_concurrency=PIPELINE_MAX_CONCURRENCY,
+                )
+
+    tasks = [asyncio.ensure_future(refine_one(name, h)) for name, h in zip(names, hypotheses)]
+    try:
+        outputs = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    return dict(zip(names, outputs))
+
+
+def refinement_stage() -> Stage:
+    """Fan-out stage refining every hypothesis in the "hypothesis" input."""
+
+    async def run_refinement(inputs):
+        return await refine_hypotheses(inputs["hypothesis"])
+
+    return Stage(name="refinement", run=run_refinement, inputs=["hypothesis"])
+
+
+async def run_stages(
+    stages: list[Stage],
+    initial: dict | None = None,
+    name: str = "pipeline",
+    run_id: str | None = None,
+) -> dict:
+    """
+    Runs `stages` as one pipeline run with fresh run-scoped agents. The run is traced
+    and its spans exported when it ends (see utils/tracing.py), and its stage outputs
+    are appended to the run ledger under the run's trace id (see utils/run_ledger.py).
+    `run_id` sets that id; by default a new one is generated.
+    """
+    reset_run_registry()
+    ledger = get_run_ledger()
+    with trace_run(name, trace_id=run_id, stages=[stage.name for stage in stages]) as run_span:
+        ledger.start_run(run_span.trace_id, name)
+        try:
+            outputs = await run_pipeline(stages, initial=initial, max_concurrency=PIPELINE_MAX_CONCURRENCY)
+        except BaseException:
+            ledger.finish_run(run_span.trace_id, status="error")
+            raise
+        ledger.finish_run(run_span.trace_id)
+        return outputs
+
+
+async def research(run_id: str | None = None) -> str:
+    """Run all research crews and return the joined research summary JSON."""
+    outputs = await run_stages(research_stages(), name="research", run_id=run_id)
+    return outputs["research_summary"]
+
+
+async def trade(research_summary: str, run_id: str | None = None) -> str:
+    """Run the trader on a research summary and return its raw hypothesis."""
+    outputs = await run_stages(
+        trader_stages(), initial={"research_summary": research_summary}, name="trade", run_id=run_id
+    )
+    return outputs["hypothesis"]
+
+
+async def refine_hypothesis(hypotheses: str, run_id: str | None = None) -> dict:
+    """
+    Run the critic -> refiner -> portfolio/falsification chain on each hypothesis in
+    the trader output. Returns each chain's stage outputs keyed by hypothesis name.
+    """
     logger.info(f"Refining hypothesis: {hypotheses}")
-    hyp_json = json.dumps(hypotheses)
+    outputs = await run_stages(
+        [refinement_stage()], initial={"hypothesis": hypotheses}, name="refine", run_id=run_id
+    )
+    return outputs["refinement"]
 
-    crews.append((create_critic_task(hyp_json), create_critic_agent()))
-    crews.append((create_refiner_task(hyp_json), create_refiner_agent()))
-    crews.append((create_portfolio_task(), create_portfolio_agent()))
-    
-        #TODO - Implement falsification agent/task
-        #crews.append(create_falsification_task(), create_falsification_agent())
-
-        #TODO 
-        #crews.append(create_portfolio_task(hyp_json), create_portfolio_agent()))
-        #crews.append(create_risk_management_task(hyp_json), create_risk_management_agent()))
-        #crews.append(create_implementation_task(hyp_json), create_implementation_agent()))
-        
-    results = await run_parallel_crews(crews)
-    return results
-
-async def main():
-    # 1. Run research agents in parallel
-    research_results = await run_parallel_crews([
-        (create_research_fed_policy_task(), create_fed_policy_research_agent()),
-        (create_research_banking_risk_task(), create_banking_risk_research_agent()),
-        (create_research_global_capital_flows_task(), create_global_capital_flows_research_agent()),
-        (create_research_fiscal_policy_task(), create_fiscal_policy_research_agent()),
-        (create_research_macro_growth_task(), create_macro_growth_research_agent()),
-        (create_research_macro_inflation_task(), create_macro_inflation_research_agent()),
-    ])
-
-    # 2. Save research results JSON
-    research_result_json = join_outputs_as_json(research_results)
-    with open("results/research_summary.json", "w") as f:
-        f.write(research_result_json)
-    logger.info("Saved research summary to results/research_summary.json")
-
-    # 3. Run trader agent on the research results
-    trader_results = await run_parallel_crews([
-        (create_trader_task(research_result_json), create_trader_agent()),
-    ])
-
-    logger.info(f"Trader output: {trader_results[0]}")
-
-    _, _, trader_hypothesis = trader_results[0]
-    trader_hypothesis = trader_hypothesis.raw
-
-    with open("results/initial_hypothesis.json", "w") as f:
-        f.write(trader_hypothesis)
-    logger.info("Saved intitial trader hypothesis to results/initial_hypothesis.json")
-
-    logger.info("Normalized trader hypotheses.")
-    logger.info(f"Trader hypotheses type: {type(trader_hypothesis)}")
-    logger.info(f"Trader hypotheses: {trader_hypothesis}")
-
-    # 5. Run critic + refiner agents for each hypothesis
-    if trader_hypothesis:
-        logger.info(f"Refining trader hypothesis...")
+async def main(run_id: str | None = None):
+    # Research -> trader -> per hypothesis: critic -> refiner -> portfolio/falsification.
+    # Each stage starts as soon as the stages it depends on have finished.
+    # Agents are built once per run and shared between a task and its crew.
+    outputs = await run_stages(research_stages() + trader_stages() + [refinement_stage()], run_id=run_id)
+    logger.info(f"Pipeline finished stages: {list(outputs)}")
+    return outputs
     
-        refined_hypothesis = await refine_hypothesis(trader_hypothesis)
-
-        for (_, agent, crew_out) in refined_hypothesis:
-            if "Refiner" in str(agent):  # Save refiner results
-                try:
-                    refined_output = json.loads(crew_out.raw)
-                except Exception:
-                    refined_output = {"raw": crew_out.raw}
-
-            elif "Critic" in str(agent):  # Save critic results separately
-                try:
-                    critic_output = json.loads(crew_out.raw)
-                except Exception:
-                    critic_output = {"raw": crew_out.raw}
-        
-            elif "Portfolio Construction" in str(agent):
-                try:
-                    portfolio_output = json.loads(crew_out.raw)
-                except Exception:
-                    portfolio_output = {"raw": crew_out.raw}
-
-        logger.info(f"Refined Hypotheses: {refined_output}")
-        
-        # Save refined trade theses
-        with open("results/refined_hypothesis.json", "w") as f:
-            json.dump(refined_output, f, indent=2)
-
-        # Optional: save critics for debugging
-        with open("results/critic_feedback.json", "w") as f:
-            json.dump(critic_output, f, indent=2)
-        
-        # Save portfolio output
-        with open("results/portfolio.json", "w") as f:
-            json.dump(portfolio_output, f, indent=2)
-
-        logger.info("Saved refined hypotheses and critic feedback")
-        
     
 if __name__ == "__main__":
+    configure_environment()
+    configure_logging()
     asyncio.run(main())
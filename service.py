@@ -0,0 +1,298 @@
+"""
+Long-running pipeline service: accepts jobs over a local HTTP API, runs them from a
+priority queue, and keeps the framework, tools, schemas and price data warm between jobs.
+
+API (JSON):
+    POST /jobs          {"kind": "run" | "research" | "trade" | "refine" | "evaluate",
+                         "params": {...}, "priority": 10}      -> 202 {"job_id": ...}
+    GET  /jobs          -> list of jobs (without results)
+    GET  /jobs/<job_id> -> job status, and its result once finished
+    GET  /health        -> {"status": "ok", "queued": n, "running": n}
+
+Lower priority values run first; jobs with equal priority run in submission order.
+Usage:
+    python cli.py serve --port 8765
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("MainLogger")
+
+DEFAULT_SERVICE_HOST = "127.0.0.1"
+DEFAULT_SERVICE_PORT = 8765
+DEFAULT_SERVICE_WORKERS = 4
+MAX_FINISHED_JOBS = 1000
+
+JOB_KINDS = ("run", "research", "trade", "refine", "evaluate")
+# Agent pipelines share the results/ files and the run-scoped registry, so only one
+# runs at a time; evaluations only read prices and can run alongside them.
+PIPELINE_KINDS = ("run", "research", "trade", "refine")
+DEFAULT_PRIORITY = {"evaluate": 0, "refine": 5, "trade": 5, "research": 10, "run": 10}
+
+
+@dataclass
+class Job:
+    kind: str
+    params: dict = field(default_factory=dict)
+    priority: int = 10
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    result: object = None
+    error: str | None = None
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        data = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "priority": self.priority,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+def _read_param(params: dict, key: str, default_path: str) -> str:
+    """A job input passed inline, or else read from its default results file."""
+    value = params.get(key)
+    if value is None:
+        with open(default_path, "r") as f:
+            return f.read()
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def _run_artifacts(run_id: str) -> dict:
+    """Ledger outputs of a pipeline run, without the (large) per-topic research text."""
+    from utils.run_ledger import get_run_ledger
+
+    artifacts = [
+        {key: row[key] for key in ("stage", "hypothesis", "path", "content")}
+        for row in reversed(get_run_ledger().artifacts(run_id=run_id))
+        if not row["stage"].startswith("research_") or row["stage"] == "research_freshness"
+    ]
+    return {"run_id": run_id, "artifacts": artifacts}
+
+
+def _evaluate(params: dict) -> dict:
+    from utils.portfolio_evals import evaluate_portfolios
+
+    portfolios = list(params.get("portfolios", []))
+    for path in params.get("paths", []):
+        with open(path, "r") as f:
+            portfolios.append(json.load(f))
+    if not portfolios:
+        with open("results/portfolio.json", "r") as f:
+            portfolios.append(json.load(f))
+
+    _, _, cumulative_df, sharpe = evaluate_portfolios(
+        portfolios,
+        start=params.get("start", "2024-01-01"),
+        end=params.get("end"),
+        risk_free_rate=params.get("risk_free_rate"),
+    )
+    return {
+        str(name): {"sharpe_ratio": float(sharpe[name]), "cumulative_return": float(cumulative_df[name].iloc[-1])}
+        for name in sharpe.index
+    }
+
+
+class JobScheduler:
+    """
+    Asyncio priority queue of jobs drained by a fixed number of workers. Agent
+    pipeline jobs additionally take a single pipeline slot.
+    """
+
+    def __init__(self, workers: int = DEFAULT_SERVICE_WORKERS):
+        self.workers = workers
+        self.jobs: dict[str, Job] = {}
+        self._queue: asyncio.PriorityQueue | None = None
+        self._pipeline_slot: asyncio.Semaphore | None = None
+        self._sequence = itertools.count()
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.PriorityQueue()
+        self._pipeline_slot = asyncio.Semaphore(1)
+        self._tasks = [asyncio.ensure_future(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, job: Job) -> Job:
+        if job.kind not in JOB_KINDS:
+            raise ValueError(f"Invalid job kind '{job.kind}'. Must be one of: {', '.join(JOB_KINDS)}")
+        self.jobs[job.job_id] = job
+        await self._queue.put((job.priority, next(self._sequence), job.job_id))
+        logger.info(f"Queued {job.kind} job {job.job_id} (priority {job.priority})")
+        self._forget_old_jobs()
+        return job
+
+    def counts(self) -> dict:
+        statuses = [job.status for job in self.jobs.values()]
+        return {status: statuses.count(status) for status in ("queued", "running")}
+
+    def _forget_old_jobs(self) -> None:
+        finished = sorted(
+            (job for job in self.jobs.values() if job.finished_at is not None),
+            key=lambda job: job.finished_at,
+        )
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.job_id]
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is not None:
+                    await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        logger.info(f"Starting {job.kind} job {job.job_id}")
+        try:
+            if job.kind in PIPELINE_KINDS:
+                async with self._pipeline_slot:
+                    job.result = await self._run_pipeline_job(job)
+            else:
+                job.result = await asyncio.get_running_loop().run_in_executor(None, _evaluate, job.params)
+            job.status = "done"
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.job_id} failed: {e}")
+            job.status = "failed"
+            job.error = repr(e)
+        finally:
+            job.finished_at = time.time()
+
+    async def _run_pipeline_job(self, job: Job) -> dict:
+        import main
+
+        # The job id doubles as the run id, so the job's outputs can be read back from the ledger
+        if job.kind == "run":
+            await main.main(run_id=job.job_id)
+        elif job.kind == "research":
+            await main.research(run_id=job.job_id)
+        elif job.kind == "trade":
+            research_summary = _read_param(job.params, "research_summary", "results/research_summary.json")
+            await main.trade(research_summary, run_id=job.job_id)
+        elif job.kind == "refine":
+            hypothesis = _read_param(job.params, "hypothesis", "results/initial_hypothesis.json")
+            await main.refine_hypothesis(hypothesis, run_id=job.job_id)
+        return _run_artifacts(job.job_id)
+
+
+def warm_up() -> None:
+    """Imports the agent framework and builds process-wide tools, schemas and stores once."""
+    import main  # noqa: F401  (crewai, agents and tasks)
+    from tools.research_tools import shared_search_tool
+    from utils.price_store import get_price_store
+    from utils.run_ledger import get_run_ledger
+    from utils.utils import load_schema
+
+    shared_search_tool()
+    for schema in ("raw_trade_thesis", "final_trade_thesis", "portfolio", "falsification_trade_thesis"):
+        load_schema(f"schemas/{schema}.json")
+    get_price_store()
+    get_run_ledger()
+    logger.info("Service warmed up")
+
+
+def make_http_server(scheduler: JobScheduler, loop: asyncio.AbstractEventLoop, host: str, port: int) -> ThreadingHTTPServer:
+    """HTTP front end; request threads hand jobs to the scheduler's event loop."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload) -> None:
+            body = json.dumps(payload, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok", **scheduler.counts()})
+            elif self.path == "/jobs":
+                self._send(200, [job.to_dict(include_result=False) for job in list(scheduler.jobs.values())])
+            elif self.path.startswith("/jobs/"):
+                job = scheduler.jobs.get(self.path[len("/jobs/"):])
+                if job is None:
+                    self._send(404, {"error": "unknown job id"})
+                else:
+                    self._send(200, job.to_dict())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/jobs":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                kind = request.get("kind")
+                job = Job(
+                    kind=kind,
+                    params=request.get("params") or {},
+                    priority=int(request.get("priority", DEFAULT_PRIORITY.get(kind, 10))),
+                )
+                asyncio.run_coroutine_threadsafe(scheduler.submit(job), loop).result()
+            except (ValueError, TypeError) as e:
+                self._send(400, {"error": str(e)})
+                return
+            self._send(202, {"job_id": job.job_id, "status": job.status})
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+async def serve(
+    host: str | None = None,
+    port: int | None = None,
+    workers: int | None = None,
+    warm: bool = True,
+) -> None:
+    """Runs the service until cancelled. Defaults come from SERVICE_HOST / SERVICE_PORT / SERVICE_WORKERS."""
+    host = host or os.getenv("SERVICE_HOST", DEFAULT_SERVICE_HOST)
+    port = port if port is not None else int(os.getenv("SERVICE_PORT", DEFAULT_SERVICE_PORT))
+    workers = workers or int(os.getenv("SERVICE_WORKERS", DEFAULT_SERVICE_WORKERS))
+
+    if warm:
+        await asyncio.get_running_loop().run_in_executor(None, warm_up)
+
+    scheduler = JobScheduler(workers=workers)
+    await scheduler.start()
+    server = make_http_server(scheduler, asyncio.get_running_loop(), host, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info(f"Pipeline service listening on http://{host}:{server.server_address[1]}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        server.shutdown()
+        await scheduler.stop()
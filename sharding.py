@@ -0,0 +1,368 @@
+"""
+Runs many independent pipeline configurations (mandates, universes, model or budget
+variants) across a pool of processes, optionally shared between hosts through a
+SQLite work queue, and merges their outputs into one file.
+
+A run configuration file is a JSON list (or {"runs": [...]}) of:
+    {
+        "name": "rates_only",                      # unique; also the run's work directory
+        "command": "run",                          # run | research | trade | refine
+        "env": {"RESEARCH_TOKEN_BUDGET": "1500"},  # environment overrides for this run
+        "input": "path/to/hypothesis.json"         # trade / refine only (default: results/...)
+    }
+
+Each run executes in a fresh process, in its own work directory (runs/<name>/ with
+its own results/ and logs/), while the LLM cache, search cache, price store and run
+ledger stay shared with the repository so runs reuse each other's fetched data.
+
+Usage:
+    python cli.py shard runs.json --processes 4
+    python cli.py shard runs.json --queue /shared/run_queue.sqlite   # enqueue and work
+    python cli.py shard --queue /shared/run_queue.sqlite             # extra worker, e.g. on another host
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+
+logger = logging.getLogger("MainLogger")
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_WORKDIR = "runs"
+DEFAULT_MERGED_OUTPUT = "results/sharded_runs.json"
+DEFAULT_QUEUE_LEASE = 6 * 3600  # seconds before a claimed run is handed to another worker
+
+RUN_COMMANDS = ("run", "research", "trade", "refine")
+DEFAULT_INPUTS = {"trade": "results/research_summary.json", "refine": "results/initial_hypothesis.json"}
+
+
+@dataclass
+class RunConfig:
+    name: str
+    command: str = "run"
+    env: dict = field(default_factory=dict)
+    input: str | None = None
+
+
+def load_run_configs(path: str) -> list[RunConfig]:
+    """
+    Reads and validates a run configuration file.
+
+    Raises:
+        ValueError: On an unknown command or a duplicate run name.
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+    configs = [RunConfig(**entry) for entry in (data["runs"] if isinstance(data, dict) else data)]
+
+    names = [config.name for config in configs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate run names: {', '.join(duplicates)}")
+    for config in configs:
+        if config.command not in RUN_COMMANDS:
+            raise ValueError(f"Invalid command '{config.command}' for run '{config.name}'. Must be one of: {', '.join(RUN_COMMANDS)}")
+    return configs
+
+
+def prepare_run_workdir(base: str, name: str) -> str:
+    """Creates runs/<name>/ with its own results/ and logs/ and a link to the schemas."""
+    workdir = os.path.abspath(os.path.join(base, name))
+    os.makedirs(os.path.join(workdir, "results"), exist_ok=True)
+    os.makedirs(os.path.join(workdir, "logs"), exist_ok=True)
+    schemas = os.path.join(workdir, "schemas")
+    if not os.path.lexists(schemas):
+        os.symlink(os.path.join(REPO_ROOT, "schemas"), schemas)
+    return workdir
+
+
+def collect_outputs(results_dir: str) -> dict:
+    """Every JSON output file under a run's results/, keyed by its relative path."""
+    outputs = {}
+    for root, _, files in os.walk(results_dir):
+        for file in sorted(files):
+            if not file.endswith(".json"):
+                continue
+            path = os.path.join(root, file)
+            with open(path, "r") as f:
+                text = f.read()
+            try:
+                outputs[os.path.relpath(path, results_dir)] = json.loads(text)
+            except json.JSONDecodeError:
+                outputs[os.path.relpath(path, results_dir)] = text
+    return outputs
+
+
+def execute_run(config: dict, workdir_base: str, default_env: dict) -> dict:
+    """
+    Runs one configuration to completion. Called in a fresh worker process, so the
+    run's environment (read by modules at import time) never leaks into another run.
+
+    Returns:
+        dict: name, status ("ok" / "failed"), run_id, workdir, wall_time, error and the
+            parsed output files.
+    """
+    config = RunConfig(**config)
+    workdir = prepare_run_workdir(workdir_base, config.name)
+    run_id = uuid.uuid4().hex
+    started = time.perf_counter()
+
+    # Shared stores stay at the repository's paths; everything else is relative to the work directory
+    from tools.search_cache import DEFAULT_SEARCH_CACHE_PATH
+    from utils.llm_cache import DEFAULT_LLM_CACHE_PATH
+    from utils.price_store import DEFAULT_PRICE_STORE_ROOT
+    from utils.run_ledger import DEFAULT_LEDGER_PATH
+    from utils.stress_scenarios import DEFAULT_SCENARIO_PATH
+
+    shared_paths = {
+        "LLM_CACHE_PATH": DEFAULT_LLM_CACHE_PATH,
+        "SEARCH_CACHE_PATH": DEFAULT_SEARCH_CACHE_PATH,
+        "PRICE_STORE_ROOT": DEFAULT_PRICE_STORE_ROOT,
+        "RUN_LEDGER_PATH": DEFAULT_LEDGER_PATH,
+        "STRESS_SCENARIO_PATH": DEFAULT_SCENARIO_PATH,
+    }
+    for env_var, default in shared_paths.items():
+        os.environ.setdefault(env_var, os.path.abspath(os.path.join(REPO_ROOT, default)))
+    os.environ.update({**default_env, **config.env})
+    os.chdir(workdir)
+
+    from utils.utils import configure_environment, configure_logging
+
+    configure_environment()
+    configure_logging()
+    import main
+
+    try:
+        if config.command == "run":
+            asyncio.run(main.main(run_id=run_id))
+        elif config.command == "research":
+            asyncio.run(main.research(run_id=run_id))
+        else:
+            input_path = os.path.join(REPO_ROOT, config.input or DEFAULT_INPUTS[config.command])
+            with open(input_path, "r") as f:
+                text = f.read()
+            if config.command == "trade":
+                asyncio.run(main.trade(text, run_id=run_id))
+            else:
+                asyncio.run(main.refine_hypothesis(text, run_id=run_id))
+        status, error = "ok", None
+    except Exception as e:
+        logger.error(f"Run {config.name} failed: {e}")
+        status, error = "failed", repr(e)
+
+    return {
+        "name": config.name,
+        "status": status,
+        "run_id": run_id,
+        "workdir": workdir,
+        "wall_time": time.perf_counter() - started,
+        "error": error,
+        "outputs": collect_outputs(os.path.join(workdir, "results")),
+    }
+
+
+def worker_env(run_concurrency: int | None = None, hypothesis_concurrency: int | None = None) -> dict:
+    """Per-run concurrency limits, applied unless a configuration sets its own."""
+    env = {}
+    if run_concurrency is not None:
+        env["PIPELINE_MAX_CONCURRENCY"] = str(run_concurrency)
+    if hypothesis_concurrency is not None:
+        env["HYPOTHESIS_MAX_CONCURRENCY"] = str(hypothesis_concurrency)
+    return env
+
+
+def _process_pool(processes: int) -> ProcessPoolExecutor:
+    # spawn + one task per child: every run starts from a clean interpreter
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        max_tasks_per_child=1,
+    )
+
+
+def _failed(name: str, error: Exception) -> dict:
+    """Result of a run whose worker process died before it could report."""
+    return {"name": name, "status": "failed", "run_id": None, "workdir": None, "wall_time": None,
+            "error": repr(error), "outputs": {}}
+
+
+def run_sharded(
+    configs: list[RunConfig],
+    processes: int | None = None,
+    workdir_base: str = DEFAULT_WORKDIR,
+    default_env: dict | None = None,
+) -> list[dict]:
+    """
+    Runs every configuration on a local process pool.
+
+    Args:
+        configs (list[RunConfig]): Runs to execute.
+        processes (int, optional): Runs in flight at once (default: CPU count).
+        workdir_base (str): Directory holding each run's work directory.
+        default_env (dict, optional): Environment applied to every run, e.g. from worker_env().
+
+    Returns:
+        list[dict]: One result per configuration, in input order.
+    """
+    processes = processes or os.cpu_count() or 1
+    with _process_pool(processes) as pool:
+        futures = {
+            config.name: pool.submit(execute_run, asdict(config), workdir_base, default_env or {})
+            for config in configs
+        }
+        results = []
+        for name, future in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(_failed(name, e))
+            logger.info(f"Run {name} finished: {results[-1]['status']}")
+    return results
+
+
+class RunQueue:
+    """
+    SQLite work queue of run configurations that any number of workers, on any host
+    that can open the file, claim runs from. A claimed run that is not finished within
+    the lease (e.g. its host died) is handed to the next worker that asks.
+    """
+
+    def __init__(self, path: str, lease: float = DEFAULT_QUEUE_LEASE):
+        self.path = path
+        self.lease = lease
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS run_queue ("
+                " name TEXT PRIMARY KEY,"
+                " config TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " worker TEXT,"
+                " claimed_at REAL,"
+                " finished_at REAL,"
+                " result TEXT)"
+            )
+
+    def enqueue(self, configs: list[RunConfig]) -> int:
+        """Adds configurations not already queued (by name). Returns how many were added."""
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO run_queue (name, config, status) VALUES (?, ?, 'queued')",
+                [(config.name, json.dumps(asdict(config))) for config in configs],
+            )
+        return cursor.rowcount
+
+    def claim(self, worker: str) -> RunConfig | None:
+        """Atomically takes the next queued (or lease-expired) run, or None when there is none."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT name, config FROM run_queue"
+                    " WHERE status = 'queued' OR (status = 'running' AND claimed_at < ?)"
+                    " ORDER BY rowid LIMIT 1",
+                    (now - self.lease,),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE run_queue SET status = 'running', worker = ?, claimed_at = ? WHERE name = ?",
+                        (worker, now, row["name"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return RunConfig(**json.loads(row["config"])) if row is not None else None
+
+    def complete(self, result: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE run_queue SET status = ?, finished_at = ?, result = ? WHERE name = ?",
+                (result["status"], time.time(), json.dumps(result), result["name"]),
+            )
+
+    def pending(self) -> int:
+        """Runs not yet finished, on any worker."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM run_queue WHERE status IN ('queued', 'running')"
+            ).fetchone()[0]
+
+    def results(self) -> list[dict]:
+        """Results of every finished run, in queue order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM run_queue WHERE result IS NOT NULL ORDER BY rowid"
+            ).fetchall()
+        return [json.loads(row["result"]) for row in rows]
+
+
+def work_queue(
+    queue: RunQueue,
+    processes: int | None = None,
+    workdir_base: str = DEFAULT_WORKDIR,
+    default_env: dict | None = None,
+) -> int:
+    """
+    Claims and runs configurations from `queue` on a local process pool, keeping at most
+    `processes` in flight, until the queue has nothing left to claim.
+
+    Returns:
+        int: Number of runs this worker executed.
+    """
+    processes = processes or os.cpu_count() or 1
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    in_flight = {}
+    executed = 0
+
+    with _process_pool(processes) as pool:
+        while True:
+            while len(in_flight) < processes:
+                config = queue.claim(worker)
+                if config is None:
+                    break
+                logger.info(f"Worker {worker} claimed run {config.name}")
+                future = pool.submit(execute_run, asdict(config), workdir_base, default_env or {})
+                in_flight[future] = config.name
+            if not in_flight:
+                return executed
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = _failed(name, e)
+                queue.complete(result)
+                executed += 1
+                logger.info(f"Run {name} finished: {result['status']}")
+
+
+def merge_results(results: list[dict], path: str = DEFAULT_MERGED_OUTPUT) -> dict:
+    """Writes every run's status and outputs to one JSON file, keyed by run name."""
+    merged = {
+        "runs": {result["name"]: result for result in results},
+        "failed": [result["name"] for result in results if result["status"] != "ok"],
+    }
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(merged, f, indent=2)
+    logger.info(f"Merged {len(results)} run results into {path}")
+    return merged
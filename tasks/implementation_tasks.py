@@ -5,9 +5,12 @@ from agents.implementation_agents import create_portfolio_agent
 
 logger = logging.getLogger(__name__)
 
-def create_portfolio_task():
+def create_portfolio_task(refiner_task: Task | None = None, agent_key: str | None = None):
     """
     Task for constructing a portfolio from refined trade hypotheses.
+    When `refiner_task` is given (already executed), its output is passed
+    to the portfolio agent as task context. `agent_key` selects the hypothesis'
+    own agent instance.
     """
 
     logger.info("Creating Portfolio Construction Task")
@@ -22,7 +25,8 @@ def create_portfolio_task():
             "The portfolio must be specifically relevant to the given hypotheses, and not generic."
             "Return output strictly matching the portfolio_schema."
         ),
-        agent=create_portfolio_agent(),
+        agent=create_portfolio_agent(key=agent_key),
+        context=[refiner_task] if refiner_task is not None else None,
         expected_output=(
             "The output must strictly follow this JSON schema:\n"
             f"{schema}"
@@ -4,6 +4,7 @@ from crewai import Task
 import logging
 from tools.research_tools import research_tools, serper_logic_for_query
 from utils.utils import get_current_date_for_prompting, load_schema
+from utils.falsification_monitor import trigger_expression_guide
 from agents.hypothesis_refining_agents import (
     create_critic_agent, 
     create_refiner_agent,
@@ -14,12 +15,12 @@ logger = logging.getLogger(__name__)
 
 
 
-def create_critic_task(hypothesis_json: str):
+def create_critic_task(hypothesis_json: str, agent_key: str | None = None):
     logger.info("Creating Critic Task for one hypothesis")
     logger.info(f"Hypothesis JSON: {hypothesis_json}")
 
     return Task(
-        agent=create_critic_agent(),
+        agent=create_critic_agent(key=agent_key),
         description=(
             f"You are given ONE trading hypothesis in JSON format: {hypothesis_json}. "
             "Critique this hypothesis by identifying weaknesses, risks not accounted for, "
@@ -35,14 +36,20 @@ def create_critic_task(hypothesis_json: str):
     )
 
 
-def create_refiner_task(hypothesis_json: str):
+def create_refiner_task(hypothesis_json: str, critic_task: Task | None = None, agent_key: str | None = None):
+    """
+    Task for the refiner agent. When `critic_task` is given (already executed),
+    its output is passed to the refiner as task context. `agent_key` selects the
+    hypothesis' own agent instance (see agents/hypothesis_refining_agents.py).
+    """
     logger.info("Creating Refiner Task for one hypothesis")
     logger.info(f"Hypothesis JSON: {hypothesis_json}")
 
     schema = load_schema("schemas/final_trade_thesis.json")
 
     return Task(
-        agent = create_refiner_agent(),
+        agent = create_refiner_agent(key=agent_key),
+        context = [critic_task] if critic_task is not None else None,
         description=(
             f"You are given ONE trading hypothesis: {hypothesis_json}, and the critique from the previous agent."
             f"Refine the hypothesis into a more robust trade thesis by addressing the critiques while keeping the core idea intact."
@@ -66,10 +73,11 @@ def create_refiner_task(hypothesis_json: str):
     )
 
 
-def create_falsification_task(refined_hypothesis: str):
+def create_falsification_task(refiner_task: Task, agent_key: str | None = None):
     """
     Task for falsification agent: analyze a refined hypothesis and produce
     a JSON output describing conditions under which it would be invalidated.
+    The refined hypothesis is read from the executed `refiner_task` as context.
     """
     logger.info("Creating Falsification Task for refined hypothesis")
 
@@ -86,8 +94,10 @@ def create_falsification_task(refined_hypothesis: str):
             "- Unexpected economic data releases"
             "- Other exogenous shocks or events"
             "Provide the output in structured JSON strictly following the falsification_schema."
+            f" {trigger_expression_guide()}"
         ),
-        agent=create_falsification_agent(),
+        agent=create_falsification_agent(key=agent_key),
+        context=[refiner_task],
         expected_output=(
             "The output must strictly follow this JSON schema:"
             f"{schema}"
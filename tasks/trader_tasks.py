@@ -7,7 +7,12 @@ from utils.utils import get_current_date_for_prompting, load_schema
 
 logger = logging.getLogger(__name__)
 
-def create_trader_task(research_summary_json: dict) -> Task:
+def create_trader_task(research_summary_json: str) -> Task:
+    """
+    Args:
+        research_summary_json (str): Compact research hand-off, {"sources": [...],
+            "research": [{"agent", "findings"}]}, where [S<n>] in findings cites sources[n-1].
+    """
     logger.info("Creating trader task...")
 
     schema = load_schema("schemas/raw_trade_thesis.json")
@@ -16,7 +21,8 @@ def create_trader_task(research_summary_json: dict) -> Task:
         agent = create_trader_agent(),
         description=(
             "Using the following summarized macro research, generate one possible "
-            "trading hypothesis and portfolio strategy:"
+            "trading hypothesis and portfolio strategy "
+            "(a citation [S<n>] in the findings refers to the n-th entry of \"sources\"):"
             f"{research_summary_json}"
             "Your output should:"
             "- Propose one distinct macro hypotheses"
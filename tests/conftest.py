@@ -0,0 +1,47 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import price_store  # noqa: E402
+
+
+def make_prices(tickers, start="2020-01-01", periods=400, seed=0, listed=None) -> pd.DataFrame:
+    """Random-walk closes on business days; `listed` maps a ticker to its first trading date."""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(start, periods=periods, name="Date")
+    closes = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.012, (periods, len(tickers))), axis=0))
+    prices = pd.DataFrame(closes, index=index, columns=tickers)
+    for ticker, first in (listed or {}).items():
+        prices.loc[prices.index < pd.Timestamp(first), ticker] = np.nan
+    return prices
+
+
+@pytest.fixture
+def seeded_store(tmp_path, monkeypatch):
+    """An offline price store under tmp_path, installed as the process-wide store."""
+    store = price_store.PriceStore(root=str(tmp_path / "prices"), offline=True)
+    monkeypatch.setattr(price_store, "_store", store)
+
+    def seed(prices: pd.DataFrame) -> None:
+        for ticker in prices.columns:
+            closes = prices[ticker].dropna()
+            bars = pd.DataFrame({column: closes for column in ("Open", "High", "Low", "Close")})
+            bars["Volume"] = 0
+            store.write_bars(ticker, bars)
+
+    return seed
+
+
+def portfolio(assets: dict[str, float], name: str | None = None) -> dict:
+    """A portfolio schema output holding `assets` ({ticker: weight})."""
+    output = {"schema": {"properties": {"assets": [
+        {"ticker": ticker, "weight": weight, "rationale": ""} for ticker, weight in assets.items()
+    ]}}}
+    if name is not None:
+        output["name"] = name
+    return output
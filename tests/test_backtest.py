@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_prices, portfolio
+from utils.backtest import backtest_portfolios, rebalance_indices, simulate_paths
+from utils.portfolio_evals import evaluate_portfolios, portfolio_weight_matrix
+
+TICKERS = ["AAA", "BBB", "CCC"]
+
+
+def reference_path(prices: pd.DataFrame, weights: np.ndarray, start: int, rebalance, cost_bps: float) -> dict:
+    """Day-by-day simulation of one path: dollar holdings plus cash, reset at each rebalance close."""
+    cost = cost_bps / 10_000
+    closes = prices.to_numpy(dtype=float)
+    rebalances = set(rebalance_indices(prices.index, rebalance).tolist())
+    cash_weight = 1 - weights.sum()
+
+    value = 1 - cost * np.abs(weights).sum()
+    holdings, cash = weights * value, cash_weight * value
+    values, turnover, n_rebalances = [value], np.abs(weights).sum(), 0
+    for t in range(start + 1, len(closes)):
+        holdings = holdings * closes[t] / closes[t - 1]
+        value = holdings.sum() + cash
+        if t in rebalances:
+            traded = np.abs(weights - holdings / value).sum()
+            turnover += traded
+            n_rebalances += 1
+            value *= 1 - cost * traded
+            holdings, cash = weights * value, cash_weight * value
+        values.append(value)
+
+    values = np.array(values)
+    daily = values[1:] / values[:-1] - 1
+    return {
+        "total_return": values[-1] - 1,
+        "volatility": daily.std(ddof=1) * np.sqrt(252),
+        "max_drawdown": (values / np.maximum.accumulate(values) - 1).min(),
+        "turnover": turnover,
+        "rebalances": n_rebalances,
+    }
+
+
+@pytest.mark.parametrize("rebalance", ["M", "Q", 15, None])
+@pytest.mark.parametrize("assets", [
+    {"AAA": 0.5, "BBB": 0.3, "CCC": 0.2},
+    {"AAA": 0.7, "BBB": -0.3},
+    {"AAA": 0.5, "BBB": -0.5},
+])
+def test_simulate_paths_matches_day_by_day_reference(rebalance, assets):
+    prices = make_prices(TICKERS, periods=300)
+    tickers, weights = portfolio_weight_matrix([portfolio(assets)])
+    prices = prices[tickers]
+    starts = np.array([0, 7, 45, 130, 250])
+
+    result, _ = simulate_paths(prices, weights, starts, np.zeros(len(starts), dtype=int), rebalance=rebalance, cost_bps=25)
+
+    for row, start in zip(result.itertuples(), starts):
+        expected = reference_path(prices, weights[:, 0], start, rebalance, cost_bps=25)
+        for metric, value in expected.items():
+            assert getattr(row, metric) == pytest.approx(value, rel=1e-9, abs=1e-12), metric
+
+
+def test_buy_and_hold_matches_evaluate_portfolios(seeded_store):
+    prices = make_prices(TICKERS, periods=200)
+    seeded_store(prices)
+    portfolios = [portfolio({"AAA": 0.6, "BBB": 0.4}), portfolio({"BBB": 0.2, "CCC": 0.8})]
+    start = str(prices.index[0].date())
+
+    result = backtest_portfolios(portfolios, [start], rebalance=None, cost_bps=0)
+    _, _, cumulative, _ = evaluate_portfolios(portfolios, start=start, risk_free_rate=0.0)
+
+    np.testing.assert_allclose(result["total_return"], cumulative.iloc[-1], rtol=1e-10)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.falsification_monitor import FalsificationMonitor, compile_trigger, compute_features, parse_index_trigger
+
+
+def evaluate(expression: str, prices: pd.DataFrame) -> np.ndarray:
+    trigger = compile_trigger(expression)
+    return np.broadcast_to(trigger.evaluate(compute_features(prices, trigger.features)), (len(prices),))
+
+
+def test_basis_points_match_parse_index_trigger():
+    prices = pd.DataFrame({"^TNX": [4.0, 4.2, 4.6]}, index=pd.bdate_range("2024-01-01", periods=3))
+    parsed = parse_index_trigger("10y", "rises 50bp within 2 days")
+
+    np.testing.assert_array_equal(evaluate('change("^TNX", 2) > 50bp', prices), [False, False, True])
+    np.testing.assert_array_equal(evaluate(parsed, prices), evaluate('change("^TNX", "2d") > 50bp', prices))
+
+
+@pytest.mark.parametrize("expression", [
+    'not price("SPY") > 500',
+    'not ret("SPY", 2) > 5%',
+    'not (price("SPY") > 500 and price("^VIX") > 30)',
+    'not price("MISSING") > 1',
+])
+def test_nan_features_never_fire(expression):
+    prices = pd.DataFrame(
+        {"SPY": [np.nan, 400.0, 410.0, 420.0], "^VIX": [15.0, np.nan, 15.0, 15.0]},
+        index=pd.bdate_range("2024-01-01", periods=4),
+    )
+    fired = evaluate(expression, prices)
+    features = compute_features(prices, compile_trigger(expression).features)
+
+    assert not fired[np.any([np.isnan(values) for values in features.values()], axis=0)].any()
+
+
+def test_scan_and_update_ignore_missing_ticker_under_not():
+    prices = pd.DataFrame({"SPY": [400.0, 410.0, 420.0]}, index=pd.bdate_range("2024-01-01", periods=3))
+    falsification = {"machine_triggers": [{"id": "calm", "expression": 'not price("^VIX") > 30'}]}
+    monitor = FalsificationMonitor()
+    monitor.add_thesis("thesis", falsification)
+
+    assert monitor.scan(prices)["first_fired"].isna().all()
+    assert monitor.update({"SPY": 430.0}, timestamp="2024-01-04") == []
+    assert [event.trigger_id for event in monitor.update({"^VIX": 20.0}, timestamp="2024-01-05")] == ["calm"]
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from conftest import make_prices, portfolio
+from utils.incremental_valuation import IncrementalPortfolioValuation
+from utils.portfolio_evals import get_portfolio_prices_and_value
+
+
+def test_seed_matches_get_portfolio_prices_and_value(seeded_store):
+    prices = make_prices(["AAA", "BBB"], periods=120)
+    seeded_store(prices)
+    held = portfolio({"AAA": 0.5, "BBB": 0.4})
+    _, expected = get_portfolio_prices_and_value(held, start=str(prices.index[0].date()))
+
+    seeded = IncrementalPortfolioValuation(held).seed(prices.reindex(expected.index).ffill())
+
+    for column in ("Portfolio_Value", "Daily_Return", "Cumulative_Return"):
+        np.testing.assert_allclose(seeded[column], expected[column], rtol=1e-12, atol=1e-15)
+
+
+def test_updates_continue_the_seeded_history():
+    prices = make_prices(["AAA", "BBB"], periods=60)
+    held = portfolio({"AAA": 0.5, "BBB": 0.4})
+    full = IncrementalPortfolioValuation(held).seed(prices)
+
+    live = IncrementalPortfolioValuation(held)
+    live.seed(prices.iloc[:40])
+    for timestamp, row in prices.iloc[40:].iterrows():
+        latest = live.update(timestamp, row.to_dict())
+
+    for column in full.columns:
+        assert latest[column] == pytest.approx(full[column].iloc[-1], rel=1e-12, abs=1e-15)
+
+
+def test_first_update_starts_at_zero_return():
+    valuation = IncrementalPortfolioValuation(portfolio({"AAA": 0.5, "BBB": 0.4}))
+    row = valuation.update("2024-01-02", {"AAA": 100.0, "BBB": 50.0})
+
+    assert row["Daily_Return"] == 0.0
+    assert row["Cumulative_Return"] == 0.0
+
+
+def test_asset_missing_from_first_tick_is_valued_from_its_first_price():
+    valuation = IncrementalPortfolioValuation(portfolio({"AAA": 0.5, "BBB": 0.5}))
+    valuation.update("2024-01-02", {"AAA": 100.0})
+    valuation.update("2024-01-03", {"BBB": 50.0})
+    row = valuation.update("2024-01-04", {"BBB": 100.0})
+
+    assert row["Portfolio_Value"] == pytest.approx(150.0)
+    assert row["Cumulative_Return"] == pytest.approx(0.5)
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_prices, portfolio
+from utils.portfolio_evals import (
+    calculate_sharpe_ratio,
+    evaluate_portfolios,
+    get_portfolio_prices_and_value,
+    portfolio_weight_matrix,
+)
+
+PORTFOLIOS = [
+    portfolio({"AAA": 0.6, "BBB": 0.4}),
+    portfolio({"BBB": 0.5, "CCC": 0.4}),  # weights not summing to 1
+    portfolio({"CCC": 1.0, "DDD": 0.5}),  # DDD lists after the start date
+    portfolio({"AAA": 0.7, "BBB": -0.3}),
+]
+
+
+@pytest.fixture
+def prices(seeded_store):
+    prices = make_prices(["AAA", "BBB", "CCC", "DDD"], periods=250, listed={"DDD": "2020-03-02"})
+    seeded_store(prices)
+    return prices
+
+
+@pytest.mark.parametrize("risk_free_rate", [0.0, 0.03])
+def test_evaluate_portfolios_matches_per_portfolio_path(prices, risk_free_rate):
+    start = str(prices.index[0].date())
+    values, daily, cumulative, sharpe = evaluate_portfolios(PORTFOLIOS, start=start, risk_free_rate=risk_free_rate)
+
+    for j, single in enumerate(PORTFOLIOS):
+        _, expected = get_portfolio_prices_and_value(single, start=start)
+        np.testing.assert_allclose(values[j], expected["Portfolio_Value"], rtol=1e-12)
+        np.testing.assert_allclose(daily[j], expected["Daily_Return"], rtol=1e-12, atol=1e-15)
+        np.testing.assert_allclose(cumulative[j], expected["Cumulative_Return"], rtol=1e-12, atol=1e-15)
+        assert sharpe[j] == pytest.approx(calculate_sharpe_ratio(expected, risk_free_rate=risk_free_rate), rel=1e-10)
+
+
+def test_evaluate_portfolios_uses_names_when_unique(prices):
+    named = [portfolio({"AAA": 1.0}, name="a"), portfolio({"BBB": 1.0}, name="b")]
+    values, _, _, sharpe = evaluate_portfolios(named, start=str(prices.index[0].date()), risk_free_rate=0.0)
+
+    assert list(values.columns) == ["a", "b"]
+    assert list(sharpe.index) == ["a", "b"]
+    assert isinstance(values.index, pd.DatetimeIndex)
+
+
+def test_evaluate_portfolios_starts_each_portfolio_at_its_own_first_price(seeded_store):
+    prices = make_prices(["AAA", "BBB", "EEE"], periods=250, listed={"AAA": "2020-03-02", "BBB": "2020-03-02"})
+    seeded_store(prices)
+    start = str(prices.index[0].date())
+    batch = [portfolio({"AAA": 0.6, "BBB": 0.4}), portfolio({"EEE": 1.0}), portfolio({"AAA": 1.0, "EEE": 0.5})]
+
+    values, daily, cumulative, sharpe = evaluate_portfolios(batch, start=start, risk_free_rate=0.0)
+
+    for j, single in enumerate(batch):
+        _, expected = get_portfolio_prices_and_value(single, start=start)
+        assert values[j].first_valid_index() == expected.index[0]
+        np.testing.assert_allclose(values[j].loc[expected.index], expected["Portfolio_Value"], rtol=1e-12)
+        np.testing.assert_allclose(daily[j].loc[expected.index], expected["Daily_Return"], rtol=1e-12, atol=1e-15)
+        np.testing.assert_allclose(cumulative[j].loc[expected.index], expected["Cumulative_Return"], rtol=1e-12, atol=1e-15)
+        assert sharpe[j] == pytest.approx(calculate_sharpe_ratio(expected, risk_free_rate=0.0), rel=1e-10)
+
+
+def test_portfolio_weight_matrix_scales_by_gross_exposure():
+    missing = portfolio({"AAA": 1.0, "BBB": 1.0})
+    missing["schema"]["properties"]["assets"][1]["weight"] = None
+    repeated = portfolio({"AAA": 2.0, "CCC": 2.0})
+    repeated["schema"]["properties"]["assets"].append({"ticker": "CCC", "weight": 4.0})
+    portfolios = [portfolio({"AAA": 0.5, "BBB": -0.5}), repeated, missing, portfolio({"AAA": 0.0})]
+
+    tickers, weights = portfolio_weight_matrix(portfolios)
+    _, raw = portfolio_weight_matrix(portfolios, gross=False)
+
+    assert tickers == ["AAA", "BBB", "CCC"]
+    np.testing.assert_allclose(weights, [[0.5, 0.25, 1.0, 0.0], [-0.5, 0.0, 0.0, 0.0], [0.0, 0.75, 0.0, 0.0]])
+    np.testing.assert_allclose(raw, [[0.5, 2.0, 1.0, 0.0], [-0.5, 0.0, 0.0, 0.0], [0.0, 6.0, 0.0, 0.0]])
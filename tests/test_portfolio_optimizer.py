@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from utils.portfolio_optimizer import optimize_weights, project_to_bounds, shrunk_covariance
+
+
+def random_covariance(n: int, seed: int = 0) -> np.ndarray:
+    """A well-conditioned covariance of daily returns with positive correlations."""
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0, 0.01, (n, 2))
+    return factors @ factors.T + np.diag(rng.uniform(0.5, 2.0, n) * 1e-4)
+
+
+def ledoit_wolf_reference(returns: np.ndarray) -> tuple[np.ndarray, float]:
+    """Ledoit & Wolf (2004), Lemma 3.2-3.3, day by day."""
+    n_days, n = returns.shape
+    x = returns - returns.mean(axis=0)
+    sample = x.T @ x / n_days
+    mu = np.trace(sample) / n
+    d2 = np.linalg.norm(sample - mu * np.eye(n)) ** 2
+    b2_bar = sum(np.linalg.norm(np.outer(day, day) - sample) ** 2 for day in x) / n_days ** 2
+    shrinkage = min(b2_bar, d2) / d2
+    return shrinkage * mu * np.eye(n) + (1 - shrinkage) * sample, shrinkage
+
+
+@pytest.mark.parametrize("n_days, n", [(80, 5), (250, 20), (500, 3)])
+def test_shrunk_covariance_matches_ledoit_wolf(n_days, n):
+    rng = np.random.default_rng(n)
+    returns = rng.multivariate_normal(np.full(n, 0.0005), random_covariance(n, seed=n), size=n_days)
+
+    covariance, shrinkage = shrunk_covariance(returns)
+    expected, expected_shrinkage = ledoit_wolf_reference(returns)
+
+    assert shrinkage == pytest.approx(expected_shrinkage, rel=1e-10)
+    np.testing.assert_allclose(covariance, expected, rtol=1e-10, atol=1e-18)
+
+
+def bisection_projection(weights: np.ndarray, lower: float, upper: float) -> np.ndarray:
+    lo, hi = weights.min() - upper, weights.max() - lower
+    for _ in range(200):
+        tau = (lo + hi) / 2
+        if np.clip(weights - tau, lower, upper).sum() > 1:
+            lo = tau
+        else:
+            hi = tau
+    return np.clip(weights - (lo + hi) / 2, lower, upper)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("lower, upper", [(0.0, 1.0), (0.0, 0.3), (0.05, 0.2), (-0.1, 0.5)])
+def test_project_to_bounds_matches_bisection(seed, lower, upper):
+    weights = np.random.default_rng(seed).normal(0.1, 0.3, 10)
+
+    projected = project_to_bounds(weights, lower, upper)
+
+    np.testing.assert_allclose(projected, bisection_projection(weights, lower, upper), atol=1e-12)
+    assert projected.sum() == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("n", [2, 5, 30])
+def test_risk_parity_equalises_risk_contributions(n):
+    covariance = random_covariance(n, seed=n)
+
+    weights = optimize_weights(covariance, "risk_parity", min_weight=0.0, max_weight=1.0)
+
+    contributions = weights * (covariance @ weights)
+    np.testing.assert_allclose(contributions / contributions.sum(), np.full(n, 1.0 / n), rtol=1e-6)
+    assert weights.sum() == pytest.approx(1.0)
+
+
+def test_min_variance_matches_closed_form_when_bounds_do_not_bind():
+    covariance = random_covariance(6, seed=3)
+    inverse_ones = np.linalg.solve(covariance, np.ones(6))
+    expected = inverse_ones / inverse_ones.sum()
+    assert (expected > 0).all() and expected.max() < 1  # the bounds below are slack
+
+    weights = optimize_weights(covariance, "min_variance", min_weight=0.0, max_weight=1.0)
+
+    np.testing.assert_allclose(weights, expected, atol=1e-6)
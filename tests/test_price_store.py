@@ -0,0 +1,33 @@
+import json
+import os
+
+import pandas as pd
+
+from conftest import make_prices
+from utils.price_store import PriceStore
+
+
+def fake_download(prices: pd.DataFrame):
+    def download(symbols, start, end, interval):
+        frames = {}
+        for symbol in symbols:
+            closes = prices[symbol].loc[start:end]
+            frames[symbol] = pd.DataFrame({column: closes for column in ("Open", "High", "Low", "Close", "Volume")})
+        return frames
+    return download
+
+
+def test_coverage_merges_refreshes_from_another_store(tmp_path, monkeypatch):
+    prices = make_prices(["AAA", "BBB"], periods=100)
+    monkeypatch.setattr(PriceStore, "_download", lambda self, *args: fake_download(prices)(*args))
+    first, second = PriceStore(root=str(tmp_path)), PriceStore(root=str(tmp_path))
+    first._load_coverage("1d")  # both stores load the coverage before either refreshes
+    second._load_coverage("1d")
+
+    first.refresh(["AAA"], start="2020-01-01")
+    second.refresh(["BBB"], start="2020-01-01")
+
+    with open(os.path.join(str(tmp_path), "1d", "_coverage.json")) as f:
+        coverage = json.load(f)
+    assert sorted(coverage) == ["AAA", "BBB"]
+    assert not [name for name in os.listdir(os.path.join(str(tmp_path), "1d")) if name.endswith(".tmp")]
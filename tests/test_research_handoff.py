@@ -0,0 +1,30 @@
+from utils.research_handoff import compact_research, condense_research
+
+
+def test_bracketed_numbers_in_findings_are_not_source_references():
+    results = [
+        ("task", "Fed", "Rates stay high [1] (https://fed.gov). See [Minutes](https://fed.gov/minutes)."),
+        ("task", "Inflation", "Core inflation [2] is sticky, per https://bls.gov."),
+    ]
+
+    summary = compact_research(results)
+
+    assert summary["sources"] == ["https://fed.gov", "https://fed.gov/minutes", "https://bls.gov"]
+    assert summary["research"][0]["findings"] == "Rates stay high [1] [S1]. See Minutes [S2]."
+    assert summary["research"][1]["findings"] == "Core inflation [2] is sticky, per [S3]."
+
+
+def test_condense_renumbers_only_source_references():
+    summary = {
+        "sources": ["https://a.com", "https://b.com", "https://c.com"],
+        "research": [
+            {"agent": "Fed", "findings": "Rates stay high [2] [S3]. " + "Padding sentence. " * 40 + "Dropped [S1]."},
+            {"agent": "Inflation", "findings": "Core inflation [1] is sticky [S2]."},
+        ],
+    }
+
+    condensed = condense_research(summary, token_budget=100)
+
+    assert condensed["sources"] == ["https://c.com", "https://b.com"]
+    assert condensed["research"][0]["findings"].startswith("Rates stay high [2] [S1].")
+    assert condensed["research"][1]["findings"] == "Core inflation [1] is sticky [S2]."
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_prices, portfolio
+from utils.risk_simulation import (
+    bootstrap_indices,
+    portfolio_daily_returns,
+    simulate_paths,
+    simulate_portfolio_risk,
+    var_cvar,
+)
+
+
+def test_simulate_paths_is_reproducible_from_its_seed():
+    daily = np.random.default_rng(0).normal(0.0003, 0.01, 500)
+
+    first = simulate_paths(daily, n_paths=2000, horizon=60, seed=7)
+    again = simulate_paths(daily, n_paths=2000, horizon=60, seed=7)
+    other = simulate_paths(daily, n_paths=2000, horizon=60, seed=8)
+
+    for h in first[0]:
+        np.testing.assert_array_equal(first[0][h], again[0][h])
+    np.testing.assert_array_equal(first[1], again[1])
+    assert not np.array_equal(first[1], other[1])
+
+
+@pytest.mark.parametrize("block_days", [1, 5, 20])
+def test_stationary_blocks_have_mean_length_block_days(block_days):
+    n_obs = 1_000_000  # a new block continuing the previous one is then negligibly rare
+    indices = bootstrap_indices(np.random.default_rng(0), n_obs, 2000, 250, block_days=block_days)
+
+    breaks = (indices[:, 1:] - indices[:, :-1]) % n_obs != 1
+    assert 1 / breaks.mean() == pytest.approx(block_days, rel=0.02)
+
+
+def test_block_bootstrap_uses_fixed_blocks():
+    indices = bootstrap_indices(np.random.default_rng(0), 500, 10, 30, block_days=10, method="block")
+
+    breaks = (indices[:, 1:] - indices[:, :-1]) % 500 != 1
+    assert not breaks[:, [i for i in range(29) if (i + 1) % 10]].any()
+
+
+def test_var_cvar_of_known_distributions():
+    uniform = np.linspace(-1, 1, 2001)
+    assert var_cvar(uniform, 0.95) == pytest.approx((0.9, 0.95))
+
+    normal = np.random.default_rng(0).normal(0, 0.02, 2_000_000)
+    value_at_risk, expected_shortfall = var_cvar(normal, 0.95)
+    assert value_at_risk == pytest.approx(1.6449 * 0.02, rel=5e-3)
+    assert expected_shortfall == pytest.approx(2.0627 * 0.02, rel=5e-3)
+
+
+def test_portfolio_daily_returns_hold_gross_scaled_weights(seeded_store):
+    prices = make_prices(["AAA", "BBB", "CCC"], periods=400)
+    seeded_store(prices)
+    end = str((prices.index[-1] + pd.Timedelta(days=1)).date())
+
+    daily = portfolio_daily_returns(portfolio({"AAA": 1.2, "BBB": -0.4, "CCC": 0.4}), end=end)  # gross 2
+
+    expected = prices.pct_change().iloc[1:] @ pd.Series({"AAA": 0.6, "BBB": -0.2, "CCC": 0.2})
+    np.testing.assert_allclose(daily, expected, rtol=1e-12)
+
+
+def test_risk_of_a_constant_history(seeded_store):
+    # Long a ticker losing 0.1% a day, short one gaining 0.1%: the portfolio loses 0.1% every day
+    index = pd.bdate_range("2020-01-01", periods=400, name="Date")
+    days = np.arange(len(index))
+    prices = pd.DataFrame({"AAA": 100 * 0.999 ** days, "BBB": 100 * 1.001 ** days}, index=index)
+    seeded_store(prices)
+    end = str((index[-1] + pd.Timedelta(days=1)).date())
+
+    result = simulate_portfolio_risk(portfolio({"AAA": 1.0, "BBB": -1.0}), n_paths=500, horizon=21, end=end)
+
+    loss_1d, loss_21d = 0.1, round((1 - 0.999 ** 21) * 100, 2)
+    assert result["var"]["1d_95%"] == {"var": loss_1d, "cvar": loss_1d}
+    assert result["var"]["21d_99%"] == {"var": loss_21d, "cvar": loss_21d}
+    assert result["max_drawdown"] == {f"p{p}": loss_21d for p in (50, 75, 95, 99)}
+    assert result["historical_volatility"] == 0.0
@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from tools.search_cache import SearchCache, search_cache_mode
+from utils.disk_cache import DiskCache
+
+
+def test_disk_hit_keeps_its_original_age(tmp_path):
+    disk = DiskCache(str(tmp_path / "searches.sqlite"), ttl=100)
+    disk.set("query", '{"organic": []}')
+    disk._conn.execute("UPDATE entries SET created_at = ?", (time.time() - 90,))
+    cache = SearchCache(disk=disk, ttl=100)
+
+    assert cache.fetch("query", lambda: {"organic": ["new"]}) == {"organic": []}
+    cached_at, _ = cache._memory["query"]
+    assert time.time() - cached_at >= 90
+
+
+def test_memory_is_bounded_and_drops_expired_entries(tmp_path):
+    cache = SearchCache(disk=None, ttl=100, max_memory_entries=3)
+    cache._remember("expired", time.time() - 200, {})
+    for i in range(5):
+        cache.fetch(f"query {i}", lambda: {"organic": []})
+
+    assert list(cache._memory) == ["query 2", "query 3", "query 4"]
+
+
+@pytest.mark.parametrize("llm_mode, search_mode, expected", [
+    ("off", None, "record"),
+    ("record", "off", "off"),
+    ("replay", None, "replay"),
+    ("replay", "replay", "replay"),
+])
+def test_search_cache_mode(monkeypatch, llm_mode, search_mode, expected):
+    monkeypatch.setenv("LLM_CACHE_MODE", llm_mode)
+    if search_mode is None:
+        monkeypatch.delenv("SEARCH_CACHE_MODE", raising=False)
+    else:
+        monkeypatch.setenv("SEARCH_CACHE_MODE", search_mode)
+
+    assert search_cache_mode() == expected
+
+
+@pytest.mark.parametrize("search_mode", ["off", "record"])
+def test_llm_replay_refuses_live_searches(monkeypatch, search_mode):
+    monkeypatch.setenv("LLM_CACHE_MODE", "replay")
+    monkeypatch.setenv("SEARCH_CACHE_MODE", search_mode)
+
+    with pytest.raises(ValueError, match="replay"):
+        search_cache_mode()
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from conftest import make_prices, portfolio
+from utils.stress_scenarios import ScenarioLibrary, stress_test, stress_test_portfolios
+
+SCENARIOS = {
+    "first": ("2020-02-03", "2020-03-02", ""),
+    "second": ("2020-06-01", "2020-07-01", ""),
+}
+
+
+def test_instruments_without_history_are_not_persisted(seeded_store, tmp_path):
+    seeded_store(make_prices(["AAA"], periods=200))
+    path = str(tmp_path / "scenarios.parquet")
+    library = ScenarioLibrary(path=path, scenarios=SCENARIOS)
+
+    library.ensure(["AAA", "NOHISTORY"])
+
+    assert library._returns.loc["NOHISTORY"].isna().all()
+    assert list(pd.read_parquet(path).index) == ["AAA"]
+
+
+def test_save_keeps_rows_stored_by_another_library(seeded_store, tmp_path):
+    prices = make_prices(["AAA", "BBB"], periods=200)
+    seeded_store(prices)
+    path = str(tmp_path / "scenarios.parquet")
+    first, second = ScenarioLibrary(path=path, scenarios=SCENARIOS), ScenarioLibrary(path=path, scenarios=SCENARIOS)
+
+    first.ensure(["AAA"])
+    second.ensure(["BBB"])
+
+    stored = pd.read_parquet(path)
+    assert sorted(stored.index) == ["AAA", "BBB"]
+    np.testing.assert_allclose(stored.loc["AAA"], first._returns.loc["AAA"])
+    assert "AAA" in second._returns.index
+
+
+def stress_library(tmp_path, returns: dict) -> ScenarioLibrary:
+    """A library holding fixed {ticker: [first, second]} scenario returns."""
+    library = ScenarioLibrary(path=str(tmp_path / "scenarios.parquet"), scenarios=SCENARIOS)
+    library._returns = pd.DataFrame.from_dict(returns, orient="index", columns=list(SCENARIOS), dtype=float)
+    return library
+
+
+def test_uncovered_instrument_leaves_the_scenario_uncomputed(tmp_path):
+    # NEW has no return in the first window and neither has SPY, its fallback proxy
+    library = stress_library(tmp_path, {"AAA": [-0.5, 0.1], "NEW": [np.nan, 0.2], "SPY": [np.nan, 0.0]})
+    held = portfolio({"AAA": 0.5, "NEW": 0.5})
+
+    result = stress_test(held, max_loss=0.3, library=library)
+
+    assert result["scenarios"]["first"]["return"] is None
+    assert result["scenarios"]["first"]["coverage"] == 50.0
+    assert result["scenarios"]["second"] == {**result["scenarios"]["second"], "return": 15.0, "coverage": 100.0}
+    assert result["passed"] is None
+    assert stress_test_portfolios([held], library=library)[0].isna().tolist() == [True, False]
+
+
+def test_stress_test_fails_on_a_computed_loss_and_passes_only_when_complete(tmp_path):
+    library = stress_library(tmp_path, {"AAA": [-0.5, 0.1], "NEW": [-0.1, np.nan], "SPY": [-0.2, np.nan]})
+    partial = portfolio({"AAA": 0.5, "NEW": 0.5})
+
+    assert stress_test(partial, max_loss=0.2, library=library)["passed"] is False
+    assert stress_test(partial, max_loss=0.4, library=library)["passed"] is None
+    assert stress_test(portfolio({"AAA": 1.0}), max_loss=0.6, library=library)["passed"] is True
@@ -0,0 +1,16 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.tracing import Tracer
+
+
+def test_concurrent_exports_each_write_the_metrics_file(tmp_path):
+    metrics_path = tmp_path / "metrics.prom"
+    tracer = Tracer(trace_dir=None, metrics_path=str(metrics_path))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for future in [pool.submit(tracer.export) for _ in range(200)]:
+            future.result()
+
+    assert metrics_path.read_text() == tracer.prometheus_text()
+    assert os.listdir(tmp_path) == ["metrics.prom"]
@@ -0,0 +1,21 @@
+import pytest
+
+from utils.utils import normalize_trader_hypotheses
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ('{"hypotheses": [{"name": "a"}, {"name": "b"}]}', [{"name": "a"}, {"name": "b"}]),
+    ('```json\n{"hypotheses": [{"name": "a"}]}\n```', [{"name": "a"}]),
+    ('```\n[{"name": "a"}]\n```', [{"name": "a"}]),
+    ('{"items": {"name": "a"}}', [{"name": "a"}]),
+    ({"name": "a"}, [{"name": "a"}]),
+    ([{"name": "a"}], [{"name": "a"}]),
+    ("", []),
+])
+def test_normalize_trader_hypotheses(raw, expected):
+    assert normalize_trader_hypotheses(raw) == expected
+
+
+def test_text_that_is_not_json_is_one_hypothesis():
+    raw = "Long TLT: growth is slowing faster than the market prices."
+    assert normalize_trader_hypotheses(raw) == [raw]
@@ -1,5 +1,6 @@
 # tools/research_tools.py
 import logging
+import os
 
 from crewai_tools import (
     SerperDevTool,
@@ -9,11 +10,51 @@ from crewai_tools import (
     # PythonTool
 )
 
+from tools.search_cache import get_search_cache, make_search_cache_key
+from utils.rate_limits import get_rate_limiter
+from utils.registry import shared
+
 logger = logging.getLogger(__name__)
 
+
+class CachedSerperDevTool(SerperDevTool):
+    """
+    SerperDevTool whose API requests go through the shared search cache
+    (tools/search_cache.py): near-identical queries from different agents are
+    served from memory/disk, and concurrent identical queries share one HTTP call.
+    Calls that reach the API go through the Serper rate limiter (utils/rate_limits.py).
+    """
+
+    def _make_api_request(self, search_query: str, search_type: str) -> dict:
+        key = make_search_cache_key(
+            search_query,
+            search_type=search_type,
+            n_results=self.n_results,
+            country=self.country,
+            location=self.location,
+            locale=self.locale,
+        )
+        return get_search_cache().fetch(
+            key,
+            lambda: get_rate_limiter("serper").call(
+                lambda: super(CachedSerperDevTool, self)._make_api_request(search_query, search_type)
+            ),
+        )
+
+
+@shared("process")
+def shared_search_tool() -> CachedSerperDevTool:
+    """The single Serper search tool instance shared by every agent and task."""
+    logger.info("Initializing shared Serper search tool...")
+    return CachedSerperDevTool(
+        base_url=os.getenv("SERPER_BASE_URL", "https://google.serper.dev"),
+    )
+
+
 def research_tools():
     """
     Returns a standard set of tools for macro/multi-strategy research agents.
+    Tool instances are shared across agents; only the list itself is new.
 
     Includes:
     - Web search
@@ -22,18 +63,15 @@ def research_tools():
     - Python for quick calculations
     - Structured JSON output formatting
     """
-    
-    logger.info("Initializing standard research tools for agents...")
 
     tools = [
-        SerperDevTool(),         # Search the web (via Serper API)
+        shared_search_tool(),    # Search the web (via Serper API, cached)
         # ScrapeWebsiteTool(),   # Pull text from URLs
         # PDFSearchTool(),       # Extract info from PDF reports
         # PythonTool(),          # Do lightweight calcs
         # JsonFormattingTool(),  # Output in JSON for downstream crews
     ]
 
-    logger.info(f"Loaded {len(tools)} research tools: {[tool.__class__.__name__ for tool in tools]}")
     return tools
 
 def serper_logic_for_query():
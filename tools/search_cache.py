@@ -0,0 +1,181 @@
+# tools/search_cache.py
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future
+
+from utils.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+# off:    every search hits the API
+# record: serve fresh hits from memory/disk, call the API on a miss and store the result
+# replay: serve everything from the cache and never call the API (a miss is an error)
+SEARCH_CACHE_MODES = ("off", "record", "replay")
+
+DEFAULT_SEARCH_CACHE_PATH = "cache/serper_searches.sqlite"
+DEFAULT_SEARCH_CACHE_TTL = 6 * 3600  # seconds
+DEFAULT_SEARCH_CACHE_MAX_MB = 64
+DEFAULT_SEARCH_CACHE_MEMORY_ENTRIES = 512  # in-process results kept; older ones are re-read from disk
+
+
+class SearchCacheMissError(RuntimeError):
+    """Raised in replay mode when a query has no recorded result."""
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalises a search query so near-identical queries share a cache entry:
+    unicode-normalised, lowercased, quotes and stray punctuation removed,
+    whitespace collapsed.
+    """
+    query = unicodedata.normalize("NFKC", query or "").lower()
+    query = re.sub(r"[\"'`“”‘’?!,;:()\[\]{}]", " ", query)
+    return " ".join(query.split())
+
+
+def search_cache_mode() -> str:
+    """
+    Returns the search cache mode from SEARCH_CACHE_MODE (default "record"). A run that
+    replays LLM responses (LLM_CACHE_MODE=replay) replays searches too, so it makes no
+    network calls; asking for live searches alongside it is an error.
+    """
+    llm_replay = os.getenv("LLM_CACHE_MODE", "off").lower() == "replay"
+    mode = os.getenv("SEARCH_CACHE_MODE", "replay" if llm_replay else "record").lower()
+    if mode not in SEARCH_CACHE_MODES:
+        raise ValueError(f"Invalid SEARCH_CACHE_MODE '{mode}'. Must be one of: {', '.join(SEARCH_CACHE_MODES)}")
+    if llm_replay and mode != "replay":
+        raise ValueError(f"SEARCH_CACHE_MODE '{mode}' would call Serper in an LLM_CACHE_MODE=replay run; use 'replay'.")
+    return mode
+
+
+def make_search_cache_key(query: str, **params) -> str:
+    """Cache key from the normalised query plus any request parameters."""
+    return json.dumps({"q": normalize_query(query), **params}, sort_keys=True)
+
+
+class SearchCache:
+    """
+    Two-level (in-process + on-disk) cache for search results with a freshness TTL.
+
+    Concurrent callers asking for the same key while a request is in flight wait
+    for that request instead of issuing their own.
+    """
+
+    def __init__(
+        self,
+        disk: DiskCache | None,
+        ttl: float | None,
+        mode: str = "record",
+        max_memory_entries: int = DEFAULT_SEARCH_CACHE_MEMORY_ENTRIES,
+    ):
+        self.disk = disk
+        self.ttl = ttl
+        self.mode = mode
+        self.max_memory_entries = max_memory_entries
+        self._memory: dict[str, tuple[float, dict]] = {}  # key -> (created_at, results), in insertion order
+        self._in_flight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, created_at: float, results: dict) -> None:
+        """Keeps a result in memory, dropping expired entries and then the oldest beyond the bound."""
+        self._memory.pop(key, None)
+        self._memory[key] = (created_at, results)
+        if self.ttl is not None and self.mode != "replay":
+            cutoff = time.time() - self.ttl
+            for stale in [k for k, (at, _) in self._memory.items() if at < cutoff]:
+                del self._memory[stale]
+        while len(self._memory) > self.max_memory_entries:
+            del self._memory[next(iter(self._memory))]
+
+    def _get_fresh(self, key: str) -> dict | None:
+        entry = self._memory.get(key)
+        check_ttl = self.mode != "replay"
+        if entry is not None:
+            created_at, results = entry
+            if not check_ttl or self.ttl is None or time.time() - created_at <= self.ttl:
+                return results
+            del self._memory[key]
+
+        if self.disk is not None:
+            cached = self.disk.get_entry(key, check_ttl=check_ttl)
+            if cached is not None:
+                value, created_at = cached
+                results = json.loads(value)
+                # Age from when the search ran, not when this process first read it
+                self._remember(key, created_at, results)
+                return results
+        return None
+
+    def fetch(self, key: str, request) -> dict:
+        """
+        Returns the cached result for `key`, calling `request()` on a miss.
+
+        Args:
+            key (str): Cache key (see make_search_cache_key).
+            request (callable): Zero-argument callable performing the real search.
+        """
+        if self.mode == "off":
+            return request()
+
+        with self._lock:
+            results = self._get_fresh(key)
+            if results is not None:
+                logger.info(f"Search cache hit: {key}")
+                return results
+
+            if self.mode == "replay":
+                raise SearchCacheMissError(f"No recorded search result for {key} in replay mode.")
+
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not owner:
+            logger.info(f"Search already in flight, waiting: {key}")
+            return future.result()
+
+        logger.info(f"Search cache miss: {key}")
+        try:
+            results = request()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            with self._lock:
+                self._remember(key, time.time(), results)
+            if self.disk is not None:
+                self.disk.set(key, json.dumps(results))
+            future.set_result(results)
+            return results
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+
+_search_cache: SearchCache | None = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """Returns the process-wide search cache, configured from the environment."""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            mode = search_cache_mode()
+            ttl = float(os.getenv("SEARCH_CACHE_TTL", DEFAULT_SEARCH_CACHE_TTL))
+            disk = None
+            if mode != "off":
+                disk = DiskCache(
+                    path=os.getenv("SEARCH_CACHE_PATH", DEFAULT_SEARCH_CACHE_PATH),
+                    ttl=ttl,
+                    max_bytes=int(float(os.getenv("SEARCH_CACHE_MAX_MB", DEFAULT_SEARCH_CACHE_MAX_MB)) * 1024 * 1024),
+                )
+            _search_cache = SearchCache(disk=disk, ttl=ttl, mode=mode)
+        return _search_cache
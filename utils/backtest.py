@@ -0,0 +1,334 @@
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.portfolio_evals import portfolio_weight_matrix
+from utils.price_store import get_price_store
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+REBALANCE_FREQUENCIES = {"W": "W", "M": "M", "Q": "Q", "Y": "Y"}
+# Bounds the (dates x paths) arrays built at once when many (portfolio, start) paths are simulated
+MAX_PATH_CELLS = 20_000_000
+
+
+def rebalance_indices(index: pd.DatetimeIndex, rebalance: str | int | None) -> np.ndarray:
+    """
+    Rows of `index` at whose close the portfolios are reset to their target weights.
+
+    Args:
+        index (pd.DatetimeIndex): Trading days of the price matrix.
+        rebalance (str | int | None): "W", "M", "Q" or "Y" for the last trading day of
+            each week/month/quarter/year, an int n for every n trading days, or None
+            for buy-and-hold.
+    """
+    if rebalance is None:
+        return np.array([], dtype=int)
+    if isinstance(rebalance, int):
+        return np.arange(rebalance, len(index), rebalance)
+    if rebalance not in REBALANCE_FREQUENCIES:
+        raise ValueError(f"Invalid rebalance '{rebalance}'. Must be an int or one of: {', '.join(REBALANCE_FREQUENCIES)}")
+    periods = index.to_period(REBALANCE_FREQUENCIES[rebalance]).asi8
+    return np.flatnonzero(periods[1:] != periods[:-1])
+
+
+def _turnover(growth: np.ndarray, weights: np.ndarray, cash: np.ndarray) -> np.ndarray:
+    """
+    One-way turnover of resetting drifted holdings to `weights`: sum_i |w_i - drifted_i|.
+
+    Args:
+        growth: (rows x tickers) growth of each asset since the last reset.
+        weights: (rows x tickers) target weights of each row's portfolio.
+        cash: (rows,) cash each row's portfolio holds, 1 - sum(weights).
+    """
+    value = (growth * weights).sum(axis=1, keepdims=True) + cash[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drifted = np.where(value != 0, weights * growth / value, weights)
+    return np.abs(weights - drifted).sum(axis=1)
+
+
+def simulate_paths(
+    prices: pd.DataFrame,
+    weights: np.ndarray,
+    starts: np.ndarray,
+    columns: np.ndarray,
+    rebalance: str | int | None = "M",
+    cost_bps: float = 10.0,
+    risk_free_rate: float = 0.0,
+    return_paths: bool = False,
+) -> tuple[pd.DataFrame, np.ndarray | None]:
+    """
+    Walk-forward simulation of many (start row, portfolio column) paths over one price
+    matrix, with periodic rebalancing and proportional transaction costs.
+
+    Between resets holdings drift with prices. Capital not net invested (1 - sum of
+    weights, e.g. the proceeds of shorts) is held as cash at zero return. Segments that
+    begin on a common rebalance day are identical for every path through them, so their
+    daily returns and turnover are computed once per portfolio as matrix products; only
+    each path's first, start-dependent segment is computed per path. Paths are then
+    assembled in chunks of at most MAX_PATH_CELLS cells.
+
+    Args:
+        prices (pd.DataFrame): (dates x tickers) prices, forward-filled.
+        weights (np.ndarray): (tickers x portfolios) target weights.
+        starts (np.ndarray): Row of `prices` each path buys in at (at that day's close).
+        columns (np.ndarray): Portfolio column of `weights` each path holds.
+        rebalance (str | int | None): See rebalance_indices.
+        cost_bps (float): Cost per unit of one-way turnover, in basis points.
+        risk_free_rate (float): Annual rate subtracted from daily returns for the Sharpe ratio.
+        return_paths (bool): Also return the (dates x paths) value paths (1.0 at the start).
+
+    Returns:
+        tuple[pd.DataFrame, np.ndarray | None]: One row of metrics per path (total_return,
+            cagr, volatility, sharpe, max_drawdown, turnover, rebalances), and the value
+            paths if requested.
+    """
+    cost = cost_bps / 10_000
+    index = prices.index
+    n_days = len(index)
+    returns = prices.pct_change().to_numpy(dtype=float, copy=True)
+    returns[0] = 0.0
+    returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)  # unlisted / missing bars: flat
+    growth = np.exp(np.cumsum(np.log1p(returns), axis=0))  # (dates x tickers) growth since the first row
+
+    rebalances = rebalance_indices(index, rebalance)
+    days = np.arange(n_days)
+    cash = 1.0 - weights.sum(axis=0)  # (portfolios,)
+
+    # ---- shared segments: reset at each rebalance close -----------------------
+    # origin[t] = last rebalance strictly before t (-1 before the first one)
+    position = np.searchsorted(rebalances, days, side="left") - 1
+    origin = np.full(n_days, -1)
+    origin[position >= 0] = rebalances[position[position >= 0]]
+    shared_log = np.zeros((n_days, weights.shape[1]))
+    active = origin >= 0
+    if active.any():
+        t = days[active]
+        base = growth[origin[active]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shared_log[active] = (
+                np.log((growth[t] / base) @ weights + cash) - np.log((growth[t - 1] / base) @ weights + cash)
+            )
+    shared_log = np.nan_to_num(shared_log, nan=0.0, posinf=0.0, neginf=0.0)
+
+    # Turnover at each rebalance that closes a shared segment, per portfolio
+    shared_turnover = np.zeros((n_days, weights.shape[1]))
+    closing = rebalances[origin[rebalances] >= 0] if len(rebalances) else rebalances
+    if len(closing):
+        segment_growth = growth[closing] / growth[origin[closing]]  # (closing x tickers)
+        value = segment_growth @ weights + cash
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drift = np.abs(1 - segment_growth[:, :, None] / value[:, None, :])  # (closing x tickers x portfolios)
+        shared_turnover[closing] = np.nan_to_num(np.einsum("tnp,np->tp", drift, np.abs(weights)))
+        shared_log[closing] += np.log1p(-cost * shared_turnover[closing])
+
+    # ---- first segment of each path: from its own start to the next rebalance ----
+    following = np.searchsorted(rebalances, starts, side="right")
+    has_reset = following < len(rebalances)
+    first_end = np.full(len(starts), n_days - 1)
+    first_end[has_reset] = rebalances[following[has_reset]]
+    lengths = first_end - starts
+    path_of_row = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    row_day = starts[path_of_row] + 1 + offsets
+    row_weights = weights[:, columns[path_of_row]].T
+    row_cash = cash[columns[path_of_row]]
+    row_base = growth[starts[path_of_row]]
+    row_growth = growth[row_day] / row_base
+    with np.errstate(divide="ignore", invalid="ignore"):
+        first_log = np.log((row_growth * row_weights).sum(axis=1) + row_cash) - np.log(
+            (growth[row_day - 1] / row_base * row_weights).sum(axis=1) + row_cash
+        )
+    first_log = np.nan_to_num(first_log, nan=0.0, posinf=0.0, neginf=0.0)
+
+    first_turnover = np.zeros(len(starts))
+    reset_rows = np.flatnonzero((row_day == first_end[path_of_row]) & has_reset[path_of_row])
+    if len(reset_rows):
+        turnover = _turnover(row_growth[reset_rows], row_weights[reset_rows], row_cash[reset_rows])
+        first_turnover[path_of_row[reset_rows]] = turnover
+        first_log[reset_rows] += np.log1p(-cost * turnover)
+
+    entry_turnover = np.abs(weights[:, columns]).sum(axis=0)
+    entry_log = np.log1p(-cost * entry_turnover)
+
+    # ---- per-path metrics ----------------------------------------------------
+    # After its first segment a path follows its portfolio's shared returns, so sums over
+    # that stretch are differences of prefix sums; only drawdowns need whole paths.
+    shared_cum = np.cumsum(shared_log, axis=0)
+    shared_daily = np.expm1(shared_log)
+    shared_sum = np.cumsum(shared_daily, axis=0)
+    shared_sum_sq = np.cumsum(shared_daily ** 2, axis=0)
+
+    first_daily = np.expm1(first_log)
+    first_total = np.bincount(path_of_row, first_log, minlength=len(starts))
+    # Log value of each first-segment row, counted from the path's entry
+    first_cum = np.cumsum(first_log) - np.repeat(np.cumsum(first_total) - first_total, lengths)
+
+    def after_first_segment(prefix: np.ndarray) -> np.ndarray:
+        return prefix[-1, columns] - prefix[first_end, columns]
+
+    total_log = entry_log + first_total + after_first_segment(shared_cum)
+    n_live = n_days - 1 - starts
+    daily_sum = np.bincount(path_of_row, first_daily, minlength=len(starts)) + after_first_segment(shared_sum)
+    daily_sum_sq = np.bincount(path_of_row, first_daily ** 2, minlength=len(starts)) + after_first_segment(shared_sum_sq)
+    mean = daily_sum / np.maximum(n_live, 1)
+    std = np.sqrt(np.maximum(daily_sum_sq - n_live * mean ** 2, 0.0) / np.maximum(n_live - 1, 1))
+    rf_daily = (1 + risk_free_rate) ** (1 / TRADING_DAYS) - 1
+
+    # Drawdowns (and paths) from (dates x paths) log values, in bounded chunks
+    max_drawdown = np.zeros(len(starts))
+    paths = np.ones((n_days, len(starts))) if return_paths else None
+    chunk = max(1, MAX_PATH_CELLS // max(n_days, 1))
+    for lo in range(0, len(starts), chunk):
+        hi = min(lo + chunk, len(starts))
+        block = np.arange(lo, hi)
+        offset = entry_log[block] + first_total[block] - shared_cum[first_end[block], columns[block]]
+        log_value = shared_cum[:, columns[block]] + offset
+        before_start = days[:, None] < starts[block][None, :]
+        log_value[before_start] = 0.0
+        log_value[starts[block], block - lo] = entry_log[block]
+        in_block = (path_of_row >= lo) & (path_of_row < hi)
+        log_value[row_day[in_block], path_of_row[in_block] - lo] = (
+            entry_log[path_of_row[in_block]] + first_cum[in_block]
+        )
+        # Peaks count from the entry (after its cost), not from the flat stretch before it
+        peaks = np.maximum.accumulate(np.where(before_start, -np.inf, log_value), axis=0)
+        max_drawdown[lo:hi] = np.expm1((log_value - peaks).min(axis=0))
+        if paths is not None:
+            paths[:, lo:hi] = np.exp(log_value)
+
+    later = first_end < n_days - 1
+    turnover = entry_turnover + first_turnover + np.where(later, after_first_segment(shared_turnover.cumsum(axis=0)), 0.0)
+    n_rebalances = has_reset.astype(int) + np.where(
+        later, np.isin(days, closing).cumsum()[-1] - np.isin(days, closing).cumsum()[first_end], 0
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = pd.DataFrame({
+            "start": index[starts],
+            "end": index[-1],
+            "total_return": np.expm1(total_log),
+            "cagr": np.where(n_live > 0, np.expm1(total_log * TRADING_DAYS / n_live), np.nan),
+            "volatility": std * np.sqrt(TRADING_DAYS),
+            "sharpe": np.where(std > 0, (mean - rf_daily) / std * np.sqrt(TRADING_DAYS), np.nan),
+            "max_drawdown": max_drawdown,
+            "turnover": turnover,
+            "rebalances": n_rebalances,
+        })
+    return result, paths
+
+
+def _start_rows(index: pd.DatetimeIndex, dates) -> np.ndarray:
+    """First trading row on or after each date (len(index) if after the last one)."""
+    return np.searchsorted(index.values, pd.DatetimeIndex(pd.to_datetime(list(dates))).values, side="left")
+
+
+def _price_matrix(tickers: list[str], start, end: str | None) -> pd.DataFrame:
+    prices = get_price_store().get_prices(tickers, start=pd.Timestamp(start).strftime("%Y-%m-%d"), end=end, interval="1d")
+    return prices.ffill()
+
+
+def backtest_portfolios(
+    portfolios: list[dict],
+    start_dates: list[str],
+    end: str | None = None,
+    rebalance: str | int | None = "M",
+    cost_bps: float = 10.0,
+    risk_free_rate: float = 0.0,
+) -> pd.DataFrame:
+    """
+    Walk-forward backtest of every portfolio from every start date, over one cached
+    price matrix.
+
+    Args:
+        portfolios (list[dict]): Portfolio schema outputs (see schemas/portfolio.json).
+        start_dates (list[str]): Dates (YYYY-MM-DD) to start each portfolio from.
+        end (str, optional): End date (defaults to today).
+        rebalance (str | int | None): "W", "M", "Q", "Y", every n trading days, or None.
+        cost_bps (float): Transaction cost per unit of one-way turnover, in basis points.
+        risk_free_rate (float): Annual rate used for the Sharpe ratio.
+
+    Returns:
+        pd.DataFrame: One row per (portfolio, start date) with total_return, cagr,
+            volatility, sharpe, max_drawdown, turnover and rebalances.
+    """
+    if not portfolios or not start_dates:
+        raise ValueError("Need at least one portfolio and one start date.")
+    names = [portfolio.get("name") for portfolio in portfolios]
+    if None in names or len(set(names)) != len(names):
+        names = list(range(len(portfolios)))
+
+    tickers, weights = portfolio_weight_matrix(portfolios)
+    prices = _price_matrix(tickers, min(pd.to_datetime(start_dates)), end)
+    start_rows = _start_rows(prices.index, start_dates)
+    valid = start_rows < len(prices) - 1
+    if not valid.all():
+        logger.warning(f"Skipping {int((~valid).sum())} start dates with no later prices.")
+    if not valid.any():
+        raise ValueError("No start date has price history after it.")
+    start_rows = start_rows[valid]
+
+    starts = np.tile(start_rows, len(portfolios))
+    columns = np.repeat(np.arange(len(portfolios)), len(start_rows))
+    result, _ = simulate_paths(prices, weights, starts, columns, rebalance, cost_bps, risk_free_rate)
+    result.insert(0, "portfolio", [names[c] for c in columns])
+    logger.info(f"Backtested {len(portfolios)} portfolios from {len(start_rows)} start dates ({len(result)} paths).")
+    return result
+
+
+def backtest_dated_portfolios(
+    dated_portfolios: list[tuple],
+    end: str | None = None,
+    rebalance: str | int | None = "M",
+    cost_bps: float = 10.0,
+    risk_free_rate: float = 0.0,
+) -> pd.DataFrame:
+    """
+    Backtests a stream of dated portfolios (e.g. every portfolio past runs produced),
+    each held from its own date, in one simulation.
+
+    Args:
+        dated_portfolios (list[tuple]): (date, portfolio) pairs; the date is anything
+            pd.Timestamp accepts (YYYY-MM-DD, unix seconds via pd.to_datetime(..., unit="s")).
+
+    Returns:
+        pd.DataFrame: One row per portfolio, in input order, with the metrics of
+            backtest_portfolios.
+    """
+    if not dated_portfolios:
+        raise ValueError("No portfolios to backtest.")
+    dates = [pd.Timestamp(date).normalize() for date, _ in dated_portfolios]
+    tickers, weights = portfolio_weight_matrix([portfolio for _, portfolio in dated_portfolios])
+    prices = _price_matrix(tickers, min(dates), end)
+
+    start_rows = _start_rows(prices.index, dates)
+    valid = start_rows < len(prices) - 1
+    if not valid.all():
+        logger.warning(f"Skipping {int((~valid).sum())} portfolios dated after the last price.")
+    if not valid.any():
+        raise ValueError("Every portfolio is dated after the last available price.")
+    result, _ = simulate_paths(
+        prices, weights, start_rows[valid], np.flatnonzero(valid), rebalance, cost_bps, risk_free_rate
+    )
+    result.insert(0, "portfolio", np.flatnonzero(valid))
+    return result
+
+
+def ledger_portfolios(ledger, days: float = 365) -> list[dict]:
+    """
+    Portfolios recorded in the run ledger over the last `days` days, oldest first, as
+    rows with created_at, run_id, hypothesis and content. Where the optimizer re-weighted
+    a portfolio, its weights are the ones returned.
+    """
+    from utils.run_ledger import SECONDS_PER_DAY
+
+    since = time.time() - days * SECONDS_PER_DAY
+    optimized = {
+        (row["run_id"], row["hypothesis"]): row for row in ledger.artifacts(stage="optimized_portfolio", since=since)
+        if isinstance(row["content"], dict) and "schema" in row["content"]  # not a skipped optimizer run
+    }
+    rows = [optimized.get((row["run_id"], row["hypothesis"]), row) for row in ledger.artifacts(stage="portfolio", since=since)]
+    return [row for row in reversed(rows) if isinstance(row["content"], dict) and "schema" in row["content"]]
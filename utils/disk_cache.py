@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """
+    Small SQLite-backed key/value store with a freshness TTL and size-bounded LRU eviction.
+
+    Values are stored as text (callers serialise to JSON). The cache is safe to share
+    between threads, which is how crews run (see crew/run_parallel_crews.py).
+    """
+
+    def __init__(self, path: str, ttl: float | None = None, max_bytes: int | None = None):
+        """
+        Args:
+            path (str): SQLite file to store entries in (parent directory is created).
+            ttl (float, optional): Seconds after which an entry is considered stale.
+            max_bytes (int, optional): Upper bound on the total size of stored values;
+                least recently used entries are evicted beyond it.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+
+    def get(self, key: str, check_ttl: bool = True) -> str | None:
+        """
+        Returns the cached value for `key`, or None if missing or stale.
+
+        Args:
+            key (str): Cache key.
+            check_ttl (bool): If False, stale entries are still returned (used for replay).
+        """
+        entry = self.get_entry(key, check_ttl=check_ttl)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key: str, check_ttl: bool = True) -> tuple[str, float] | None:
+        """Like get, but returns (value, created_at) so callers can age the entry themselves."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created_at = row
+            if check_ttl and self.ttl is not None and now - created_at > self.ttl:
+                return None
+
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            return value, created_at
+
+    def set(self, key: str, value: str) -> None:
+        """Stores `value` under `key` and evicts entries beyond the TTL/size bounds."""
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """Drops expired entries, then least recently used ones until under max_bytes."""
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM entries WHERE created_at < ?", (now - self.ttl,))
+
+        if self.max_bytes is None:
+            return
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY accessed_at ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} entries from {self.path}")
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
@@ -0,0 +1,407 @@
+"""
+Machine-checkable falsification triggers.
+
+A trigger is a small expression over price features of one or more tickers:
+
+    ret("^GSPC", "1mo") > 7%                          # S&P 500 rallies 7% within a month
+    change("^TNX", 10) > 0.5 and price("^VIX") < 15   # 10y yield +50bp in 10 bars while VIX is calm
+    ret("TLT", "1w") - ret("SPY", "1w") < -5%         # combinations across indices
+
+Functions (windows are a number of bars or "5d", "2w", "3mo", "1y"):
+    price(t)           latest close
+    ret(t, w)          return over the window
+    change(t, w)       absolute change over the window (yields, spreads)
+    ma(t, w)           moving average
+    vol(t, w)          annualised volatility of daily returns over the window
+    drawdown(t, w)     distance below the window's highest close (<= 0)
+
+Expressions allow numbers, percentages ("7%") and basis points ("50bp"), + - * /,
+comparisons, and/or/not. Basis points are yield moves on indices quoted in percent
+(^TNX at 4.25 means 4.25%), so "50bp" is 0.5, as in parse_index_trigger. A trigger
+never fires on a bar where any feature it reads is NaN, even under "not". Each is
+compiled once into a function of a feature matrix; every feature any trigger needs is
+computed once per pass for all tickers, so all theses' triggers are evaluated over a
+block of bars as array operations.
+"""
+import ast
+import functools
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+WINDOW_UNITS = {"d": 1, "w": 5, "wk": 5, "mo": 21, "m": 21, "y": 252}
+FEATURES = ("price", "ret", "change", "ma", "vol", "drawdown")
+
+# Names the falsification agent uses for common indices in free-text index_triggers
+INDEX_ALIASES = {
+    "s&p500": "^GSPC", "s&p 500": "^GSPC", "spx": "^GSPC", "sp500": "^GSPC",
+    "nasdaq": "^IXIC", "nasdaq 100": "^NDX", "dow": "^DJI", "russell 2000": "^RUT",
+    "vix": "^VIX", "10y": "^TNX", "us 10y": "^TNX", "10-year treasury": "^TNX", "us10y": "^TNX",
+    "dxy": "DX-Y.NYB", "us dollar index": "DX-Y.NYB", "gold": "GC=F",
+    "oil": "CL=F", "wti": "CL=F", "brent": "BZ=F", "copper": "HG=F", "bitcoin": "BTC-USD",
+}
+
+
+def window_bars(window) -> int:
+    """Number of bars in a window given as an int or a string like "5d", "2w", "3mo", "1y"."""
+    if isinstance(window, (int, float)) and window >= 1:
+        return int(window)
+    match = re.fullmatch(r"\s*(\d+)\s*(d|wk|w|mo|m|y)\s*", str(window).lower())
+    if not match:
+        raise ValueError(f"Invalid window: {window!r}")
+    return int(match.group(1)) * WINDOW_UNITS[match.group(2)]
+
+
+def _normalise_units(expression: str) -> str:
+    # Yield indices are quoted in percent, so 1bp is 0.01 points (see parse_index_trigger)
+    expression = re.sub(r"(\d+(?:\.\d+)?)\s*bps?\b", r"(\1/100)", expression)
+    return re.sub(r"(\d+(?:\.\d+)?)\s*%", r"(\1/100)", expression)
+
+
+@dataclass
+class Trigger:
+    """
+    A compiled trigger expression.
+
+    Attributes:
+        expression (str): Source expression.
+        features (list[tuple]): (function, ticker, window bars) features it reads.
+        evaluate (callable): Maps {feature: values array} to a boolean array.
+    """
+    expression: str
+    features: list[tuple]
+    evaluate: object = field(repr=False)
+
+    @property
+    def tickers(self) -> list[str]:
+        return list(dict.fromkeys(ticker for _, ticker, _ in self.features))
+
+
+def compile_trigger(expression: str) -> Trigger:
+    """
+    Parses a trigger expression into a Trigger.
+
+    Raises:
+        ValueError: On syntax errors, unknown functions or unsupported constructs.
+    """
+    try:
+        tree = ast.parse(_normalise_units(expression), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid trigger expression {expression!r}: {e.msg}") from None
+    features: list[tuple] = []
+
+    def build(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            value = float(node.value)
+            return lambda data: value
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FEATURES:
+            args = [arg.value for arg in node.args if isinstance(arg, ast.Constant)]
+            if len(args) != len(node.args) or node.keywords or not args or not isinstance(args[0], str):
+                raise ValueError(f"{node.func.id}() takes a ticker string and a window in {expression!r}")
+            if node.func.id == "price":
+                if len(args) != 1:
+                    raise ValueError(f"price() takes only a ticker in {expression!r}")
+                feature = ("price", args[0], 1)
+            else:
+                if len(args) != 2:
+                    raise ValueError(f"{node.func.id}() takes a ticker and a window in {expression!r}")
+                feature = (node.func.id, args[0], window_bars(args[1]))
+            features.append(feature)
+            return lambda data: data[feature]
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.Not)):
+            operand = build(node.operand)
+            if isinstance(node.op, ast.USub):
+                return lambda data: -operand(data)
+            return lambda data: np.logical_not(operand(data))
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub, ast.Mult, ast.Div)):
+            left, right = build(node.left), build(node.right)
+            op = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}[type(node.op)]
+            return lambda data: op(left(data), right(data))
+        if isinstance(node, ast.BoolOp):
+            parts = [build(value) for value in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            return lambda data: functools.reduce(combine, [part(data) for part in parts])
+        if isinstance(node, ast.Compare):
+            comparisons = {ast.Gt: np.greater, ast.GtE: np.greater_equal, ast.Lt: np.less, ast.LtE: np.less_equal}
+            if not all(type(op) in comparisons for op in node.ops):
+                raise ValueError(f"Only <, <=, >, >= comparisons are supported in {expression!r}")
+            terms = [build(node.left)] + [build(comparator) for comparator in node.comparators]
+            ops = [comparisons[type(op)] for op in node.ops]
+
+            def compare(data):
+                values = [term(data) for term in terms]
+                result = ops[0](values[0], values[1])
+                for i in range(1, len(ops)):
+                    result = np.logical_and(result, ops[i](values[i], values[i + 1]))
+                return result
+            return compare
+        raise ValueError(f"Unsupported construct {ast.dump(node)[:40]}... in {expression!r}")
+
+    body = build(tree.body)
+    features = list(dict.fromkeys(features))
+
+    def evaluate(data):
+        # NaN compares False, which "not" would turn into a firing trigger
+        result = np.asarray(body(data), dtype=bool)
+        for feature in features:
+            result = np.logical_and(result, ~np.isnan(data[feature]))
+        return result
+    return Trigger(expression=expression, features=features, evaluate=evaluate)
+
+
+def parse_index_trigger(index: str, condition: str) -> str | None:
+    """
+    Best-effort translation of a free-text index_triggers entry (e.g. "S&P500": "rally
+    +7% within 1 month") into a trigger expression. Returns None if it is not understood.
+    """
+    ticker = INDEX_ALIASES.get(index.strip().lower(), index.strip() if re.fullmatch(r"[\^A-Z0-9.=\-]+", index.strip()) else None)
+    if ticker is None:
+        return None
+    text = condition.lower()
+
+    move = re.search(
+        r"(rall(?:y|ies)|rise[sn]?|gains?|up|jumps?|surges?|falls?|drops?|declines?|down|sell[- ]?off|plunges?)"
+        r"\D*?([+-]?\d+(?:\.\d+)?)\s*(%|bps?)\s*(?:within|over|in)\s*(\d+)\s*(day|week|month|year)",
+        text,
+    )
+    if move:
+        direction, size, unit, n, period = move.groups()
+        window = n + {"day": "d", "week": "w", "month": "mo", "year": "y"}[period]
+        down = direction.startswith(("fall", "drop", "declin", "down", "sell", "plung"))
+        size = abs(float(size))
+        sign, comparison = ("-", "<") if down else ("", ">")
+        if unit == "%":
+            return f'ret("{ticker}", "{window}") {comparison} {sign}{size}%'
+        # Yield indices (^TNX, ^IRX) are quoted in percent, so 1bp is 0.01 points
+        return f'change("{ticker}", "{window}") {comparison} {sign}{size / 100}'
+
+    level = re.search(r"(above|over|exceeds?|below|under|breaks? below)\s*\$?([+-]?\d+(?:\.\d+)?)", text)
+    if level:
+        side, value = level.groups()
+        below = side in ("below", "under") or side.startswith("break")
+        return f'price("{ticker}") {"<" if below else ">"} {value}'
+    return None
+
+
+def compute_features(prices: pd.DataFrame, features: list[tuple]) -> dict[tuple, np.ndarray]:
+    """
+    Computes every requested (function, ticker, window) feature over a (bars x tickers)
+    price matrix. Features sharing a function and window are computed together for all
+    their tickers. Unknown tickers yield NaN, so triggers on them never fire.
+    """
+    groups: dict[tuple, list[str]] = {}
+    for function, ticker, window in features:
+        groups.setdefault((function, window), []).append(ticker)
+
+    values: dict[tuple, np.ndarray] = {}
+    nan_column = np.full(len(prices), np.nan)
+    for (function, window), tickers in groups.items():
+        block = prices.reindex(columns=list(dict.fromkeys(tickers)))
+        if function == "price":
+            result = block
+        elif function == "ret":
+            result = block / block.shift(window) - 1
+        elif function == "change":
+            result = block - block.shift(window)
+        elif function == "ma":
+            result = block.rolling(window).mean()
+        elif function == "vol":
+            result = block.pct_change().rolling(window).std() * np.sqrt(TRADING_DAYS)
+        else:  # drawdown
+            result = block / block.rolling(window, min_periods=1).max() - 1
+        array = result.to_numpy(dtype=float)
+        for i, ticker in enumerate(result.columns):
+            values[(function, ticker, window)] = array[:, i] if ticker in prices.columns else nan_column
+    return values
+
+
+@dataclass
+class ThesisTriggers:
+    thesis: str
+    triggers: list[tuple] = field(default_factory=list)  # (trigger id, description, Trigger)
+    unparsed: list[str] = field(default_factory=list)
+
+
+def thesis_triggers(thesis: str, falsification: dict) -> ThesisTriggers:
+    """
+    Compiles the machine-checkable triggers of one falsification output: every
+    `machine_triggers` entry, plus any `index_triggers` text parse_index_trigger understands.
+    Macro, headline and other triggers need data other than prices and are left out.
+    """
+    falsification = falsification.get("schema", {}).get("properties", falsification)
+    result = ThesisTriggers(thesis=thesis)
+
+    for i, entry in enumerate(falsification.get("machine_triggers") or []):
+        entry = entry if isinstance(entry, dict) else {"expression": entry}
+        try:
+            trigger = compile_trigger(entry["expression"])
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Skipping machine trigger {i} of {thesis}: {e}")
+            result.unparsed.append(str(entry.get("expression", entry)))
+            continue
+        result.triggers.append((entry.get("id") or f"machine_{i}", entry.get("description", entry["expression"]), trigger))
+
+    for index, condition in (falsification.get("index_triggers") or {}).items():
+        expression = parse_index_trigger(index, str(condition))
+        if expression is None:
+            result.unparsed.append(f"{index}: {condition}")
+            continue
+        result.triggers.append((f"index:{index}", f"{index}: {condition}", compile_trigger(expression)))
+    return result
+
+
+@dataclass
+class TriggerEvent:
+    thesis: str
+    trigger_id: str
+    description: str
+    expression: str
+    timestamp: pd.Timestamp
+
+    def to_dict(self) -> dict:
+        return {**self.__dict__, "timestamp": str(self.timestamp)}
+
+
+class FalsificationMonitor:
+    """
+    Evaluates the price triggers of every active thesis against incoming bars.
+
+    `update` appends bars to a rolling buffer just long enough for the longest window
+    and evaluates all triggers on them in one pass, reporting each trigger the first
+    time it fires. `scan` does the same over a whole price history at once.
+    """
+
+    def __init__(self):
+        self.theses: dict[str, ThesisTriggers] = {}
+        self.fired: set[tuple[str, str]] = set()
+        self._buffer: pd.DataFrame | None = None
+
+    def add_thesis(self, thesis: str, falsification: dict) -> ThesisTriggers:
+        compiled = thesis_triggers(thesis, falsification)
+        self.theses[thesis] = compiled
+        logger.info(
+            f"Monitoring {len(compiled.triggers)} triggers for {thesis}"
+            + (f" ({len(compiled.unparsed)} not machine-checkable)" if compiled.unparsed else "")
+        )
+        return compiled
+
+    def remove_thesis(self, thesis: str) -> None:
+        self.theses.pop(thesis, None)
+        self.fired = {key for key in self.fired if key[0] != thesis}
+
+    @property
+    def features(self) -> list[tuple]:
+        return list(dict.fromkeys(
+            feature for compiled in self.theses.values() for _, _, trigger in compiled.triggers for feature in trigger.features
+        ))
+
+    @property
+    def tickers(self) -> list[str]:
+        return list(dict.fromkeys(ticker for _, ticker, _ in self.features))
+
+    @property
+    def lookback(self) -> int:
+        """Bars of history needed by the longest window (+1 for returns over it)."""
+        return max((window for _, _, window in self.features), default=1) + 1
+
+    def _evaluate(self, prices: pd.DataFrame) -> list[tuple[str, str, str, Trigger, np.ndarray]]:
+        data = compute_features(prices, self.features)
+        return [
+            (compiled.thesis, trigger_id, description, trigger,
+             np.broadcast_to(np.asarray(trigger.evaluate(data), dtype=bool), (len(prices),)))
+            for compiled in self.theses.values()
+            for trigger_id, description, trigger in compiled.triggers
+        ]
+
+    def scan(self, prices: pd.DataFrame) -> pd.DataFrame:
+        """
+        When each trigger first fired over a price history.
+
+        Returns:
+            pd.DataFrame: thesis, trigger_id, description, expression, first_fired (NaT if never).
+        """
+        rows = []
+        for thesis, trigger_id, description, trigger, fired in self._evaluate(prices):
+            hits = np.flatnonzero(fired)
+            rows.append({
+                "thesis": thesis, "trigger_id": trigger_id, "description": description,
+                "expression": trigger.expression,
+                "first_fired": prices.index[hits[0]] if len(hits) else pd.NaT,
+            })
+        return pd.DataFrame(rows, columns=["thesis", "trigger_id", "description", "expression", "first_fired"])
+
+    def seed(self, prices: pd.DataFrame) -> None:
+        """Fills the rolling buffer from a price history (e.g. the price store) without reporting."""
+        self._buffer = prices.iloc[-self.lookback:].copy()
+
+    def update(self, bars: pd.DataFrame | dict, timestamp=None) -> list[TriggerEvent]:
+        """
+        Ingests new bars and returns the triggers that fired on them for the first time.
+
+        Args:
+            bars (pd.DataFrame | dict): (bars x tickers) closes, or one bar as {ticker: close}.
+            timestamp: Time of a single dict bar (defaults to now).
+        """
+        if isinstance(bars, dict):
+            bars = pd.DataFrame([bars], index=[pd.Timestamp(timestamp) if timestamp is not None else pd.Timestamp.now()])
+        combined = bars if self._buffer is None else pd.concat([self._buffer, bars])
+        combined = combined[~combined.index.duplicated(keep="last")].sort_index().ffill()
+        self._buffer = combined.iloc[-self.lookback:]
+
+        new_rows = combined.index.isin(bars.index)
+        events = []
+        for thesis, trigger_id, description, trigger, fired in self._evaluate(combined):
+            hits = np.flatnonzero(fired & new_rows)
+            if len(hits) and (thesis, trigger_id) not in self.fired:
+                self.fired.add((thesis, trigger_id))
+                events.append(TriggerEvent(thesis, trigger_id, description, trigger.expression, combined.index[hits[0]]))
+                logger.warning(f"Falsification trigger fired for {thesis}: {description}")
+        return events
+
+
+def load_prices(tickers: list[str], start: str | None = None) -> pd.DataFrame:
+    """Daily closes for `tickers` from the price store; tickers it has no history for are left out."""
+    from utils.price_store import get_price_store
+
+    store = get_price_store()
+    try:
+        return store.get_prices(tickers, start=start)
+    except ValueError:
+        available = []
+        for ticker in tickers:
+            try:
+                store.get_prices([ticker], start=start)
+                available.append(ticker)
+            except ValueError:
+                logger.warning(f"No price history for trigger ticker {ticker}; its triggers cannot fire")
+        return store.get_prices(available, start=start) if available else pd.DataFrame()
+
+
+def trigger_expression_guide() -> str:
+    """Prompt text teaching the falsification agent the trigger expression syntax."""
+    return (
+        "Also restate every price-based condition in machine_triggers as an expression over Yahoo Finance "
+        "tickers, using only: price(t), ret(t, w), change(t, w), ma(t, w), vol(t, w), drawdown(t, w), where w is "
+        "a number of trading days or '5d', '2w', '3mo', '1y'; numbers, percentages ('7%'), + - * /, "
+        "< <= > >=, and/or/not. Examples: ret(\"^GSPC\", \"1mo\") > 7%; "
+        "change(\"^TNX\", \"2w\") > 0.5 and price(\"^VIX\") < 15; ret(\"TLT\", \"1w\") - ret(\"SPY\", \"1w\") < -5%."
+    )
+
+
+def latest_falsifications(ledger, days: float = 30) -> dict[str, dict]:
+    """Latest falsification output per hypothesis recorded in the run ledger over the last `days` days."""
+    from utils.run_ledger import SECONDS_PER_DAY
+
+    latest: dict[str, dict] = {}
+    for row in ledger.artifacts(stage="falsification", since=time.time() - days * SECONDS_PER_DAY):
+        name = row["hypothesis"] or row["run_id"]
+        if name not in latest and isinstance(row["content"], dict):
+            latest[name] = row["content"]
+    return latest
@@ -0,0 +1,123 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from utils.portfolio_evals import get_portfolio_assets
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalPortfolioValuation:
+    """
+    Running valuation of one portfolio that ingests new price bars in O(assets).
+
+    Follows get_portfolio_prices_and_value: each asset is normalised by its first
+    observed price, weighted, and summed to a base-100 value, and Cumulative_Return is
+    measured from the initial value. Missing prices are carried forward. Unlike
+    get_portfolio_prices_and_value, which values an asset with no price on the first
+    date at 0 throughout, an asset here counts at its base value (weight x 100) until
+    its first price arrives and moves with its price from then on; the two agree
+    whenever every asset has a price on the first date. Several updates on the same
+    date (intraday ticks) revise that date's row; Daily_Return is measured against the
+    previous date's last value.
+    """
+
+    def __init__(self, portfolio: dict):
+        assets = get_portfolio_assets(portfolio)
+        self.tickers = [asset["ticker"] for asset in assets]
+        self._index = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.weights = np.array([asset["weight"] for asset in assets], dtype=float)
+
+        n = len(self.tickers)
+        self.base_prices = np.full(n, np.nan)
+        self.last_prices = np.full(n, np.nan)
+        self.initial_value = float(self.weights.sum() * 100)
+
+        self.last_date: pd.Timestamp | None = None
+        self.value: float = np.nan
+        self.previous_close: float = np.nan
+        self.running_max: float = -np.inf
+        self.max_drawdown: float = 0.0
+
+    def seed(self, prices: pd.DataFrame) -> pd.DataFrame:
+        """
+        Initialises the running state from a price history (e.g. get_daily_price_matrix)
+        in one vectorised pass, so live updates can continue from its last row.
+
+        Returns:
+            pd.DataFrame: The valuation rows for the seeded history.
+        """
+        prices = prices.reindex(columns=self.tickers).ffill()
+        values = prices.to_numpy(dtype=float)
+
+        # First observed price of each asset; before it, the asset counts at its base value
+        self.base_prices = prices.bfill().to_numpy(dtype=float, copy=True)[0]
+        normalized = np.nan_to_num(values / self.base_prices, nan=1.0)
+        path = normalized @ self.weights * 100
+        self.last_prices = values[-1].copy()
+
+        running_max = np.maximum.accumulate(path)
+        drawdown = path / running_max - 1
+        daily_returns = np.zeros_like(path)
+        daily_returns[1:] = path[1:] / path[:-1] - 1
+
+        self.last_date = pd.Timestamp(prices.index[-1])
+        self.value = path[-1]
+        self.previous_close = path[-2] if len(path) > 1 else path[-1]
+        self.running_max = running_max[-1]
+        self.max_drawdown = drawdown.min()
+
+        return pd.DataFrame({
+            "Portfolio_Value": path,
+            "Daily_Return": daily_returns,
+            "Cumulative_Return": self._cumulative_return(path),
+            "Drawdown": drawdown,
+            "Max_Drawdown": np.minimum.accumulate(drawdown),
+        }, index=prices.index)
+
+    def _cumulative_return(self, value):
+        """Return since the initial value, i.e. the daily returns compounded."""
+        return value / self.initial_value - 1 if self.initial_value else value * 0.0
+
+    def update(self, timestamp, prices: dict[str, float]) -> pd.Series:
+        """
+        Ingests one bar (or tick) of prices and returns the updated valuation row.
+
+        Args:
+            timestamp: Time of the bar; its date decides whether a new row starts.
+            prices (dict[str, float]): Latest prices by ticker; tickers not in the
+                portfolio are ignored and missing ones keep their last price.
+
+        Returns:
+            pd.Series: Portfolio_Value, Daily_Return, Cumulative_Return, Drawdown, Max_Drawdown.
+        """
+        for ticker, price in prices.items():
+            i = self._index.get(ticker)
+            if i is not None and price is not None and not np.isnan(price):
+                self.last_prices[i] = price
+
+        arrived = np.isnan(self.base_prices) & ~np.isnan(self.last_prices)
+        self.base_prices[arrived] = self.last_prices[arrived]
+
+        date = pd.Timestamp(timestamp).normalize()
+        if self.last_date is None:
+            self.previous_close = self.initial_value
+        elif date > self.last_date:
+            self.previous_close = self.value
+
+        self.last_date = date
+        self.value = float(np.nan_to_num(self.last_prices / self.base_prices, nan=1.0) @ self.weights * 100)
+        self.running_max = max(self.running_max, self.value)
+
+        drawdown = self.value / self.running_max - 1 if self.running_max > 0 else 0.0
+        self.max_drawdown = min(self.max_drawdown, drawdown)
+        daily_return = self.value / self.previous_close - 1 if self.previous_close else 0.0
+
+        return pd.Series({
+            "Portfolio_Value": self.value,
+            "Daily_Return": daily_return,
+            "Cumulative_Return": float(self._cumulative_return(self.value)),
+            "Drawdown": drawdown,
+            "Max_Drawdown": self.max_drawdown,
+        }, name=pd.Timestamp(timestamp))
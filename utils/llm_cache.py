@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+
+from crewai import LLM
+
+from utils.disk_cache import DiskCache
+from utils.rate_limits import get_rate_limiter
+from utils.research_handoff import estimate_tokens
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# off:    no caching, every call goes to the model
+# record: serve hits from the cache, call the model on a miss and store the response
+# replay: serve everything from the cache and never call the model (a miss is an error)
+LLM_CACHE_MODES = ("off", "record", "replay")
+
+DEFAULT_LLM_CACHE_PATH = "cache/llm_responses.sqlite"
+DEFAULT_LLM_CACHE_TTL = 7 * 24 * 3600  # seconds
+DEFAULT_LLM_CACHE_MAX_MB = 512
+
+_cache: DiskCache | None = None
+
+
+class LLMCacheMissError(RuntimeError):
+    """Raised in replay mode when a prompt has no recorded response."""
+
+
+def llm_cache_mode() -> str:
+    """
+    Returns the LLM cache mode from the LLM_CACHE_MODE environment variable.
+
+    Raises:
+        ValueError: On an unknown mode, or replay with live searches (see search_cache_mode).
+    """
+    mode = os.getenv("LLM_CACHE_MODE", "off").lower()
+    if mode not in LLM_CACHE_MODES:
+        raise ValueError(f"Invalid LLM_CACHE_MODE '{mode}'. Must be one of: {', '.join(LLM_CACHE_MODES)}")
+    if mode == "replay":
+        from tools.search_cache import search_cache_mode
+
+        search_cache_mode()  # fails now, not at the first search, if Serper would be called
+    return mode
+
+
+def get_llm_cache() -> DiskCache:
+    """Returns the process-wide LLM response cache, configured from the environment."""
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(
+            path=os.getenv("LLM_CACHE_PATH", DEFAULT_LLM_CACHE_PATH),
+            ttl=float(os.getenv("LLM_CACHE_TTL", DEFAULT_LLM_CACHE_TTL)),
+            max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", DEFAULT_LLM_CACHE_MAX_MB)) * 1024 * 1024),
+        )
+    return _cache
+
+
+def make_llm_cache_key(model: str, role: str, messages, tools=None, **params) -> str:
+    """
+    Content hash of everything that determines an LLM response.
+
+    `messages` carries the rendered prompt (backstory, task description) and, for
+    ReAct-style agents, the tool transcript so far; `tools` covers native tool calling.
+    """
+    payload = json.dumps(
+        {"model": model, "role": role, "messages": messages, "tools": tools, "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachedLLM:
+    """
+    Replacement for a crewai LLM's `call` that records responses to a content-addressed
+    disk cache and can replay a whole run from it without any network calls. Calls
+    that do reach the model go through the process-wide LLM rate limiter
+    (utils/rate_limits.py). The LLM itself, with all its settings, is left as it was.
+    """
+
+    def __init__(self, llm: LLM, role: str = "", mode: str | None = None):
+        self.llm = llm
+        self.role = role
+        self.mode = mode or llm_cache_mode()
+        self._call = llm.call
+
+    def _call_model(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        return get_rate_limiter("llm").call(
+            lambda: self._call(messages, tools, callbacks, available_functions, **kwargs),
+            tokens=estimate_tokens(json.dumps(messages, default=str)),
+            count_tokens=lambda response: estimate_tokens(str(response)),
+        )
+
+    def __call__(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        if self.mode == "off":
+            return self._call_model(messages, tools, callbacks, available_functions, **kwargs)
+
+        key = make_llm_cache_key(
+            self.llm.model, self.role, messages, tools,
+            temperature=getattr(self.llm, "temperature", None), stop=getattr(self.llm, "stop", None),
+        )
+        cache = get_llm_cache()
+
+        cached = cache.get(key, check_ttl=self.mode != "replay")
+        if cached is not None:
+            logger.info(f"LLM cache hit for {self.role} ({key[:12]})")
+            # Hits skip LLM.call and its events, so record the (near-zero) call here
+            with span(self.role, "llm", agent=self.role, model=self.llm.model, from_cache=True):
+                return json.loads(cached)
+
+        if self.mode == "replay":
+            raise LLMCacheMissError(f"No recorded LLM response for {self.role} ({key[:12]}) in replay mode.")
+
+        logger.info(f"LLM cache miss for {self.role} ({key[:12]})")
+        response = self._call_model(messages, tools, callbacks, available_functions, **kwargs)
+
+        # Tool-call results are executed locally and may not be serialisable; only cache text
+        if isinstance(response, str):
+            cache.set(key, json.dumps(response))
+        return response
+
+
+def with_llm_cache(agent):
+    """
+    Wraps the `call` of the agent's LLM in a CachedLLM keyed on the agent's role, so its
+    model calls are rate limited and, when LLM_CACHE_MODE is "record" or "replay",
+    cached. The agent is left untouched when neither caching nor a rate limit is on.
+    """
+    mode = llm_cache_mode()
+    if isinstance(agent.llm.call, CachedLLM) or (mode == "off" and not get_rate_limiter("llm").limited):
+        return agent
+    # Set on the instance, so the LLM keeps every setting it was configured with
+    object.__setattr__(agent.llm, "call", CachedLLM(agent.llm, role=agent.role, mode=mode))
+    if mode != "off":
+        logger.info(f"Enabled LLM response cache ({mode}) for agent: {agent.role}")
+    return agent
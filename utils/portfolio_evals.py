@@ -1,13 +1,69 @@
-import yfinance as yf
 import numpy as np
 import pandas as pd
 import logging
 import json
 
-# Logging setup
-logging.basicConfig(level=logging.INFO)
+from utils.price_store import get_price_store
+
 logger = logging.getLogger(__name__)
 
+def get_portfolio_assets(portfolio: dict) -> list[dict]:
+    """
+    Returns the list of assets in a portfolio schema output.
+
+    Raises:
+        ValueError: If the portfolio has no assets.
+    """
+    assets = portfolio.get("schema", {}).get("properties", {}).get("assets", [])
+    if not assets:
+        raise ValueError("No assets found in portfolio schema.")
+    return assets
+
+
+def portfolio_weight_matrix(portfolios: list[dict], gross: bool = True) -> tuple[list[str], np.ndarray]:
+    """
+    Union ticker list and (tickers x portfolios) weight matrix; a negative weight is a
+    short, a missing weight counts as 0 and a repeated ticker's weights add up.
+
+    Args:
+        portfolios (list[dict]): Portfolio schema outputs.
+        gross (bool): Scale each portfolio to a gross exposure (sum of absolute weights)
+            of 1, so long/short portfolios are neither zeroed nor levered up by a small
+            net sum. An all-zero portfolio stays zero.
+    """
+    asset_lists = [get_portfolio_assets(portfolio) for portfolio in portfolios]
+    tickers = list(dict.fromkeys(asset["ticker"] for assets in asset_lists for asset in assets))
+    row = {ticker: i for i, ticker in enumerate(tickers)}
+    weights = np.zeros((len(tickers), len(portfolios)))
+    for j, assets in enumerate(asset_lists):
+        for asset in assets:
+            weights[row[asset["ticker"]], j] += float(asset.get("weight") or 0.0)
+    if gross:
+        totals = np.abs(weights).sum(axis=0)
+        weights = np.divide(weights, totals, out=np.zeros_like(weights), where=totals != 0)
+    return tickers, weights
+
+
+def get_daily_price_matrix(
+    tickers: list[str],
+    start: str = "2024-01-01",
+    end: str = None
+) -> pd.DataFrame:
+    """
+    Returns daily close prices for `tickers` on a continuous calendar-day index,
+    forward-filling weekends, holidays and missing bars.
+    """
+    logger.info(f"Fetching daily prices for {len(tickers)} tickers: {tickers}")
+    data = get_price_store().get_prices(tickers, start=start, end=end, interval="1d")
+
+    # Forward-fill missing values and enforce daily continuity
+    data = data.ffill()
+    full_range = pd.date_range(start=data.index.min(), end=data.index.max(), freq="D")
+    data = data.reindex(full_range).ffill()
+    data.index.name = "Date"
+    return data
+
+
 def get_portfolio_prices_and_value(
     portfolio: dict,
     start: str = "2024-01-01",
@@ -28,25 +84,12 @@ def get_portfolio_prices_and_value(
             latest_df: Latest snapshot with weights, price, and rationale
             portfolio_value_df: Daily portfolio value, daily return, cumulative return
     """
-    assets = portfolio.get("schema", {}).get("properties", {}).get("assets", [])
-    if not assets:
-        raise ValueError("No assets found in portfolio schema.")
+    assets = get_portfolio_assets(portfolio)
 
     tickers = [asset["ticker"] for asset in assets]
     weights = {asset["ticker"]: asset["weight"] for asset in assets}
 
-    logger.info(f"Fetching daily prices for {len(tickers)} tickers: {tickers}")
-    data = yf.download(tickers=tickers, start=start, end=end, interval="1d", progress=False)["Close"]
-
-    # Handle single-ticker case
-    if isinstance(data, pd.Series):
-        data = data.to_frame(name=tickers[0])
-
-    # Forward-fill missing values and enforce daily continuity
-    data = data.ffill()
-    full_range = pd.date_range(start=data.index.min(), end=data.index.max(), freq="D")
-    data = data.reindex(full_range).ffill()
-    data.index.name = "Date"
+    data = get_daily_price_matrix(tickers, start=start, end=end)
 
     # Normalize and compute weighted portfolio value
     normalized = data / data.iloc[0]
@@ -116,7 +159,7 @@ def calculate_sharpe_ratio(
     else:
         # Fetch S&P 500 as proxy
         logger.info(f"Fetching S&P 500 returns ({sp500_ticker}) as risk-free proxy...")
-        sp500 = yf.download(sp500_ticker, start=start, end=end, interval="1d", progress=False)["Close"]
+        sp500 = get_price_store().get_prices([sp500_ticker], start=start, end=end, interval="1d")[sp500_ticker]
         sp500_returns = sp500.pct_change().reindex(daily_returns.index).fillna(0)
         excess_returns = daily_returns - sp500_returns.mean()
         logger.info("Using S&P 500 mean daily return as risk-free proxy.")
@@ -134,6 +177,96 @@ def calculate_sharpe_ratio(
 
     return sharpe_ratio
 
+def evaluate_portfolios(
+    portfolios: list[dict],
+    start: str = "2024-01-01",
+    end: str = None,
+    risk_free_rate: float | None = None,
+    sp500_ticker: str = "^GSPC"
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.Series]:
+    """
+    Evaluates many portfolios at once over one union price matrix.
+
+    Value paths for all N portfolios come from a single (dates x tickers) @ (tickers x N)
+    product; returns and Sharpe ratios are then computed column-wise. Results match
+    get_portfolio_prices_and_value / calculate_sharpe_ratio for each portfolio. A
+    portfolio starts on the first date one of its tickers has a price, and its rows
+    before that are NaN.
+
+    Args:
+        portfolios (list[dict]): Portfolio schema outputs (see schemas/portfolio.json).
+        start (str): Start date for price history (YYYY-MM-DD).
+        end (str, optional): End date (defaults to today).
+        risk_free_rate (float | None): Annual risk-free rate. If None, the S&P 500 mean
+            daily return is used as the benchmark, as in calculate_sharpe_ratio.
+        sp500_ticker (str): Ticker for S&P 500 index (^GSPC by default).
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.Series]:
+            value_df: Daily portfolio values (base 100), one column per portfolio
+            daily_returns_df: Daily returns, one column per portfolio
+            cumulative_returns_df: Cumulative returns, one column per portfolio
+            sharpe: Annualized Sharpe ratio per portfolio
+    """
+    if not portfolios:
+        raise ValueError("No portfolios to evaluate.")
+
+    names = [portfolio.get("name") for portfolio in portfolios]
+    if None in names or len(set(names)) != len(names):
+        names = list(range(len(portfolios)))
+
+    # Weights as given, like get_portfolio_prices_and_value
+    tickers, weights = portfolio_weight_matrix(portfolios, gross=False)
+    column = {ticker: i for i, ticker in enumerate(tickers)}
+
+    data = get_daily_price_matrix(tickers, start=start, end=end)
+    prices = data.to_numpy(dtype=float)
+
+    # Each portfolio starts on the first date any of its own tickers has a price, which is
+    # where its own price matrix would start; before that its values are NaN
+    held = np.zeros_like(weights, dtype=bool)
+    for j, portfolio in enumerate(portfolios):
+        held[[column[asset["ticker"]] for asset in get_portfolio_assets(portfolio)], j] = True
+    listed = ~np.isnan(prices)
+    first_row = np.where(listed.any(axis=0), listed.argmax(axis=0), len(prices))
+    starts = np.where(held, first_row[:, None], len(prices)).min(axis=0)
+
+    values = np.full((len(prices), len(portfolios)), np.nan)
+    for start_row in np.unique(starts[starts < len(prices)]):
+        group = starts == start_row
+        # Tickers without a price on the start date contribute nothing, as with pandas' skipna sum
+        normalized = np.nan_to_num(prices[start_row:] / prices[start_row])
+        values[start_row:, group] = normalized @ weights[:, group] * 100  # Base 100
+    before_start = np.arange(len(prices))[:, None] < starts[None, :]
+
+    daily_returns = np.zeros_like(values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        daily_returns[1:] = values[1:] / values[:-1] - 1
+    daily_returns = np.nan_to_num(daily_returns, nan=0.0, posinf=0.0, neginf=0.0)
+    daily_returns[before_start] = np.nan
+    cumulative_returns = np.nancumprod(1 + daily_returns, axis=0) - 1
+    cumulative_returns[before_start] = np.nan
+
+    if risk_free_rate is not None:
+        rf_daily = (1 + risk_free_rate) ** (1/252) - 1
+    else:
+        logger.info(f"Fetching S&P 500 returns ({sp500_ticker}) as risk-free proxy...")
+        sp500 = get_price_store().get_prices([sp500_ticker], start=start, end=end, interval="1d")[sp500_ticker]
+        rf_daily = sp500.pct_change().reindex(data.index).fillna(0).mean()
+
+    excess = daily_returns - rf_daily
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std_excess = np.nanstd(excess, axis=0, ddof=1)
+        sharpe = np.where(std_excess > 0, np.nanmean(excess, axis=0) / std_excess * np.sqrt(252), np.nan)
+
+    logger.info(f"Evaluated {len(portfolios)} portfolios over {len(tickers)} tickers.")
+    return (
+        pd.DataFrame(values, index=data.index, columns=names),
+        pd.DataFrame(daily_returns, index=data.index, columns=names),
+        pd.DataFrame(cumulative_returns, index=data.index, columns=names),
+        pd.Series(sharpe, index=names, name="Sharpe_Ratio"),
+    )
+
 def test():
     # Example portfolio
     with open("results/portfolio.json", "r") as f:
@@ -149,4 +282,6 @@ def test():
     sharpe_ratio = calculate_sharpe_ratio(portfolio_value_df, risk_free_rate=0.03)
     print(f"\nPortfolio Sharpe Ratio: {sharpe_ratio:.3f}")
 
-test()
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    test()
@@ -0,0 +1,278 @@
+"""
+Covariance-aware weights for the tickers a portfolio agent picked.
+
+The agent decides what to hold and in which direction (a negative weight is a short);
+this module decides how much, from a shrunk covariance matrix of the tickers' daily
+returns in the price store:
+
+    min_variance    lowest-variance weights
+    risk_parity     every position contributes the same share of portfolio variance
+    mean_variance   maximise mu'w - (risk_aversion / 2) w'Σw, with mu the tickers'
+                    historical mean returns shrunk towards their cross-sectional mean
+
+Position sizes are bounded by `min_weight` / `max_weight` and sum to 1 (gross, when
+the portfolio has shorts). Everything is matrix algebra over the (tickers x tickers)
+covariance, so universes of several hundred instruments take milliseconds.
+"""
+import copy
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.portfolio_evals import get_portfolio_assets, portfolio_weight_matrix
+from utils.price_store import get_price_store
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+METHODS = ("min_variance", "risk_parity", "mean_variance")
+MIN_OBSERVATIONS = 60  # daily returns a ticker pair needs in common for its covariance
+
+# "off" leaves the portfolio agent's weights as they are
+DEFAULT_METHOD = os.getenv("PORTFOLIO_OPTIMIZER", "risk_parity")
+DEFAULT_LOOKBACK_DAYS = int(os.getenv("PORTFOLIO_COVARIANCE_DAYS", "756"))  # ~3 years of trading days
+DEFAULT_MIN_WEIGHT = float(os.getenv("PORTFOLIO_MIN_WEIGHT", "0.0"))
+DEFAULT_MAX_WEIGHT = float(os.getenv("PORTFOLIO_MAX_WEIGHT", "0.4"))
+DEFAULT_RISK_AVERSION = 4.0
+DEFAULT_MEAN_SHRINKAGE = 0.5
+
+
+def shrunk_covariance(returns: np.ndarray) -> tuple[np.ndarray, float]:
+    """
+    Ledoit-Wolf covariance: the sample covariance shrunk towards a scaled identity by
+    the intensity that minimises expected squared error (Ledoit & Wolf, 2004).
+
+    Missing returns (NaN, e.g. before a ticker listed) are handled pairwise: each
+    entry uses the days both tickers have. The result is clipped to be positive
+    semi-definite, which pairwise estimates do not guarantee.
+
+    Args:
+        returns (np.ndarray): (days x tickers) daily returns.
+
+    Returns:
+        tuple[np.ndarray, float]: Daily covariance matrix and the shrinkage intensity (0-1).
+    """
+    present = ~np.isnan(returns)
+    counts = present.T.astype(float) @ present  # days each pair has in common
+    if counts.min() < MIN_OBSERVATIONS:
+        raise ValueError(f"Fewer than {MIN_OBSERVATIONS} overlapping daily returns for some tickers")
+    means = np.nanmean(returns, axis=0)
+    x = np.where(present, returns - means, 0.0)
+    sample = (x.T @ x) / counts
+
+    n_days, n = x.shape
+    target = np.trace(sample) / n
+    distance = ((sample - target * np.eye(n)) ** 2).sum()
+    # Average squared distance of each day's outer product from the sample covariance
+    spread = ((x ** 2).sum(axis=1) ** 2).sum() / n_days - (sample ** 2).sum()
+    shrinkage = float(np.clip(spread / n_days / distance, 0.0, 1.0)) if distance > 0 else 1.0
+
+    covariance = shrinkage * target * np.eye(n) + (1 - shrinkage) * sample
+    values, vectors = np.linalg.eigh(covariance)
+    if values.min() < 0:
+        covariance = (vectors * np.clip(values, 0.0, None)) @ vectors.T
+    return covariance, shrinkage
+
+
+def project_to_bounds(weights: np.ndarray, lower: float, upper: float) -> np.ndarray:
+    """
+    Euclidean projection onto {sum(w) = 1, lower <= w <= upper}: clip(w - tau) for the
+    shift tau that makes the clipped weights sum to 1.
+
+    The clipped sum is piecewise linear and decreasing in tau, with breakpoints where a
+    weight reaches a bound, so it is evaluated at every breakpoint at once (from sorted
+    weights and their cumulative sums) and tau interpolated exactly.
+    """
+    n = len(weights)
+    ordered = np.sort(weights)
+    cumulative = np.concatenate(([0.0], np.cumsum(ordered)))
+    taus = np.sort(np.concatenate((weights - lower, weights - upper)))
+    at_lower = np.searchsorted(ordered, taus + lower, side="right")
+    below_upper = np.searchsorted(ordered, taus + upper, side="left")
+    totals = (
+        lower * at_lower + upper * (n - below_upper)
+        + cumulative[below_upper] - cumulative[at_lower] - taus * (below_upper - at_lower)
+    )
+    tau = np.interp(1.0, totals[::-1], taus[::-1])
+    return np.clip(weights - tau, lower, upper)
+
+
+def _quadratic_weights(
+    covariance: np.ndarray,
+    linear: np.ndarray,
+    lower: float,
+    upper: float,
+    max_iter: int = 5000,
+    tol: float = 1e-9,
+) -> np.ndarray:
+    """
+    Minimises 0.5 w'Σw - linear'w over the bounded budget set by accelerated
+    projected gradient descent (FISTA with adaptive restarts), stepping by 1 / the
+    largest eigenvalue of Σ.
+    """
+    n = len(linear)
+    step = 1.0 / max(np.linalg.eigvalsh(covariance)[-1], 1e-18)
+    weights = project_to_bounds(np.full(n, 1.0 / n), lower, upper)
+    momentum_point, momentum = weights, 1.0
+    for _ in range(max_iter):
+        gradient = covariance @ momentum_point - linear
+        updated = project_to_bounds(momentum_point - step * gradient, lower, upper)
+        if gradient @ (updated - weights) > 0:  # momentum is pointing uphill: restart it
+            momentum = 1.0
+        next_momentum = (1 + np.sqrt(1 + 4 * momentum ** 2)) / 2
+        momentum_point = updated + (momentum - 1) / next_momentum * (updated - weights)
+        converged = np.abs(updated - weights).max() < tol
+        weights, momentum = updated, next_momentum
+        if converged:
+            break
+    return weights
+
+
+def _risk_parity_weights(covariance: np.ndarray, budgets: np.ndarray, max_iter: int = 100) -> np.ndarray:
+    """
+    Long-only weights whose risk contributions w_i (Σw)_i are proportional to `budgets`:
+    Newton's method on the convex 0.5 y'Σy - budgets'log(y), whose minimiser
+    normalised to sum 1 is the risk-parity portfolio (Spinu, 2013).
+    """
+    volatility = np.sqrt(np.clip(np.diag(covariance), 1e-18, None))
+    y = 1.0 / volatility
+    y *= np.sqrt(budgets.sum() / (y @ covariance @ y))
+
+    def objective(point):
+        return 0.5 * point @ covariance @ point - budgets @ np.log(point)
+
+    for _ in range(max_iter):
+        gradient = covariance @ y - budgets / y
+        hessian = covariance + np.diag(budgets / y ** 2)
+        direction = np.linalg.solve(hessian, gradient)
+        if gradient @ direction < 1e-16:
+            break
+        # Backtracking line search that keeps every position positive
+        negative = direction > 0
+        step = min(1.0, 0.99 * (y[negative] / direction[negative]).min()) if negative.any() else 1.0
+        current = objective(y)
+        while objective(y - step * direction) > current - 1e-4 * step * (gradient @ direction) and step > 1e-12:
+            step /= 2
+        y = y - step * direction
+    return y / y.sum()
+
+
+def optimize_weights(
+    covariance: np.ndarray,
+    method: str = DEFAULT_METHOD,
+    expected_returns: np.ndarray | None = None,
+    min_weight: float = DEFAULT_MIN_WEIGHT,
+    max_weight: float = DEFAULT_MAX_WEIGHT,
+    risk_aversion: float = DEFAULT_RISK_AVERSION,
+) -> np.ndarray:
+    """
+    Long-only weights summing to 1 within [min_weight, max_weight].
+
+    Bounds that cannot hold for this many tickers are widened to the nearest feasible
+    ones (e.g. a 40% cap on two tickers becomes 50%). Risk parity is solved without
+    bounds and then projected onto them, so bounds that bind trade exact parity for
+    the closest feasible weights.
+
+    Args:
+        covariance (np.ndarray): (tickers x tickers) covariance of returns.
+        method (str): "min_variance", "risk_parity" or "mean_variance".
+        expected_returns (np.ndarray, optional): Per-ticker returns over the covariance's
+            period; required for mean_variance.
+        risk_aversion (float): Weight of variance against return for mean_variance.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Invalid method '{method}'. Must be one of: {', '.join(METHODS)}")
+    n = len(covariance)
+    upper = max(max_weight, 1.0 / n)
+    lower = min(max(min_weight, 0.0), 1.0 / n)
+
+    if method == "risk_parity":
+        return project_to_bounds(_risk_parity_weights(covariance, np.full(n, 1.0 / n)), lower, upper)
+    if method == "min_variance":
+        return _quadratic_weights(covariance, np.zeros(n), lower, upper)
+    if expected_returns is None:
+        raise ValueError("mean_variance needs expected_returns")
+    return _quadratic_weights(risk_aversion * covariance, expected_returns, lower, upper)
+
+
+def _portfolio_directions(portfolio: dict) -> tuple[list[str], np.ndarray]:
+    """Unique tickers and their direction (+1 long, -1 short) from the agent's weights."""
+    tickers, weights = portfolio_weight_matrix([portfolio], gross=False)
+    return tickers, np.where(weights[:, 0] < 0, -1.0, 1.0)
+
+
+def optimize_portfolio(
+    portfolio: dict,
+    method: str = DEFAULT_METHOD,
+    end: str | None = None,
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+    min_weight: float = DEFAULT_MIN_WEIGHT,
+    max_weight: float = DEFAULT_MAX_WEIGHT,
+    risk_aversion: float = DEFAULT_RISK_AVERSION,
+    mean_shrinkage: float = DEFAULT_MEAN_SHRINKAGE,
+) -> dict:
+    """
+    Re-weights a portfolio schema output: keeps the agent's tickers and directions and
+    replaces its weights with optimised ones.
+
+    Short positions are optimised as long positions in the negated return series and
+    given back their sign, so absolute weights sum to 1.
+
+    Args:
+        portfolio (dict): Portfolio schema output, as saved to results/portfolio.json.
+        method (str): See optimize_weights.
+        end (str, optional): Last date (exclusive) of the estimation window; defaults to today.
+        lookback_days (int): Trading days of returns the covariance is estimated from.
+        mean_shrinkage (float): For mean_variance, how far (0-1) historical mean returns
+            are pulled towards their cross-sectional average.
+
+    Returns:
+        dict: A copy of `portfolio` with optimised weights (each asset keeps the agent's
+            as "agent_weight") and an "optimization" summary: method, estimation window,
+            shrinkage intensity, expected annualised volatility (%) and each ticker's
+            share of portfolio risk.
+
+    Raises:
+        ValueError: If prices are missing or too short for any ticker.
+    """
+    optimized = copy.deepcopy(portfolio)
+    assets = get_portfolio_assets(optimized)
+    tickers, directions = _portfolio_directions(optimized)
+
+    end_ts = pd.Timestamp(end) if end else pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+    start = (end_ts - pd.Timedelta(days=int(lookback_days * 365 / TRADING_DAYS) + 7)).strftime("%Y-%m-%d")
+    prices = get_price_store().get_prices(tickers, start=start, end=end_ts.strftime("%Y-%m-%d"))
+    returns = prices.pct_change(fill_method=None).iloc[1:].tail(lookback_days).to_numpy(dtype=float) * directions
+
+    covariance, shrinkage = shrunk_covariance(returns)
+    expected_returns = None
+    if method == "mean_variance":
+        means = np.nanmean(returns, axis=0)
+        expected_returns = (1 - mean_shrinkage) * means + mean_shrinkage * means.mean()
+    weights = optimize_weights(
+        covariance, method, expected_returns,
+        min_weight=min_weight, max_weight=max_weight, risk_aversion=risk_aversion,
+    )
+
+    variance = weights @ covariance @ weights
+    contributions = weights * (covariance @ weights) / variance if variance > 0 else weights
+    signed = dict(zip(tickers, weights * directions))
+    for asset in assets:
+        asset["agent_weight"] = asset.get("weight")
+        asset["weight"] = round(float(signed.pop(asset["ticker"], 0.0)), 6)  # a repeated ticker keeps one entry
+
+    optimized["optimization"] = {
+        "method": method,
+        "start": str(prices.index[0].date()),
+        "end": str(prices.index[-1].date()),
+        "covariance_shrinkage": round(shrinkage, 4),
+        "expected_volatility": round(float(np.sqrt(variance * TRADING_DAYS)) * 100, 2),
+        "risk_contributions": {t: round(float(c), 4) for t, c in zip(tickers, contributions)},
+    }
+    logger.info(
+        f"Optimised {len(tickers)} weights ({method}, shrinkage {shrinkage:.2f}): "
+        f"expected volatility {optimized['optimization']['expected_volatility']}%"
+    )
+    return optimized
@@ -0,0 +1,278 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRICE_STORE_ROOT = "data/prices"
+DEFAULT_REFRESH_INTERVAL = 3600  # seconds before a symbol is checked for new bars again
+DEFAULT_HISTORY_START = "2000-01-01"
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def period_to_start(period: str, today: pd.Timestamp | None = None) -> str | None:
+    """
+    Converts a yfinance-style period ("5d", "1mo", "2y", "ytd", "max") to a start date.
+
+    Returns:
+        str | None: Start date as YYYY-MM-DD, or None for "max".
+    """
+    today = (today or pd.Timestamp.today()).normalize()
+    if period == "max":
+        return None
+    if period == "ytd":
+        return f"{today.year}-01-01"
+
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"Unsupported period: {period}")
+    n, unit = int(match.group(1)), match.group(2)
+    offset = {
+        "d": pd.DateOffset(days=n),
+        "wk": pd.DateOffset(weeks=n),
+        "mo": pd.DateOffset(months=n),
+        "y": pd.DateOffset(years=n),
+    }[unit]
+    return (today - offset).strftime("%Y-%m-%d")
+
+
+class PriceStore:
+    """
+    Local market-data store: one Parquet file of OHLCV bars per symbol and interval.
+
+    Reads are served from memory/disk; yfinance is only asked for bars newer (or older)
+    than what the store already holds. With `offline=True` the store never downloads,
+    which lets evaluations run against a pre-seeded store.
+    """
+
+    def __init__(
+        self,
+        root: str = DEFAULT_PRICE_STORE_ROOT,
+        offline: bool = False,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+    ):
+        self.root = root
+        self.offline = offline
+        self.refresh_interval = refresh_interval
+        self._bars: dict[tuple[str, str], pd.DataFrame] = {}
+        self._matrices: dict[tuple, pd.DataFrame] = {}
+        self._coverage: dict[str, dict] = {}
+        self._lock = threading.RLock()
+
+    # ---- storage -------------------------------------------------------------
+
+    def _dir(self, interval: str) -> str:
+        return os.path.join(self.root, interval)
+
+    def _path(self, symbol: str, interval: str) -> str:
+        safe = re.sub(r"[^A-Za-z0-9._-]", "_", symbol)
+        return os.path.join(self._dir(interval), f"{safe}.parquet")
+
+    def _coverage_path(self, interval: str) -> str:
+        return os.path.join(self._dir(interval), "_coverage.json")
+
+    def _load_coverage(self, interval: str) -> dict:
+        if interval not in self._coverage:
+            try:
+                with open(self._coverage_path(interval), "r") as f:
+                    self._coverage[interval] = json.load(f)
+            except FileNotFoundError:
+                self._coverage[interval] = {}
+        return self._coverage[interval]
+
+    def _save_coverage(self, interval: str) -> None:
+        coverage = self._coverage[interval]
+        # Keep what other processes sharing the store recorded since we loaded it
+        try:
+            with open(self._coverage_path(interval), "r") as f:
+                stored = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            stored = {}
+        for symbol, theirs in stored.items():
+            ours = coverage.setdefault(symbol, dict(theirs))
+            ours["start"] = min(ours["start"], theirs["start"])
+            ours["refreshed_at"] = max(ours.get("refreshed_at", 0), theirs.get("refreshed_at", 0))
+
+        os.makedirs(self._dir(interval), exist_ok=True)
+        # Write-then-rename, like the bar files, so readers never see a half-written file
+        tmp_path = f"{self._coverage_path(interval)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(coverage, f, indent=2)
+        os.replace(tmp_path, self._coverage_path(interval))
+
+    def load_bars(self, symbol: str, interval: str = "1d") -> pd.DataFrame:
+        """Returns every bar held for `symbol` (empty DataFrame if none), without downloading."""
+        with self._lock:
+            key = (symbol, interval)
+            if key not in self._bars:
+                path = self._path(symbol, interval)
+                if os.path.exists(path):
+                    self._bars[key] = pd.read_parquet(path)
+                else:
+                    self._bars[key] = pd.DataFrame(columns=BAR_COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+            return self._bars[key]
+
+    def write_bars(self, symbol: str, bars: pd.DataFrame, interval: str = "1d") -> None:
+        """
+        Merges `bars` into the stored history for `symbol` (newer rows win) and persists it.
+        Also used to seed a store for offline use.
+        """
+        with self._lock:
+            bars = bars[[c for c in BAR_COLUMNS if c in bars.columns]].dropna(how="all")
+            bars.index = pd.DatetimeIndex(bars.index, name="Date")
+            existing = self.load_bars(symbol, interval)
+            merged = pd.concat([existing, bars]) if len(existing) else bars
+            merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+
+            os.makedirs(self._dir(interval), exist_ok=True)
+            # Write-then-rename, so processes sharing the store never read a half-written file
+            tmp_path = f"{self._path(symbol, interval)}.{os.getpid()}.tmp"
+            merged.to_parquet(tmp_path)
+            os.replace(tmp_path, self._path(symbol, interval))
+            self._bars[(symbol, interval)] = merged
+            # Any aligned matrix containing this symbol is now out of date
+            self._matrices = {k: v for k, v in self._matrices.items() if symbol not in k[0] or k[1] != interval}
+
+    # ---- refresh -------------------------------------------------------------
+
+    def _download(self, symbols: list[str], start: str, end: str | None, interval: str) -> dict[str, pd.DataFrame]:
+        import yfinance as yf  # deferred: only needed when the store is missing bars
+
+        logger.info(f"Downloading {interval} bars for {symbols} from {start} to {end or 'today'}")
+        data = yf.download(
+            tickers=symbols, start=start, end=end, interval=interval, progress=False, group_by="ticker"
+        )
+        if data is None or data.empty:
+            return {}
+
+        frames = {}
+        for symbol in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[symbol]
+            else:
+                frame = data
+            frames[symbol] = frame.dropna(how="all")
+        return frames
+
+    def refresh(self, symbols: list[str], start: str | None = None, end: str | None = None, interval: str = "1d") -> None:
+        """
+        Brings the stored history for `symbols` up to date, downloading only missing bars:
+        older bars if `start` precedes what has been requested before, and bars from the
+        last stored date onwards (the last bar is re-fetched since it may have been partial).
+        """
+        if self.offline:
+            return
+
+        with self._lock:
+            coverage = self._load_coverage(interval)
+            now = time.time()
+            requested_start = pd.Timestamp(start or DEFAULT_HISTORY_START).strftime("%Y-%m-%d")
+
+            # Group symbols by the date their download has to start from, one request per group
+            fetches: dict[str | None, list[str]] = {}
+            backfills: dict[tuple[str, str], list[str]] = {}
+            for symbol in symbols:
+                info = coverage.get(symbol)
+                bars = self.load_bars(symbol, interval)
+                if info is None or bars.empty:
+                    fetches.setdefault(requested_start, []).append(symbol)
+                    continue
+
+                if requested_start < info["start"]:
+                    backfills.setdefault((requested_start, info["start"]), []).append(symbol)
+
+                last = bars.index.max()
+                if end is not None and last >= pd.Timestamp(end) - pd.Timedelta(days=1):
+                    continue  # already holds the whole requested window
+                if now - info.get("refreshed_at", 0) > self.refresh_interval:
+                    fetches.setdefault(last.strftime("%Y-%m-%d"), []).append(symbol)
+
+            for (backfill_start, backfill_end), group in backfills.items():
+                for symbol, frame in self._download(group, backfill_start, backfill_end, interval).items():
+                    self.write_bars(symbol, frame, interval)
+                for symbol in group:
+                    coverage[symbol]["start"] = backfill_start
+
+            for fetch_start, group in fetches.items():
+                frames = self._download(group, fetch_start, end, interval)
+                for symbol, frame in frames.items():
+                    self.write_bars(symbol, frame, interval)
+                for symbol in group:
+                    info = coverage.setdefault(symbol, {"start": fetch_start})
+                    info["start"] = min(info["start"], fetch_start)
+                    info["refreshed_at"] = now
+
+            if fetches or backfills:
+                self._save_coverage(interval)
+
+    # ---- read API ------------------------------------------------------------
+
+    def get_bars(self, symbol: str, start: str | None = None, end: str | None = None, interval: str = "1d") -> pd.DataFrame:
+        """
+        Returns OHLCV bars for one symbol between `start` (inclusive) and `end` (exclusive).
+        """
+        self.refresh([symbol], start=start, end=end, interval=interval)
+        bars = self.load_bars(symbol, interval)
+        return bars.loc[_date_slice(start, end)]
+
+    def get_prices(
+        self,
+        tickers: list[str],
+        start: str | None = None,
+        end: str | None = None,
+        interval: str = "1d",
+        field: str = "Close",
+    ) -> pd.DataFrame:
+        """
+        Returns an aligned (dates x tickers) matrix of `field` between `start` (inclusive)
+        and `end` (exclusive), in the order of `tickers`.
+
+        The aligned matrix is built once per ticker set and kept in memory; repeated reads
+        are row slices of it rather than fresh copies.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        self.refresh(tickers, start=start, end=end, interval=interval)
+
+        key = (tuple(tickers), interval, field)
+        with self._lock:
+            matrix = self._matrices.get(key)
+            if matrix is None:
+                missing = [t for t in tickers if self.load_bars(t, interval).empty]
+                if missing:
+                    raise ValueError(f"No {interval} price history available for: {missing}")
+                matrix = pd.concat(
+                    {t: self.load_bars(t, interval)[field] for t in tickers}, axis=1
+                ).sort_index()
+                matrix.index.name = "Date"
+                self._matrices[key] = matrix
+
+        return matrix.loc[_date_slice(start, end)]
+
+
+def _date_slice(start: str | None, end: str | None) -> slice:
+    """Label slice for [start, end) on a DatetimeIndex."""
+    end_ts = pd.Timestamp(end) - pd.Timedelta(microseconds=1) if end else None
+    return slice(pd.Timestamp(start) if start else None, end_ts)
+
+
+_store: PriceStore | None = None
+
+
+def get_price_store() -> PriceStore:
+    """Returns the process-wide price store, configured from the environment."""
+    global _store
+    if _store is None:
+        _store = PriceStore(
+            root=os.getenv("PRICE_STORE_ROOT", DEFAULT_PRICE_STORE_ROOT),
+            offline=os.getenv("PRICE_STORE_OFFLINE", "").lower() in ("1", "true", "yes"),
+            refresh_interval=float(os.getenv("PRICE_STORE_REFRESH_INTERVAL", DEFAULT_REFRESH_INTERVAL)),
+        )
+    return _store
@@ -0,0 +1,264 @@
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 429 = throttled; 5xx (and Anthropic's 529) = provider overloaded or flaky
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504, 529}
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 1.0  # seconds
+DEFAULT_BACKOFF_MAX = 60.0  # seconds
+BUCKET_BURST_SECONDS = 10  # a bucket holds this many seconds of its rate
+
+# Per provider: (env var, seconds the value is per) of its request and token rates
+# (unset = no limit), and the ceiling its adaptive concurrency limit can grow to
+PROVIDERS = {
+    "llm": {
+        "requests": ("LLM_REQUESTS_PER_MINUTE", 60),
+        "tokens": ("LLM_TOKENS_PER_MINUTE", 60),
+        "max_concurrency": ("LLM_MAX_CONCURRENCY", 16),
+    },
+    "serper": {
+        "requests": ("SERPER_QUERIES_PER_SECOND", 1),
+        "max_concurrency": ("SERPER_MAX_CONCURRENCY", 8),
+    },
+}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at `rate` per second up to `capacity`.
+
+    `acquire` blocks until enough tokens are available; `consume` debits without
+    waiting (the bucket may go negative), e.g. to settle a request's actual cost once
+    it is known.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate * BUCKET_BURST_SECONDS)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """
+        Takes `amount` tokens, sleeping until they are available. A request larger than
+        the bucket waits for a full bucket and leaves it in debt.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                needed = min(amount, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return waited
+                delay = (needed - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def consume(self, amount: float) -> None:
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+
+class AdaptiveConcurrency:
+    """
+    Concurrency limit tuned by additive-increase/multiplicative-decrease (AIMD).
+
+    Each successful call at normal latency grows the limit by about one slot per full
+    window of calls; a throttled call (or latency well above the best seen so far)
+    shrinks it multiplicatively, at most once per typical call duration so a burst of
+    429s from one window counts as a single congestion signal. Latency is compared per
+    unit of work (e.g. per generated token), so long answers do not read as congestion.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        initial: int | None = None,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial if initial is not None else max(min_limit, max_limit // 2))
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self._latency: float | None = None  # moving average
+        self._best_latency: float | None = None
+        self._call_seconds = 0.0  # moving average of whole-call durations
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, throttled: bool = False, size: float = 1.0) -> None:
+        """Returns a slot, with how long the call took and how much work (`size`) it did."""
+        with self._condition:
+            self.in_flight -= 1
+            self._call_seconds = 0.8 * self._call_seconds + 0.2 * latency if self._call_seconds else latency
+            if throttled:
+                self._decrease()
+            else:
+                latency /= max(size, 1.0)
+                self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+                self._best_latency = min(self._best_latency or self._latency, self._latency)
+                if self._latency > self._best_latency * self.latency_tolerance:
+                    self._decrease()
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self._call_seconds:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        logger.info(f"Reduced concurrency limit to {int(self.limit)}")
+
+
+def error_status(error: Exception) -> int | None:
+    """HTTP status of a provider error (litellm/openai exceptions, requests.HTTPError), if any."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(error: Exception) -> float | None:
+    """Seconds from the Retry-After header of a throttled response, if it sent one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = DEFAULT_BACKOFF_BASE, cap: float = DEFAULT_BACKOFF_MAX) -> float:
+    """Exponential backoff with full jitter, so callers throttled together do not retry together."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class ProviderRateLimiter:
+    """
+    Client-side limits for one API provider: request and token buckets, an adaptive
+    concurrency limit, and retries with jittered backoff on 429/5xx responses.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: AdaptiveConcurrency,
+        requests: TokenBucket | None = None,
+        tokens: TokenBucket | None = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ):
+        self.name = name
+        self.concurrency = concurrency
+        self.requests = requests
+        self.tokens = tokens
+        self.max_retries = max_retries
+
+    @property
+    def limited(self) -> bool:
+        """Whether a request or token rate is configured for the provider."""
+        return self.requests is not None or self.tokens is not None
+
+    def call(self, request, tokens: float = 0.0, count_tokens=None):
+        """
+        Runs `request()` within the provider's limits, retrying throttled and 5xx errors.
+
+        Args:
+            request (callable): Makes the API call and returns its result.
+            tokens (float): Estimated tokens the request sends (charged before the call).
+            count_tokens (callable, optional): Maps the result to the tokens it produced,
+                charged after the call.
+
+        Returns:
+            Whatever `request()` returns.
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.requests is not None:
+                self.requests.acquire()
+            if self.tokens is not None and tokens:
+                self.tokens.acquire(tokens)
+
+            self.concurrency.acquire()
+            started = time.perf_counter()
+            try:
+                result = request()
+            except Exception as e:
+                status = error_status(e)
+                throttled = status in RETRYABLE_STATUS_CODES
+                self.concurrency.release(time.perf_counter() - started, throttled=throttled)
+                if not throttled or attempt == self.max_retries:
+                    raise
+                delay = max(backoff_delay(attempt), retry_after(e) or 0.0)
+                logger.warning(
+                    f"{self.name} returned {status}; retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+                )
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self.concurrency.release(time.perf_counter() - started)
+                raise
+
+            produced = count_tokens(result) if count_tokens is not None else 1.0
+            self.concurrency.release(time.perf_counter() - started, size=produced)
+            if self.tokens is not None and count_tokens is not None:
+                self.tokens.consume(produced)
+            return result
+
+
+def _bucket(setting: tuple | None) -> TokenBucket | None:
+    if setting is None:
+        return None
+    env_var, period = setting
+    value = os.getenv(env_var)
+    return TokenBucket(float(value) / period) if value else None
+
+
+def _build_rate_limiter(provider: str) -> ProviderRateLimiter:
+    config = PROVIDERS[provider]
+    env_var, default = config["max_concurrency"]
+    return ProviderRateLimiter(
+        name=provider,
+        concurrency=AdaptiveConcurrency(max_limit=int(os.getenv(env_var, default))),
+        requests=_bucket(config.get("requests")),
+        tokens=_bucket(config.get("tokens")),
+        max_retries=int(os.getenv("RATE_LIMIT_MAX_RETRIES", DEFAULT_MAX_RETRIES)),
+    )
+
+
+_limiters: dict[str, ProviderRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> ProviderRateLimiter:
+    """Returns the process-wide rate limiter for `provider` ("llm" or "serper"), configured from the environment."""
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = _build_rate_limiter(provider)
+        return _limiters[provider]
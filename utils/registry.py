@@ -0,0 +1,51 @@
+import functools
+import inspect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# "run":     rebuilt for every pipeline run (agents, date-stamped prompts)
+# "process": built once and kept for the life of the process (tools, schemas)
+REGISTRY_SCOPES = ("run", "process")
+
+_instances: dict[str, dict] = {scope: {} for scope in REGISTRY_SCOPES}
+_lock = threading.RLock()
+
+
+def shared(scope: str = "run"):
+    """
+    Decorator that memoises a factory so every caller gets the same instance
+    for the same arguments within `scope`.
+
+    Args:
+        scope (str): "run" (cleared by reset_run_registry) or "process".
+    """
+    if scope not in REGISTRY_SCOPES:
+        raise ValueError(f"Invalid registry scope '{scope}'. Must be one of: {', '.join(REGISTRY_SCOPES)}")
+
+    def decorator(factory):
+        signature = inspect.signature(factory)
+
+        @functools.wraps(factory)
+        def wrapper(*args, **kwargs):
+            # Bind to the signature so f(), f(None) and f(key=None) share one instance
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (factory.__module__, factory.__qualname__, tuple(bound.arguments.items()))
+            # RLock: factories may call other shared factories on the same thread
+            with _lock:
+                instances = _instances[scope]
+                if key not in instances:
+                    instances[key] = factory(*args, **kwargs)
+                return instances[key]
+        return wrapper
+
+    return decorator
+
+
+def reset_run_registry() -> None:
+    """Drops run-scoped instances so the next run builds fresh agents and prompts."""
+    with _lock:
+        logger.info(f"Resetting run registry ({len(_instances['run'])} instances)")
+        _instances["run"].clear()
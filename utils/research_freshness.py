@@ -0,0 +1,98 @@
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_HOUR = 3600
+
+
+@dataclass
+class FreshnessPolicy:
+    """
+    How long a research topic's stored output can be reused before it is rerun.
+
+    Attributes:
+        max_age_hours (float): Normal reuse window.
+        event_dates (list[str]): Dates (YYYY-MM-DD) around which the topic moves fast,
+            e.g. FOMC decisions for fed policy.
+        event_window_days (int): Days either side of an event date that count as "around" it.
+        event_max_age_hours (float, optional): Reuse window around event dates.
+    """
+    max_age_hours: float
+    event_dates: list[str] = field(default_factory=list)
+    event_window_days: int = 1
+    event_max_age_hours: float | None = None
+
+    def max_age(self, now: float) -> float:
+        """Reuse window in seconds at unix time `now`."""
+        if self.event_max_age_hours is not None and self.event_dates:
+            today = datetime.utcfromtimestamp(now).date()
+            if any(
+                abs((today - date.fromisoformat(event)).days) <= self.event_window_days
+                for event in self.event_dates
+            ):
+                return self.event_max_age_hours * SECONDS_PER_HOUR
+        return self.max_age_hours * SECONDS_PER_HOUR
+
+    def is_fresh(self, recorded_at: float, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+        return now - recorded_at <= self.max_age(now)
+
+
+def _event_dates(env_var: str) -> list[str]:
+    return [event.strip() for event in os.getenv(env_var, "").split(",") if event.strip()]
+
+
+# Fed research matters most around FOMC decisions (dates from FOMC_DATES); fiscal policy
+# and capital flows barely change intraday.
+DEFAULT_FRESHNESS = {
+    "fed_policy": lambda: FreshnessPolicy(max_age_hours=12, event_dates=_event_dates("FOMC_DATES"), event_max_age_hours=1),
+    "banking_risk": lambda: FreshnessPolicy(max_age_hours=12),
+    "global_capital_flows": lambda: FreshnessPolicy(max_age_hours=24),
+    "fiscal_policy": lambda: FreshnessPolicy(max_age_hours=24),
+    "macro_growth": lambda: FreshnessPolicy(max_age_hours=12),
+    "macro_inflation": lambda: FreshnessPolicy(max_age_hours=12),
+}
+
+
+def freshness_policy(topic: str) -> FreshnessPolicy:
+    """
+    Returns the freshness policy of a research topic. RESEARCH_MAX_AGE_HOURS_<TOPIC>
+    (e.g. RESEARCH_MAX_AGE_HOURS_FISCAL_POLICY=48) overrides the normal reuse window;
+    0 always reruns the topic.
+    """
+    policy = DEFAULT_FRESHNESS.get(topic, lambda: FreshnessPolicy(max_age_hours=0))()
+    override = os.getenv(f"RESEARCH_MAX_AGE_HOURS_{topic.upper()}")
+    if override:
+        policy.max_age_hours = float(override)
+    return policy
+
+
+def research_refresh_forced() -> bool:
+    """Whether every topic is rerun regardless of freshness, from RESEARCH_FORCE_REFRESH."""
+    return os.getenv("RESEARCH_FORCE_REFRESH", "").lower() in ("1", "true", "yes")
+
+
+def find_fresh_research(topic: str, ledger, now: float | None = None) -> dict | None:
+    """
+    Returns the latest stored output of `topic` from the run ledger if it is still fresh
+    under the topic's policy, else None.
+
+    Returns:
+        dict | None: The ledger row (id, run_id, created_at, content, ...).
+    """
+    if research_refresh_forced():
+        return None
+    row = ledger.latest(f"research_{topic}")
+    if row is None:
+        return None
+
+    now = time.time() if now is None else now
+    policy = freshness_policy(topic)
+    if not policy.is_fresh(row["created_at"], now):
+        logger.info(f"Research on {topic} is stale ({(now - row['created_at']) / SECONDS_PER_HOUR:.1f}h old)")
+        return None
+    return row
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Rough tokens-per-character ratio for English prose with the OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+# A markdown link "[label](url)", a URL alone in parentheses, or a bare URL
+_URL = r"https?://[^\s)\]>\"'<]+"
+_CITATION = re.compile(rf"\[([^\]]+)\]\((https?://[^)\s]+)\)|\(({_URL})\)|({_URL})")
+# "S" keeps references apart from bracketed numbers the agents write themselves
+_SOURCE_REF = re.compile(r"\[S(\d+)\]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[-])")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token); good enough for budgeting prompts."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def dumps_compact(data) -> str:
+    """JSON without indentation or padding, for text that only a model will read."""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def compact_research(results: list[tuple[str, str, str]]) -> dict:
+    """
+    Builds the trader hand-off from research results.
+
+    Drops the task descriptions (search instructions and date boilerplate the trader
+    never needs), collapses whitespace, and replaces every cited URL with a reference
+    [S<n>] into one de-duplicated `sources` list shared by all topics.
+
+    Args:
+        results (list of tuples): (task description, agent role, output) per research crew;
+            output may be a crewai TaskOutput or a string.
+
+    Returns:
+        dict: {"sources": [url, ...], "research": [{"agent": role, "findings": text}, ...]}
+    """
+    sources: list[str] = []
+    index: dict[str, int] = {}
+
+    def ref(url: str) -> str:
+        # Sentence punctuation right after a bare URL is not part of it
+        trimmed = url.rstrip(".,;:")
+        if trimmed not in index:
+            sources.append(trimmed)
+            index[trimmed] = len(sources)
+        return f"[S{index[trimmed]}]{url[len(trimmed):]}"
+
+    research = []
+    for _, agent_role, output in results:
+        text = getattr(output, "raw", output) or ""
+        text = _CITATION.sub(
+            lambda m: f"{m.group(1)} {ref(m.group(2))}" if m.group(2) else ref(m.group(3) or m.group(4)), text
+        )
+        text = re.sub(r"\s+", " ", text).strip()
+        research.append({"agent": agent_role, "findings": text})
+
+    return {"sources": sources, "research": research}
+
+
+def load_research_summary(text: str) -> dict:
+    """
+    Parses a saved research summary, accepting both the compact hand-off and the older
+    list of {"task", "agent", "output"} entries.
+    """
+    data = json.loads(text)
+    if isinstance(data, dict) and "research" in data:
+        return data
+    return compact_research([(item.get("task"), item.get("agent"), item.get("output")) for item in data])
+
+
+def _truncate_sentences(text: str, max_chars: int) -> str:
+    """Keeps whole leading sentences up to `max_chars`; research summaries lead with conclusions."""
+    if len(text) <= max_chars:
+        return text
+    kept, size = [], 0
+    for sentence in _SENTENCE_END.split(text):
+        if size + len(sentence) + 1 > max_chars:
+            break
+        kept.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(kept) if kept else text[:max_chars].rsplit(" ", 1)[0]
+
+
+def condense_research(summary: dict, token_budget: int) -> dict:
+    """
+    Shrinks a compact research summary to roughly `token_budget` tokens.
+
+    Each topic gets an equal share of the budget (shares a short topic does not use are
+    passed on to the others) and keeps its leading sentences. Sources no longer cited
+    are dropped and the remaining references renumbered.
+
+    Args:
+        summary (dict): Output of compact_research / load_research_summary.
+        token_budget (int): Approximate size limit of the serialised result.
+
+    Returns:
+        dict: Condensed summary in the same format.
+    """
+    if estimate_tokens(dumps_compact(summary)) <= token_budget:
+        return summary
+
+    research = summary["research"]
+    overhead = len(dumps_compact({"sources": [], "research": [{"agent": r["agent"], "findings": ""} for r in research]}))
+    budget_chars = token_budget * CHARS_PER_TOKEN - overhead
+    # Sources are short; reserve room for them rather than trying to trim URLs
+    budget_chars -= sum(len(url) + 3 for url in summary["sources"])
+    budget_chars = max(budget_chars, 0)
+
+    # Shortest topics first, so their unused share rolls over to longer ones
+    order = sorted(range(len(research)), key=lambda i: len(research[i]["findings"]))
+    condensed = [None] * len(research)
+    remaining = budget_chars
+    for position, i in enumerate(order):
+        share = remaining // (len(order) - position)
+        findings = _truncate_sentences(research[i]["findings"], share)
+        condensed[i] = {"agent": research[i]["agent"], "findings": findings}
+        remaining -= len(findings)
+
+    # Renumber the sources that are still cited
+    renumber: dict[int, int] = {}
+    sources = []
+    for item in condensed:
+        for n in _SOURCE_REF.findall(item["findings"]):
+            n = int(n)
+            if n not in renumber and 0 < n <= len(summary["sources"]):
+                sources.append(summary["sources"][n - 1])
+                renumber[n] = len(sources)
+    for item in condensed:
+        item["findings"] = _SOURCE_REF.sub(
+            lambda m: f"[S{renumber[int(m.group(1))]}]" if int(m.group(1)) in renumber else m.group(0),
+            item["findings"],
+        )
+
+    result = {"sources": sources, "research": condensed}
+    logger.info(
+        f"Condensed research hand-off from ~{estimate_tokens(dumps_compact(summary))} "
+        f"to ~{estimate_tokens(dumps_compact(result))} tokens (budget {token_budget})"
+    )
+    return result
+
+
+def research_token_budget() -> int | None:
+    """Token budget for the trader's research input from RESEARCH_TOKEN_BUDGET (unset = no limit)."""
+    value = os.getenv("RESEARCH_TOKEN_BUDGET")
+    return int(value) if value else None
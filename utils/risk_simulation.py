@@ -0,0 +1,219 @@
+"""
+Monte Carlo VaR, CVaR and drawdown distributions for a portfolio.
+
+Paths are built by resampling days of the portfolio's historical daily returns in
+blocks, which keeps the volatility clustering and autocorrelation within each block:
+
+    stationary  block lengths are geometric with mean `block_days` (Politis & Romano, 1994)
+    block       fixed blocks of `block_days` (moving-block bootstrap)
+
+Whole days are resampled, so the assets' co-movement on each day is kept, and the
+portfolio is held at constant weights, so each day's portfolio return can be computed
+once up front and only that one series is resampled. Paths are simulated in chunks of
+at most SIM_CHUNK_CELLS (paths x days) cells, so memory does not grow with the number
+of paths; each chunk draws from its own seeded generator, so results depend only on
+the seed and the chunk size.
+"""
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.portfolio_evals import portfolio_weight_matrix
+from utils.price_store import get_price_store
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+BOOTSTRAP_METHODS = ("stationary", "block")
+MIN_HISTORY_DAYS = 252
+SIM_CHUNK_CELLS = 2_000_000
+CONFIDENCE_LEVELS = (0.95, 0.99)
+VAR_HORIZONS = (1, 21)  # trading days, reported alongside the full horizon
+
+DEFAULT_PATHS = int(os.getenv("RISK_SIM_PATHS", "100000"))
+DEFAULT_HORIZON_DAYS = int(os.getenv("RISK_SIM_HORIZON_DAYS", "252"))
+DEFAULT_BLOCK_DAYS = float(os.getenv("RISK_SIM_BLOCK_DAYS", "10"))
+DEFAULT_HISTORY_DAYS = int(os.getenv("RISK_SIM_HISTORY_DAYS", "2520"))  # ~10 years
+DEFAULT_SEED = int(os.getenv("RISK_SIM_SEED", "0"))
+
+
+def bootstrap_indices(
+    rng: np.random.Generator,
+    n_obs: int,
+    n_paths: int,
+    horizon: int,
+    block_days: float = DEFAULT_BLOCK_DAYS,
+    method: str = "stationary",
+) -> np.ndarray:
+    """
+    (paths x horizon) rows of the history each simulated day is taken from. Every block
+    starts at a random row and runs forward, wrapping around the end of the history.
+    """
+    if method not in BOOTSTRAP_METHODS:
+        raise ValueError(f"Invalid bootstrap '{method}'. Must be one of: {', '.join(BOOTSTRAP_METHODS)}")
+    days = np.arange(horizon)
+    if method == "stationary":
+        new_block = rng.random((n_paths, horizon)) < 1.0 / block_days
+        new_block[:, 0] = True
+    else:
+        new_block = np.broadcast_to(days % max(int(block_days), 1) == 0, (n_paths, horizon))
+    starts = rng.integers(0, n_obs, size=(n_paths, horizon))
+    # Day on which each day's block began, then that block's start row
+    block_day = np.maximum.accumulate(np.where(new_block, days, 0), axis=1)
+    block_start = np.take_along_axis(starts, block_day, axis=1)
+    return (block_start + days - block_day) % n_obs
+
+
+def simulate_paths(
+    daily_returns: np.ndarray,
+    n_paths: int = DEFAULT_PATHS,
+    horizon: int = DEFAULT_HORIZON_DAYS,
+    block_days: float = DEFAULT_BLOCK_DAYS,
+    method: str = "stationary",
+    seed: int = DEFAULT_SEED,
+    var_horizons: tuple[int, ...] = VAR_HORIZONS,
+) -> tuple[dict[int, np.ndarray], np.ndarray]:
+    """
+    Bootstraps `n_paths` paths of `horizon` days from a portfolio's daily returns.
+
+    Returns:
+        tuple[dict[int, np.ndarray], np.ndarray]: Each path's cumulative return after
+            each of `var_horizons` (and `horizon`) days, and each path's max drawdown.
+    """
+    horizons = sorted({h for h in var_horizons if h < horizon} | {horizon})
+    log_returns = np.log1p(np.clip(daily_returns, -0.999999, None))
+    chunk_paths = max(1, SIM_CHUNK_CELLS // horizon)
+
+    cumulative = {h: np.empty(n_paths) for h in horizons}
+    drawdowns = np.empty(n_paths)
+    for chunk, first in enumerate(range(0, n_paths, chunk_paths)):
+        size = min(chunk_paths, n_paths - first)
+        rng = np.random.default_rng([seed, chunk])
+        indices = bootstrap_indices(rng, len(log_returns), size, horizon, block_days, method)
+        log_paths = np.cumsum(log_returns[indices], axis=1)
+        for h in horizons:
+            cumulative[h][first:first + size] = np.expm1(log_paths[:, h - 1])
+        # Peak wealth includes the starting value of 1 (log 0)
+        peaks = np.maximum.accumulate(np.maximum(log_paths, 0.0), axis=1)
+        drawdowns[first:first + size] = -np.expm1((log_paths - peaks).min(axis=1))
+    return cumulative, drawdowns
+
+
+def var_cvar(returns: np.ndarray, confidence: float) -> tuple[float, float]:
+    """Value at risk and expected shortfall (CVaR) at `confidence`, as positive loss fractions."""
+    cutoff = np.quantile(returns, 1 - confidence)
+    return float(-cutoff), float(-returns[returns <= cutoff].mean())
+
+
+def portfolio_daily_returns(
+    portfolio: dict,
+    end: str | None = None,
+    history_days: int = DEFAULT_HISTORY_DAYS,
+) -> pd.Series:
+    """
+    Daily returns of a portfolio held at its weights (see portfolio_weight_matrix)
+    over the history its assets all have, up to `history_days` trading days.
+
+    Raises:
+        ValueError: If prices are missing or the common history is shorter than MIN_HISTORY_DAYS.
+    """
+    tickers, weights = portfolio_weight_matrix([portfolio])
+    if not weights.any():
+        raise ValueError("Portfolio weights are all zero")
+
+    end_ts = pd.Timestamp(end) if end else pd.Timestamp.today().normalize() + pd.Timedelta(days=1)
+    start = (end_ts - pd.Timedelta(days=int(history_days * 365 / TRADING_DAYS) + 7)).strftime("%Y-%m-%d")
+    prices = get_price_store().get_prices(tickers, start=start, end=end_ts.strftime("%Y-%m-%d"))
+    returns = prices.ffill().pct_change(fill_method=None).iloc[1:].dropna().tail(history_days)
+    if len(returns) < MIN_HISTORY_DAYS:
+        raise ValueError(
+            f"Only {len(returns)} days of history common to {tickers}; need {MIN_HISTORY_DAYS}"
+        )
+    return returns @ pd.Series(weights[:, 0], index=tickers)
+
+
+def _agent_risk_metrics(portfolio: dict) -> dict:
+    """The portfolio agent's own risk_metrics, wherever the output nested them."""
+    for container in (portfolio, portfolio.get("schema", {}).get("properties", {})):
+        if isinstance(container.get("risk_metrics"), dict):
+            return container["risk_metrics"]
+    return {}
+
+
+def simulate_portfolio_risk(
+    portfolio: dict,
+    n_paths: int = DEFAULT_PATHS,
+    horizon: int = DEFAULT_HORIZON_DAYS,
+    block_days: float = DEFAULT_BLOCK_DAYS,
+    method: str = "stationary",
+    seed: int = DEFAULT_SEED,
+    end: str | None = None,
+    history_days: int = DEFAULT_HISTORY_DAYS,
+) -> dict:
+    """
+    Simulated risk of a portfolio schema output, checked against the agent's estimates.
+
+    Args:
+        portfolio (dict): Portfolio schema output, as saved to results/portfolio.json.
+        n_paths (int): Number of simulated paths.
+        horizon (int): Trading days per path.
+        block_days (float): Mean (stationary) or fixed (block) block length in days.
+        method (str): "stationary" or "block".
+        seed (int): Seed of the resampling, for reproducible results.
+        end (str, optional): Last date (exclusive) of the history resampled; defaults to today.
+        history_days (int): Trading days of history resampled.
+
+    Returns:
+        dict: Simulation settings; "var" with VaR and CVaR (% loss) per horizon and
+            confidence; "max_drawdown" percentiles (%) over the full horizon;
+            "historical_volatility" (annualised %); and "agent_estimates" comparing the
+            agent's expected_volatility / expected_drawdown with the simulation.
+    """
+    daily = portfolio_daily_returns(portfolio, end=end, history_days=history_days)
+    cumulative, drawdowns = simulate_paths(
+        daily.to_numpy(dtype=float), n_paths=n_paths, horizon=horizon,
+        block_days=block_days, method=method, seed=seed,
+    )
+
+    var = {}
+    for h, returns in cumulative.items():
+        for confidence in CONFIDENCE_LEVELS:
+            value_at_risk, expected_shortfall = var_cvar(returns, confidence)
+            var[f"{h}d_{confidence:.0%}"] = {
+                "var": round(value_at_risk * 100, 2), "cvar": round(expected_shortfall * 100, 2),
+            }
+    percentiles = (50, 75, 95, 99)
+    drawdown_levels = np.percentile(drawdowns, percentiles) * 100
+    volatility = float(daily.std() * np.sqrt(TRADING_DAYS)) * 100
+
+    result = {
+        "method": method,
+        "paths": n_paths,
+        "horizon_days": horizon,
+        "block_days": block_days,
+        "seed": seed,
+        "history_start": str(daily.index[0].date()),
+        "history_end": str(daily.index[-1].date()),
+        "historical_volatility": round(volatility, 2),
+        "var": var,
+        "max_drawdown": {f"p{p}": round(float(level), 2) for p, level in zip(percentiles, drawdown_levels)},
+    }
+
+    agent = _agent_risk_metrics(portfolio)
+    estimates = {}
+    if isinstance(agent.get("expected_volatility"), (int, float)):
+        estimates["expected_volatility"] = agent["expected_volatility"]
+        estimates["volatility_ratio"] = round(volatility / agent["expected_volatility"], 2) if agent["expected_volatility"] else None
+    if isinstance(agent.get("expected_drawdown"), (int, float)):
+        expected = abs(agent["expected_drawdown"])
+        estimates["expected_drawdown"] = agent["expected_drawdown"]
+        estimates["drawdown_exceedance_probability"] = round(float((drawdowns * 100 > expected).mean()), 4)
+    result["agent_estimates"] = estimates
+
+    logger.info(
+        f"Simulated {n_paths} paths of {horizon} days: {horizon}d 99% CVaR "
+        f"{var[f'{horizon}d_99%']['cvar']}%, median max drawdown {result['max_drawdown']['p50']}%"
+    )
+    return result
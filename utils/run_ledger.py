@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEDGER_PATH = "results/runs.sqlite"
+
+SECONDS_PER_DAY = 86400
+
+
+def _portfolio_assets(content) -> list[dict]:
+    """Assets of a portfolio output, whether wrapped in the schema envelope or not."""
+    if not isinstance(content, dict):
+        return []
+    assets = content.get("schema", {}).get("properties", {}).get("assets") or content.get("assets")
+    return [asset for asset in assets or [] if isinstance(asset, dict) and asset.get("ticker")]
+
+
+class RunLedger:
+    """
+    Append-only SQLite store of every pipeline run and the artefacts its stages produced.
+
+    Artefacts are indexed by creation time, stage, hypothesis name and (for portfolios)
+    ticker, so historical lookups do not need to scan or parse old outputs.
+    """
+
+    def __init__(self, path: str = DEFAULT_LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Sharded runs in other processes write to the same ledger; wait for their locks
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " run_id TEXT PRIMARY KEY,"
+                " name TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " started_at REAL NOT NULL,"
+                " finished_at REAL);"
+                "CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at);"
+
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " run_id TEXT,"
+                " stage TEXT NOT NULL,"
+                " hypothesis TEXT,"
+                " path TEXT,"
+                " created_at REAL NOT NULL,"
+                " content TEXT NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_artifacts_created ON artifacts (created_at);"
+                "CREATE INDEX IF NOT EXISTS idx_artifacts_stage ON artifacts (stage, created_at);"
+                "CREATE INDEX IF NOT EXISTS idx_artifacts_hypothesis ON artifacts (hypothesis, created_at);"
+                "CREATE INDEX IF NOT EXISTS idx_artifacts_run ON artifacts (run_id);"
+
+                "CREATE TABLE IF NOT EXISTS artifact_tickers ("
+                " artifact_id INTEGER NOT NULL REFERENCES artifacts (id),"
+                " ticker TEXT NOT NULL,"
+                " weight REAL,"
+                " created_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS idx_tickers_ticker ON artifact_tickers (ticker, created_at);"
+            )
+
+    # ---- writes --------------------------------------------------------------
+
+    def start_run(self, run_id: str, name: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO runs (run_id, name, status, started_at) VALUES (?, ?, 'running', ?)",
+                (run_id, name, time.time()),
+            )
+
+    def finish_run(self, run_id: str, status: str = "ok") -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, finished_at = ? WHERE run_id = ?",
+                (status, time.time(), run_id),
+            )
+
+    def record(
+        self,
+        run_id: str | None,
+        stage: str,
+        content,
+        hypothesis: str | None = None,
+        path: str | None = None,
+    ) -> int:
+        """
+        Appends one stage output to the ledger.
+
+        Args:
+            run_id (str | None): Run the artefact belongs to (the run's trace id).
+            stage (str): Stage that produced it, e.g. "research_fed_policy" or "portfolio".
+            content: Parsed JSON output, or the raw text if it did not parse.
+            hypothesis (str, optional): Name of the hypothesis the stage worked on.
+            path (str, optional): Results file the output was also written to.
+
+        Returns:
+            int: The artefact id.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO artifacts (run_id, stage, hypothesis, path, created_at, content) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, stage, hypothesis, path, now, json.dumps(content)),
+            )
+            artifact_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO artifact_tickers (artifact_id, ticker, weight, created_at) VALUES (?, ?, ?, ?)",
+                [
+                    (artifact_id, str(asset["ticker"]).upper(), asset.get("weight"), now)
+                    for asset in _portfolio_assets(content)
+                ],
+            )
+        logger.info(f"Recorded {stage} output in run ledger (artifact {artifact_id})")
+        return artifact_id
+
+    # ---- queries -------------------------------------------------------------
+
+    def artifacts(
+        self,
+        stage: str | None = None,
+        hypothesis: str | None = None,
+        ticker: str | None = None,
+        run_id: str | None = None,
+        since: float | None = None,
+        until: float | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        """
+        Returns stored artefacts matching every given filter, newest first.
+
+        Args:
+            stage (str, optional): Stage name.
+            hypothesis (str, optional): Hypothesis name.
+            ticker (str, optional): Only portfolios holding this ticker.
+            run_id (str, optional): Only artefacts of this run.
+            since / until (float, optional): Unix-time bounds on when they were recorded.
+            limit (int, optional): Maximum number of rows.
+
+        Returns:
+            list[dict]: Rows with id, run_id, stage, hypothesis, path, created_at and the
+                decoded content.
+        """
+        query = "SELECT a.* FROM artifacts a"
+        clauses, params = [], []
+        if ticker is not None:
+            query += " JOIN artifact_tickers t ON t.artifact_id = a.id"
+            clauses.append("t.ticker = ?")
+            params.append(ticker.upper())
+        for column, value in (("a.stage", stage), ("a.hypothesis", hypothesis), ("a.run_id", run_id)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        # With a ticker, filter on the (ticker, created_at) index instead of the artefact rows
+        created_at = "t.created_at" if ticker is not None else "a.created_at"
+        if since is not None:
+            clauses.append(f"{created_at} >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append(f"{created_at} < ?")
+            params.append(until)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY a.created_at DESC, a.id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [{**dict(row), "content": json.loads(row["content"])} for row in rows]
+
+    def latest(self, stage: str, hypothesis: str | None = None) -> dict | None:
+        """Most recent artefact of `stage` (for `hypothesis`, if given), or None."""
+        rows = self.artifacts(stage=stage, hypothesis=hypothesis, limit=1)
+        return rows[0] if rows else None
+
+    def portfolios_containing(self, ticker: str, days: float = 90) -> list[dict]:
+        """All portfolios holding `ticker` recorded in the last `days` days, newest first."""
+        return self.artifacts(stage="portfolio", ticker=ticker, since=time.time() - days * SECONDS_PER_DAY)
+
+    def runs(self, since: float | None = None, limit: int | None = None) -> list[dict]:
+        """Recorded runs, newest first."""
+        query, params = "SELECT * FROM runs", []
+        if since is not None:
+            query += " WHERE started_at >= ?"
+            params.append(since)
+        query += " ORDER BY started_at DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params).fetchall()]
+
+
+_ledger: RunLedger | None = None
+
+
+def get_run_ledger() -> RunLedger:
+    """Returns the process-wide run ledger, stored at RUN_LEDGER_PATH."""
+    global _ledger
+    if _ledger is None:
+        _ledger = RunLedger(os.getenv("RUN_LEDGER_PATH", DEFAULT_LEDGER_PATH))
+    return _ledger
@@ -0,0 +1,245 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between rewrites of a partial result file
+PARTIAL_WRITE_INTERVAL = 0.25
+
+
+def streaming_enabled() -> bool:
+    """Whether agents stream their output, from AGENT_STREAMING (default off)."""
+    return os.getenv("AGENT_STREAMING", "").lower() in ("1", "true", "yes")
+
+
+def parse_partial_json(text: str) -> dict | list | None:
+    """
+    Best-effort parse of a JSON object that is still being generated.
+
+    Skips any prose before the first "{" (e.g. "Thought: ... Final Answer:"), cuts the
+    document back to the last comma outside a string, and closes the containers still
+    open at that point. Only fields whose values are complete are returned.
+
+    Returns:
+        dict | list | None: The complete fields so far, or None if nothing parses yet.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    text = text[start:]
+
+    closers: list[str] = []
+    in_string = escaped = False
+    cut = None  # (index, closers) at the last comma outside a string
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if closers:
+                closers.pop()
+            if not closers:
+                text = text[:i + 1]
+                cut = None
+                break
+        elif ch == ",":
+            cut = (i, list(closers))
+
+    if closers and cut is None:
+        candidate = "{}"
+    elif cut is not None and closers:
+        index, open_closers = cut
+        candidate = text[:index] + "".join(reversed(open_closers))
+    else:
+        candidate = text
+
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        return None
+
+
+@dataclass
+class StreamChunk:
+    """
+    A piece of agent output as it arrives.
+
+    Attributes:
+        agent (str): Role of the agent producing the output.
+        path (str | None): Result file the output will finally be written to.
+        text (str): The new chunk of text.
+        partial (dict | list | None): Complete fields of the JSON output parsed so far.
+    """
+    agent: str
+    path: str | None
+    text: str
+    partial: dict | list | None = None
+
+
+@dataclass
+class _StreamTarget:
+    agent: str
+    path: str | None
+    buffer: str = ""
+    last_write: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class AgentStream:
+    """
+    Fans streamed agent output out to callbacks (called on the crew's worker thread)
+    and async subscribers, and keeps a `<path>.partial` file of the parsed output so far.
+    """
+
+    def __init__(self):
+        self._callbacks: list = []
+        self._subscribers: list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback) -> None:
+        """Registers `callback(chunk: StreamChunk)`; it must be quick and thread-safe."""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    async def subscribe(self):
+        """
+        Async iterator over StreamChunks published after subscribing, until close().
+
+        Usage:
+            async for chunk in get_agent_stream().subscribe():
+                print(chunk.agent, chunk.text, end="")
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.append((loop, queue))
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if s[1] is not queue]
+
+    def publish(self, chunk: StreamChunk) -> None:
+        with self._lock:
+            callbacks = list(self._callbacks)
+            subscribers = list(self._subscribers)
+        for callback in callbacks:
+            try:
+                callback(chunk)
+            except Exception as e:
+                logger.warning(f"Stream callback failed: {e}")
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, chunk)
+
+    def close(self) -> None:
+        """Ends every subscription."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+
+_stream: AgentStream | None = None
+_target: contextvars.ContextVar[_StreamTarget | None] = contextvars.ContextVar("stream_target", default=None)
+_listeners_installed = False
+
+
+def get_agent_stream() -> AgentStream:
+    """Returns the process-wide agent output stream."""
+    global _stream
+    if _stream is None:
+        _stream = AgentStream()
+    return _stream
+
+
+def _write_partial(target: _StreamTarget, partial) -> None:
+    """Atomically rewrites `<path>.partial` with the parsed fields (or raw text) so far."""
+    output = partial if partial is not None else {"raw": target.buffer}
+    partial_path = f"{target.path}.partial"
+    with open(f"{partial_path}.tmp", "w") as f:
+        json.dump(output, f, indent=2)
+    os.replace(f"{partial_path}.tmp", partial_path)
+
+
+def _on_chunk(text: str) -> None:
+    target = _target.get()
+    if target is None:
+        return
+    with target.lock:
+        target.buffer += text
+        # The answer follows the agent's reasoning; only parse what comes after it
+        answer = target.buffer.rsplit("Final Answer:", 1)[-1]
+        partial = parse_partial_json(answer)
+        now = time.monotonic()
+        if target.path and now - target.last_write >= PARTIAL_WRITE_INTERVAL:
+            target.last_write = now
+            _write_partial(target, partial)
+    get_agent_stream().publish(StreamChunk(agent=target.agent, path=target.path, text=text, partial=partial))
+
+
+def install_stream_listeners() -> None:
+    """Forwards crewai stream-chunk events to the stream target of the emitting crew."""
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+
+    from crewai.utilities.events import LLMCallStartedEvent, LLMStreamChunkEvent, crewai_event_bus
+
+    @crewai_event_bus.on(LLMCallStartedEvent)
+    def on_llm_started(source, event):
+        # Each ReAct step is a new call; only the last one holds the final answer
+        target = _target.get()
+        if target is not None:
+            with target.lock:
+                target.buffer = ""
+
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def on_chunk(source, event):
+        if event.chunk:
+            _on_chunk(event.chunk)
+
+
+@contextmanager
+def stream_agent(agent, path: str | None = None):
+    """
+    Streams `agent`'s output for crews started inside the block (when AGENT_STREAMING
+    is on). Chunks go to get_agent_stream(), and the parsed output so far goes to
+    `<path>.partial`, which is removed when the block ends.
+
+    Args:
+        agent: crewai Agent about to run.
+        path (str, optional): Final result file of the agent's task.
+    """
+    if not streaming_enabled():
+        yield
+        return
+
+    install_stream_listeners()
+    agent.llm.stream = True
+    token = _target.set(_StreamTarget(agent=agent.role, path=path))
+    try:
+        yield
+    finally:
+        _target.reset(token)
+        if path and os.path.exists(f"{path}.partial"):
+            os.remove(f"{path}.partial")
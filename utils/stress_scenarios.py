@@ -0,0 +1,269 @@
+"""
+Historical stress scenarios: what a portfolio would have returned over named windows
+such as the 2008 crisis, the March 2020 crash or the 2022 rate shock.
+
+Each instrument's total return over every scenario window is computed once from the
+price store and kept in a small Parquet table (instruments x scenarios), so stressing a
+portfolio is a lookup and one matrix product over all scenarios. Instruments that did
+not trade through a window take the return of their proxy in PROXIES (e.g. SGOV ->
+BIL), and failing that of FALLBACK_PROXY; results say which tickers were proxied.
+"""
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.portfolio_evals import portfolio_weight_matrix
+from utils.price_store import get_price_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCENARIO_PATH = "data/scenarios/scenario_returns.parquet"
+DEFAULT_MAX_LOSS = float(os.getenv("STRESS_MAX_LOSS", "0.3"))  # worst scenario loss a portfolio may show
+ENTRY_TOLERANCE_DAYS = 7  # an instrument must have traded this close to a window's start
+
+# Peak-to-trough windows: close of `start` to close of `end`
+SCENARIOS = {
+    "gfc_2008": ("2008-09-12", "2009-03-09", "Lehman bankruptcy to the post-crisis equity low"),
+    "euro_crisis_2011": ("2011-07-22", "2011-10-03", "Euro-area debt crisis and US downgrade"),
+    "taper_tantrum_2013": ("2013-05-21", "2013-06-24", "Fed taper signal sends long yields higher"),
+    "volmageddon_2018": ("2018-01-26", "2018-02-08", "Short-volatility unwind"),
+    "q4_2018_selloff": ("2018-09-20", "2018-12-24", "Fed tightening and growth scare"),
+    "covid_crash_2020": ("2020-02-19", "2020-03-23", "March 2020 pandemic crash"),
+    "rate_shock_2022": ("2022-01-03", "2022-10-14", "Inflation and the fastest Fed hikes in decades"),
+    "svb_2023": ("2023-03-08", "2023-03-17", "Silicon Valley Bank failure and regional bank run"),
+}
+
+# Newer instruments -> older ones with similar exposure
+PROXIES = {
+    "SGOV": "BIL", "USFR": "BIL", "TFLO": "BIL", "BOXX": "BIL",
+    "VGIT": "IEF", "SCHR": "IEF", "GOVT": "IEF", "SPTI": "IEF",
+    "VGLT": "TLT", "SPTL": "TLT", "EDV": "TLT", "TLH": "TLT",
+    "SCHP": "TIP", "STIP": "TIP", "VTIP": "TIP",
+    "VCIT": "LQD", "IGIB": "LQD", "USIG": "LQD",
+    "USHY": "HYG", "SHYG": "HYG", "SJNK": "JNK",
+    "VWOB": "EMB", "EMLC": "EMB",
+    "VOO": "SPY", "SPLG": "SPY", "JEPI": "SPY", "USMV": "SPY", "QUAL": "SPY", "MTUM": "SPY",
+    "QQQM": "QQQ", "XLC": "XLK", "XLRE": "IYR",
+    "IEMG": "EEM", "IEFA": "EFA",
+    "GLDM": "GLD", "SGOL": "GLD",
+    "PDBC": "DBC", "COMT": "DBC",
+}
+FALLBACK_PROXY = "SPY"
+
+
+def _load_proxies() -> dict[str, str]:
+    """PROXIES, extended by a JSON {ticker: proxy} file at STRESS_PROXIES_PATH if set."""
+    proxies = dict(PROXIES)
+    path = os.getenv("STRESS_PROXIES_PATH")
+    if path and os.path.exists(path):
+        with open(path) as f:
+            proxies.update(json.load(f))
+    return proxies
+
+
+def window_returns(closes: pd.Series, scenarios: dict = SCENARIOS) -> dict[str, float]:
+    """
+    Total return of one instrument over each scenario window, NaN for windows it did not
+    trade through (no close within ENTRY_TOLERANCE_DAYS before the window starts).
+    """
+    closes = closes.dropna()
+    returns = {}
+    for name, (start, end, _) in scenarios.items():
+        entry = closes.loc[pd.Timestamp(start) - pd.Timedelta(days=ENTRY_TOLERANCE_DAYS):start]
+        exit_ = closes.loc[:end]
+        if entry.empty or exit_.empty or exit_.index[-1] < pd.Timestamp(start):
+            returns[name] = np.nan
+        else:
+            returns[name] = float(exit_.iloc[-1] / entry.iloc[-1] - 1)
+    return returns
+
+
+class ScenarioLibrary:
+    """
+    Stored (instruments x scenarios) window returns, filled in from the price store the
+    first time an instrument is asked for and kept in memory afterwards.
+    """
+
+    def __init__(self, path: str = DEFAULT_SCENARIO_PATH, scenarios: dict = SCENARIOS):
+        self.path = path
+        self.scenarios = scenarios
+        self.proxies = _load_proxies()
+        self._lock = threading.Lock()
+        self._returns = self._load()
+
+    def _load(self) -> pd.DataFrame:
+        if os.path.exists(self.path):
+            stored = pd.read_parquet(self.path)
+            if list(stored.columns) == list(self.scenarios):
+                return stored
+            logger.info("Scenario library changed; recomputing stored scenario returns")
+        return pd.DataFrame(columns=list(self.scenarios), dtype=float)
+
+    def _save(self) -> None:
+        """
+        Persists the instruments with at least one scenario return, merged with any another
+        process stored since this library loaded. All-NaN rows (no price history, e.g. a
+        failed download) stay in memory only, so a later process computes them again.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        stored = self._load()
+        covered = self._returns[self._returns.notna().any(axis=1)]
+        merged = pd.concat([stored[~stored.index.isin(covered.index)], covered]) if len(stored) else covered
+        # Write-then-rename, like the price store, for processes sharing the file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        merged.to_parquet(tmp_path)
+        os.replace(tmp_path, self.path)
+        added = stored[~stored.index.isin(self._returns.index)]
+        if len(added):
+            self._returns = pd.concat([self._returns, added])
+
+    def ensure(self, tickers: list[str]) -> None:
+        """Computes and stores the window returns of any of `tickers` not held yet."""
+        with self._lock:
+            missing = [t for t in dict.fromkeys(tickers) if t not in self._returns.index]
+            if not missing:
+                return
+            store = get_price_store()
+            windows = list(self.scenarios.values())
+            start = (pd.Timestamp(min(w[0] for w in windows)) - pd.Timedelta(days=ENTRY_TOLERANCE_DAYS)).strftime("%Y-%m-%d")
+            end = (pd.Timestamp(max(w[1] for w in windows)) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+            store.refresh(missing, start=start, end=end)
+            rows = {t: window_returns(store.load_bars(t)["Close"], self.scenarios) for t in missing}
+            computed = pd.DataFrame.from_dict(rows, orient="index", columns=list(self.scenarios), dtype=float)
+            self._returns = pd.concat([self._returns, computed]) if len(self._returns) else computed
+            self._save()
+            logger.info(f"Stored scenario returns for {len(missing)} instruments")
+
+    def _proxy_chain(self, ticker: str) -> list[str]:
+        chain, seen = [], {ticker}
+        proxy = self.proxies.get(ticker)
+        while proxy and proxy not in seen:
+            chain.append(proxy)
+            seen.add(proxy)
+            proxy = self.proxies.get(proxy)
+        if FALLBACK_PROXY not in seen:
+            chain.append(FALLBACK_PROXY)
+        return chain
+
+    def returns(self, tickers: list[str]) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        (tickers x scenarios) window returns with gaps filled from proxies.
+
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: The returns, and the ticker whose return
+                was used where a proxy stood in (NaN elsewhere).
+        """
+        tickers = list(dict.fromkeys(tickers))
+        chains = {t: self._proxy_chain(t) for t in tickers}
+        self.ensure(tickers + [p for chain in chains.values() for p in chain])
+        with self._lock:
+            table = self._returns
+        returns = table.loc[tickers].copy()
+        sources = pd.DataFrame(None, index=tickers, columns=returns.columns, dtype=object)
+        for ticker, chain in chains.items():
+            if returns.loc[ticker].notna().all():
+                continue
+            for proxy in chain:
+                gaps = returns.loc[ticker].isna() & table.loc[proxy].notna()
+                returns.loc[ticker, gaps] = table.loc[proxy, gaps]
+                sources.loc[ticker, gaps] = proxy
+        return returns, sources
+
+
+_library: ScenarioLibrary | None = None
+_library_lock = threading.Lock()
+
+
+def get_scenario_library() -> ScenarioLibrary:
+    """Returns the process-wide scenario library, stored at STRESS_SCENARIO_PATH."""
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = ScenarioLibrary(path=os.getenv("STRESS_SCENARIO_PATH", DEFAULT_SCENARIO_PATH))
+        return _library
+
+
+def _scenario_results(returns: pd.DataFrame, weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (scenarios x portfolios) returns and the share of each portfolio's gross weight with
+    a return in each scenario. A return is NaN unless every weighted instrument has one:
+    counting an uncovered instrument as 0% would understate the loss.
+    """
+    matrix = returns.to_numpy(dtype=float).T  # (scenarios x tickers)
+    covered = ~np.isnan(matrix)
+    results = np.where(covered, matrix, 0.0) @ weights
+    coverage = covered.astype(float) @ np.abs(weights)
+    results[(~covered).astype(float) @ (weights != 0) > 0] = np.nan
+    return results, coverage
+
+
+def stress_test_portfolios(portfolios: list[dict], library: ScenarioLibrary | None = None) -> pd.DataFrame:
+    """
+    Returns of many portfolios in every scenario, from one (scenarios x tickers) @
+    (tickers x portfolios) product.
+
+    Returns:
+        pd.DataFrame: (scenarios x portfolios) returns, columns numbered as `portfolios`;
+            NaN where an instrument has neither a return nor a proxy return.
+    """
+    library = library or get_scenario_library()
+    tickers, weights = portfolio_weight_matrix(portfolios)
+    returns, _ = library.returns(tickers)
+    results, _ = _scenario_results(returns, weights)
+    return pd.DataFrame(results, index=returns.columns, columns=range(len(portfolios)))
+
+
+def stress_test(portfolio: dict, max_loss: float = DEFAULT_MAX_LOSS, library: ScenarioLibrary | None = None) -> dict:
+    """
+    Stresses one portfolio schema output and checks it against `max_loss`.
+
+    Returns:
+        dict: "scenarios" with each window's dates, description, portfolio return (%, None
+            unless every instrument is covered) and "coverage" (% of gross weight with a
+            return), "worst_scenario", "worst_return" (%), "max_loss" (%), "passed", and
+            "proxies": {ticker: {scenario: proxy}}. "passed" is False if a scenario loses
+            more than `max_loss`, None if none does but some scenario could not be
+            computed, and True otherwise.
+    """
+    library = library or get_scenario_library()
+    tickers, weights = portfolio_weight_matrix([portfolio])
+    returns, sources = library.returns(tickers)
+    results, coverage = _scenario_results(returns, weights)
+    results = pd.Series(results[:, 0], index=returns.columns)
+    coverage = pd.Series(coverage[:, 0], index=returns.columns)
+
+    scenarios = {
+        name: {"start": start, "end": end, "description": description,
+               "return": None if np.isnan(results[name]) else round(float(results[name]) * 100, 2),
+               "coverage": round(float(coverage[name]) * 100, 2)}
+        for name, (start, end, description) in library.scenarios.items()
+    }
+    worst = results.idxmin() if results.notna().any() else None
+    proxies = {
+        ticker: {scenario: proxy for scenario, proxy in row.items() if isinstance(proxy, str)}
+        for ticker, row in sources.iterrows()
+    }
+    if worst is not None and results[worst] < -max_loss:
+        passed = False
+    elif results.isna().any():
+        passed = None
+    else:
+        passed = True
+    result = {
+        "scenarios": scenarios,
+        "worst_scenario": worst,
+        "worst_return": None if worst is None else round(float(results[worst]) * 100, 2),
+        "max_loss": round(max_loss * 100, 2),
+        "passed": passed,
+        "proxies": {ticker: used for ticker, used in proxies.items() if used},
+    }
+    if passed is False:
+        logger.warning(f"Portfolio fails stress test: {result['worst_return']}% in {worst} (limit -{result['max_loss']}%)")
+    elif passed is None:
+        incomplete = list(results.index[results.isna()])
+        logger.warning(f"Stress test incomplete: no return or proxy return for some instruments in {incomplete}")
+    return result
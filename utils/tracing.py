@@ -0,0 +1,342 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRACE_DIR = "logs/traces"
+DEFAULT_METRICS_PATH = "logs/metrics.prom"
+METRIC_PREFIX = "agentic_trader"
+
+# Span kinds, outermost first
+SPAN_KINDS = ("run", "stage", "crew", "agent", "llm", "tool", "io")
+
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+_current_trace: contextvars.ContextVar[str | None] = contextvars.ContextVar("current_trace", default=None)
+
+
+@dataclass
+class Span:
+    """
+    One timed unit of work (pipeline run, stage, crew, agent execution, LLM call,
+    tool call or file write).
+
+    Attributes:
+        name (str): Stage name, agent role, tool name, ...
+        kind (str): One of SPAN_KINDS.
+        trace_id (str | None): Id of the pipeline run the span belongs to.
+        parent_id (str | None): Id of the enclosing span.
+        start_time (float): Unix time the span started.
+        wall_time (float | None): Seconds from start to finish.
+        queue_wait (float): Seconds spent waiting for a concurrency slot before starting.
+        status (str): "ok" or "error".
+        attributes (dict): Token counts, retries, error text and other details.
+    """
+    name: str
+    kind: str
+    trace_id: str | None
+    parent_id: str | None
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    start_time: float = field(default_factory=time.time)
+    wall_time: float | None = None
+    queue_wait: float = 0.0
+    status: str = "ok"
+    attributes: dict = field(default_factory=dict)
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "name": self.name,
+            "start_time": self.start_time,
+            "wall_time": self.wall_time,
+            "queue_wait": self.queue_wait,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """
+    Collects finished spans and exports them per run as JSON lines, plus running
+    per-(kind, name) totals as a Prometheus text file.
+    """
+
+    def __init__(self, trace_dir: str | None = DEFAULT_TRACE_DIR, metrics_path: str | None = DEFAULT_METRICS_PATH):
+        self.trace_dir = trace_dir
+        self.metrics_path = metrics_path
+        self._spans: list[Span] = []
+        self._totals: dict[tuple[str, str], dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, kind: str, parent: Span | None = None, queue_wait: float = 0.0, **attributes) -> Span:
+        """Starts a span under `parent` (default: the current span of this context)."""
+        parent = parent or _current_span.get()
+        return Span(
+            name=name,
+            kind=kind,
+            trace_id=_current_trace.get() or (parent.trace_id if parent else None),
+            parent_id=parent.span_id if parent else None,
+            queue_wait=queue_wait,
+            attributes=attributes,
+        )
+
+    def end_span(self, span: Span, error: BaseException | str | None = None) -> None:
+        """Records `span` as finished, marking it failed if `error` is given."""
+        span.wall_time = time.perf_counter() - span._started
+        if error is not None:
+            span.status = "error"
+            span.attributes["error"] = error if isinstance(error, str) else repr(error)
+
+        with self._lock:
+            self._spans.append(span)
+            totals = self._totals.setdefault((span.kind, span.name), {
+                "count": 0, "errors": 0, "seconds": 0.0, "queue_wait_seconds": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0, "retries": 0,
+            })
+            totals["count"] += 1
+            totals["errors"] += span.status == "error"
+            totals["seconds"] += span.wall_time
+            totals["queue_wait_seconds"] += span.queue_wait
+            for key in ("prompt_tokens", "completion_tokens", "retries"):
+                totals[key] += span.attributes.get(key) or 0
+
+    @contextmanager
+    def span(self, name: str, kind: str, queue_wait: float = 0.0, **attributes):
+        """Context manager that times a block as a child of the current span."""
+        span = self.start_span(name, kind, queue_wait=queue_wait, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, error=e)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            _current_span.reset(token)
+
+    def export(self, trace_id: str | None = None) -> None:
+        """
+        Appends the finished spans of `trace_id` (all spans if None) to
+        `trace_dir/<trace_id>.jsonl` and rewrites the Prometheus metrics file.
+        """
+        with self._lock:
+            spans = [s for s in self._spans if trace_id is None or s.trace_id == trace_id]
+            exported = {id(s) for s in spans}
+            self._spans = [s for s in self._spans if id(s) not in exported]
+            metrics = self.prometheus_text()
+
+        if self.trace_dir and spans:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            path = os.path.join(self.trace_dir, f"{trace_id or 'spans'}.jsonl")
+            with open(path, "a") as f:
+                for span in sorted(spans, key=lambda s: s.start_time):
+                    f.write(json.dumps(span.to_dict(), default=str) + "\n")
+            logger.info(f"Wrote {len(spans)} spans to {path}")
+
+        if self.metrics_path:
+            os.makedirs(os.path.dirname(self.metrics_path) or ".", exist_ok=True)
+            # Write-then-rename so a scraper never reads a half-written file; the tmp name is
+            # per process and thread, as concurrent exports would otherwise share one
+            tmp_path = f"{self.metrics_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(metrics)
+            os.replace(tmp_path, self.metrics_path)
+
+    def prometheus_text(self) -> str:
+        """Renders the running totals in the Prometheus text exposition format."""
+        metrics = [
+            ("spans", "counter", "Finished spans", "count"),
+            ("span_errors", "counter", "Spans that ended in an error", "errors"),
+            ("span_seconds", "counter", "Total wall-time of spans", "seconds"),
+            ("span_queue_wait_seconds", "counter", "Total time spans waited for a concurrency slot", "queue_wait_seconds"),
+            ("prompt_tokens", "counter", "Prompt tokens sent", "prompt_tokens"),
+            ("completion_tokens", "counter", "Completion tokens received", "completion_tokens"),
+            ("retries", "counter", "Retried LLM or tool calls", "retries"),
+        ]
+        lines = []
+        for metric, metric_type, description, key in metrics:
+            name = f"{METRIC_PREFIX}_{metric}_total"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (kind, span_name), totals in sorted(self._totals.items()):
+                label = span_name.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+                lines.append(f'{name}{{kind="{kind}",name="{label}"}} {totals[key]}')
+        return "\n".join(lines) + "\n"
+
+
+_tracer: Tracer | None = None
+
+
+def get_tracer() -> Tracer:
+    """Returns the process-wide tracer, configured from the environment."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(
+            trace_dir=os.getenv("TRACE_DIR", DEFAULT_TRACE_DIR) or None,
+            metrics_path=os.getenv("TRACE_METRICS_PATH", DEFAULT_METRICS_PATH) or None,
+        )
+    return _tracer
+
+
+def current_trace_id() -> str | None:
+    """Id of the pipeline run (see trace_run) the caller is part of, if any."""
+    return _current_trace.get()
+
+
+def span(name: str, kind: str, queue_wait: float = 0.0, **attributes):
+    """Shortcut for get_tracer().span(...)."""
+    return get_tracer().span(name, kind, queue_wait=queue_wait, **attributes)
+
+
+@contextmanager
+def trace_run(name: str, trace_id: str | None = None, **attributes):
+    """
+    Opens the root span of one pipeline run and exports the run's spans when it ends.
+    Spans started in tasks and threads spawned inside the block (with their context
+    copied) share its trace id (a new random id unless `trace_id` is given).
+    """
+    trace_id = trace_id or uuid.uuid4().hex[:16]
+    token = _current_trace.set(trace_id)
+    try:
+        with span(name, kind="run", **attributes) as run_span:
+            yield run_span
+    finally:
+        _current_trace.reset(token)
+        get_tracer().export(trace_id)
+
+
+# ---- crewai event listeners ---------------------------------------------------
+
+_listeners_installed = False
+_open_spans = threading.local()
+
+
+def _open_stack() -> list:
+    if not hasattr(_open_spans, "stack"):
+        _open_spans.stack = []
+    return _open_spans.stack
+
+
+def _push_event_span(name: str | None, kind: str, token_process=None, **attributes) -> Span:
+    """Starts a span from a crewai start event and makes it current on this thread."""
+    parent = _current_span.get()
+    agent = attributes.pop("agent", None) or (parent.attributes.get("agent") if parent else None)
+    span = get_tracer().start_span(name or agent or kind, kind, agent=agent, **attributes)
+    snapshot = (token_process, token_process.prompt_tokens, token_process.completion_tokens) if token_process else None
+    _open_stack().append((span, parent, snapshot))
+    _current_span.set(span)
+    return span
+
+
+def _pop_event_span(kind: str, error: str | None = None, **attributes) -> Span | None:
+    """Finishes the innermost open span of `kind` on this thread."""
+    stack = _open_stack()
+    for i in range(len(stack) - 1, -1, -1):
+        span, parent, snapshot = stack[i]
+        if span.kind != kind:
+            continue
+        del stack[i]
+        _current_span.set(parent)
+        if snapshot:
+            # Token counters are per agent; the difference across the call is this call's usage
+            process, prompt_tokens, completion_tokens = snapshot
+            span.set(
+                prompt_tokens=process.prompt_tokens - prompt_tokens,
+                completion_tokens=process.completion_tokens - completion_tokens,
+            )
+        span.set(**attributes)
+        get_tracer().end_span(span, error=error)
+        return span
+    return None
+
+
+def _token_process(callbacks):
+    for callback in callbacks or []:
+        process = getattr(callback, "token_cost_process", None)
+        if process is not None:
+            return process
+    return None
+
+
+def install_crewai_listeners() -> None:
+    """
+    Registers crewai event-bus handlers that turn agent executions, LLM calls and
+    tool calls into spans nested under the crew span of the thread that emits them.
+    Safe to call more than once.
+    """
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+
+    from crewai.utilities.events import (
+        AgentExecutionCompletedEvent,
+        AgentExecutionErrorEvent,
+        AgentExecutionStartedEvent,
+        LLMCallCompletedEvent,
+        LLMCallFailedEvent,
+        LLMCallStartedEvent,
+        ToolUsageErrorEvent,
+        ToolUsageFinishedEvent,
+        ToolUsageStartedEvent,
+        crewai_event_bus,
+    )
+
+    @crewai_event_bus.on(AgentExecutionStartedEvent)
+    def on_agent_started(source, event):
+        _push_event_span(event.agent.role, "agent", agent=event.agent.role)
+
+    @crewai_event_bus.on(AgentExecutionCompletedEvent)
+    def on_agent_completed(source, event):
+        _pop_event_span("agent")
+
+    @crewai_event_bus.on(AgentExecutionErrorEvent)
+    def on_agent_error(source, event):
+        _pop_event_span("agent", error=event.error)
+
+    @crewai_event_bus.on(LLMCallStartedEvent)
+    def on_llm_started(source, event):
+        # A call straight after a failed one on the same thread is the executor retrying
+        retry = int(getattr(_open_spans, "last_llm_failed", False))
+        _push_event_span(
+            None, "llm", token_process=_token_process(event.callbacks),
+            model=getattr(source, "model", None), retries=retry,
+        )
+
+    @crewai_event_bus.on(LLMCallCompletedEvent)
+    def on_llm_completed(source, event):
+        _open_spans.last_llm_failed = False
+        _pop_event_span("llm")
+
+    @crewai_event_bus.on(LLMCallFailedEvent)
+    def on_llm_failed(source, event):
+        _open_spans.last_llm_failed = True
+        _pop_event_span("llm", error=event.error)
+
+    @crewai_event_bus.on(ToolUsageStartedEvent)
+    def on_tool_started(source, event):
+        _push_event_span(event.tool_name, "tool", agent=event.agent_role)
+
+    @crewai_event_bus.on(ToolUsageFinishedEvent)
+    def on_tool_finished(source, event):
+        _pop_event_span("tool", from_cache=event.from_cache, retries=max((event.run_attempts or 1) - 1, 0))
+
+    @crewai_event_bus.on(ToolUsageErrorEvent)
+    def on_tool_error(source, event):
+        _pop_event_span("tool", error=str(event.error))
+
+    logger.info("Installed crewai tracing listeners")
@@ -1,17 +1,61 @@
 import json
+import re
+import os
 from datetime import datetime
 import logging
 
+from utils.registry import shared
+
 logger = logging.getLogger(__name__)
 
+# Loggers that also write to their own file under logs/
+LOG_FILES = {
+    "MainLogger": "logs/main.log",
+    "research_agent": "logs/research_agent.log",
+}
+
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """
+    Sets up console logging and the per-component log files in logs/.
+    Called by entry points rather than at import time.
+    """
+    logging.basicConfig(level=level)
+    os.makedirs("logs", exist_ok=True)
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+
+    for name, path in LOG_FILES.items():
+        component_logger = logging.getLogger(name)
+        component_logger.setLevel(level)
+        if any(getattr(h, "baseFilename", None) == os.path.abspath(path) for h in component_logger.handlers):
+            continue
+        file_handler = logging.FileHandler(path)
+        file_handler.setLevel(level)
+        file_handler.setFormatter(formatter)
+        component_logger.addHandler(file_handler)
+
+
+def configure_environment() -> None:
+    """Loads API keys from .env into the environment and warns about missing ones."""
+    from dotenv import load_dotenv  # type: ignore
+
+    load_dotenv()
+    for key in ("OPENAI_API_KEY", "SERPER_API_KEY"):
+        if not os.getenv(key):
+            logger.warning(f"{key} is not set; agent stages will fail without it.")
+
 def join_outputs_as_json(results: list[tuple[str, str, str]]) -> str:
-    data = [
-        {"task": task_desc, "agent": agent_role, "output": output.raw}
-        for task_desc, agent_role, output in results
-    ]
-    return json.dumps(data, indent=2)
+    """
+    Serialises research results into the compact trader hand-off: no task
+    descriptions, no indentation, and citations de-duplicated into one
+    numbered source list (see utils/research_handoff.py).
+    """
+    from utils.research_handoff import compact_research, dumps_compact
 
+    return dumps_compact(compact_research(results))
 
+
+@shared("run")
 def get_current_date_for_prompting() -> str:
     """
     Returns a string with the current date in YYYY-MM-DD format
@@ -20,6 +64,7 @@ def get_current_date_for_prompting() -> str:
     today_str = datetime.utcnow().strftime("%Y-%m-%d")
     return f"Today's date is {today_str}. Please use this as the current date for all time-sensitive reasoning."
 
+@shared("process")
 def load_schema(path: str) -> dict:
     """Generic schema loader for tasks/agents."""
     try:
@@ -33,17 +78,23 @@ def load_schema(path: str) -> dict:
 def normalize_trader_hypotheses(raw):
     """
     Normalize the trader agent output to always return a list of hypotheses.
-    Handles cases where output is a list, a dict with a list, or a JSON string.
+    Handles cases where output is a list, a dict with a list, or a JSON string
+    (optionally wrapped in a ```json code fence). Text that is not JSON is
+    treated as a single hypothesis.
     """
     # If it's a string, try to parse as JSON
     if isinstance(raw, str):
+        text = re.sub(r"^\s*```[\w-]*\s*\n?|\n?\s*```\s*$", "", raw).strip()
+        if not text:
+            return []
         try:
-            raw = json.loads(raw)
+            raw = json.loads(text)
+        except json.JSONDecodeError:
+            return [raw]
+        if isinstance(raw, dict):
             for key in ['items', 'hypotheses', 'data']:
                 if key in raw and isinstance(raw[key], dict):
-                    return raw[key]
-        except Exception:
-            return []
+                    return [raw[key]]
 
     # If it's a dict with a list under a key (e.g., 'items' or 'hypotheses')
     if isinstance(raw, dict):